@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from annotation import extract_arrays
+
+
+class LogSink:
+    def __call__(self, event):
+        print(f"🚨 ALERT {event['class']} {event['confidence']:.2f} from {event['source']}"
+              f"{'/' + str(event['stream']) if event['stream'] else ''} ({event['latency_ms']:.0f} ms)")
+
+
+class JsonlSink:
+    def __init__(self, path):
+        """Append every alert as one JSON line to a local file"""
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock, open(self.path, 'a') as f:
+            f.write(json.dumps(event) + '\n')
+
+
+class CommandSink:
+    def __init__(self, command, timeout=10.0):
+        """Run a local command per alert with the event JSON on stdin"""
+        self.command = command
+        self.timeout = timeout
+
+    def __call__(self, event):
+        subprocess.run(self.command, input=json.dumps(event).encode('utf-8'), shell=True,
+                       timeout=self.timeout, check=False)
+
+
+SINKS = {'log': LogSink, 'jsonl': JsonlSink, 'command': CommandSink}
+
+
+def create_sink(spec):
+    """Build a sink from 'log', 'jsonl:<path>' or 'command:<shell command>'"""
+    kind, _, arg = spec.strip().partition(':')
+    if kind not in SINKS:
+        raise ValueError(f'Unknown alert sink {kind!r}; expected one of {", ".join(SINKS)}')
+    if kind == 'log':
+        return LogSink()
+    if not arg:
+        raise ValueError(f'Alert sink {kind!r} needs an argument, e.g. {kind}:...')
+    return SINKS[kind](arg)
+
+
+def _iou(box, boxes):
+    xx1 = np.maximum(box[0], boxes[:, 0])
+    yy1 = np.maximum(box[1], boxes[:, 1])
+    xx2 = np.minimum(box[2], boxes[:, 2])
+    yy2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / (area + areas - inter + 1e-9)
+
+
+class AlertManager:
+    def __init__(self, classes, min_confidence=0.4, debounce_seconds=10.0, iou_threshold=0.3,
+                 sinks=(), history=500):
+        """Turn detections of the alert classes into deduplicated alert events
+
+        Each alert-class box is matched by IoU against the open tracks of
+        its (source, stream, class). A box that continues a track seen in
+        the last debounce_seconds is suppressed; anything else opens a new
+        track and publishes an event. Results without a stream id are
+        one-off requests, so their boxes are only deduplicated against
+        each other. Keys whose tracks have all expired are pruned once per
+        debounce period. Events go to waiting SSE readers at
+        once and to the sinks on a separate thread, so a slow sink never
+        delays inference. Every event records the time from frame capture
+        to publication.
+        """
+        self.classes = set(classes)
+        self.class_ids = []
+        self.names = {}
+        self.min_confidence = min_confidence
+        self.debounce_seconds = debounce_seconds
+        self.iou_threshold = iou_threshold
+        self.sinks = list(sinks)
+        self._events = deque(maxlen=history)
+        self._tracks = {}
+        self._pruned_at = 0.0
+        self._next_event = 1
+        self._next_track = 1
+        self._cond = threading.Condition()
+        self._published = 0
+        self._suppressed = 0
+        self._sink_errors = 0
+        self._latencies = deque(maxlen=1000)
+        self._sink_queue = queue.Queue(maxsize=1000)
+        self._sink_thread = None
+        if self.sinks:
+            self._sink_thread = threading.Thread(target=self._run_sinks, name='alert-sinks', daemon=True)
+            self._sink_thread.start()
+
+    def set_names(self, names):
+        """Resolve the alert class names against a model's {id: name} mapping"""
+        self.names = dict(names)
+        self.class_ids = sorted(i for i, name in self.names.items() if name in self.classes)
+        return self.class_ids
+
+    def observe(self, result, source, stream=None, frame=None, captured_at=None):
+        """Check one detection result for alert classes; return the new events"""
+        if not self.class_ids:
+            return []
+        xyxy, conf, cls = extract_arrays(result)
+        mask = np.isin(cls, self.class_ids) & (conf >= self.min_confidence)
+        if not mask.any():
+            return []
+        now = time.time()
+        captured_at = now if captured_at is None else captured_at
+        events = []
+        request_tracks = {}
+        with self._cond:
+            if now - self._pruned_at > self.debounce_seconds:
+                self._prune(now)
+            for box, confidence, class_id in zip(xyxy[mask], conf[mask].tolist(), cls[mask].tolist()):
+                if stream is None:
+                    tracks = request_tracks.setdefault(class_id, [])
+                else:
+                    key = (source, stream, class_id)
+                    tracks = [t for t in self._tracks.get(key, []) if now - t['last_seen'] <= self.debounce_seconds]
+                    self._tracks[key] = tracks
+                if tracks:
+                    overlap = _iou(box, np.array([t['box'] for t in tracks]))
+                    best = int(overlap.argmax())
+                    if overlap[best] >= self.iou_threshold:
+                        tracks[best]['box'] = box
+                        tracks[best]['last_seen'] = now
+                        self._suppressed += 1
+                        continue
+                track_id = self._next_track
+                self._next_track += 1
+                tracks.append({'id': track_id, 'box': box, 'last_seen': now})
+                event = {
+                    'id': self._next_event,
+                    'ts': now,
+                    'source': source,
+                    'stream': stream,
+                    'frame': frame,
+                    'class': self.names.get(class_id, str(class_id)),
+                    'confidence': round(confidence, 4),
+                    'bbox': [round(float(v), 1) for v in box],
+                    'track_id': track_id,
+                    'captured_at': captured_at,
+                    'latency_ms': round(1000.0 * (now - captured_at), 3),
+                }
+                self._next_event += 1
+                self._events.append(event)
+                self._latencies.append(event['latency_ms'])
+                self._published += 1
+                events.append(event)
+            if events:
+                self._cond.notify_all()
+        for event in events:
+            if self._sink_thread is not None:
+                try:
+                    self._sink_queue.put_nowait(event)
+                except queue.Full:
+                    with self._cond:
+                        self._sink_errors += 1
+        return events
+
+    def _prune(self, now):
+        # Called with self._cond held
+        self._tracks = {key: tracks for key, tracks in self._tracks.items()
+                        if any(now - t['last_seen'] <= self.debounce_seconds for t in tracks)}
+        self._pruned_at = now
+
+    def _run_sinks(self):
+        while True:
+            event = self._sink_queue.get()
+            for sink in self.sinks:
+                try:
+                    sink(event)
+                except Exception as e:
+                    with self._cond:
+                        self._sink_errors += 1
+                    print(f"❌ Alert sink {type(sink).__name__} failed: {e}")
+
+    def since(self, last_id, limit=100):
+        """Return events with an id above last_id, oldest first"""
+        with self._cond:
+            return [e for e in self._events if e['id'] > last_id][-limit:]
+
+    def wait(self, last_id, timeout):
+        """Block until an event newer than last_id exists; return the new events"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._next_event - 1 <= last_id:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+            return [e for e in self._events if e['id'] > last_id]
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._next_event - 1
+
+    def stats(self):
+        """Return alert counts and capture-to-alert latency percentiles"""
+        with self._cond:
+            latencies = sorted(self._latencies)
+            counts = {
+                'published': self._published,
+                'suppressed': self._suppressed,
+                'sink_errors': self._sink_errors,
+            }
+
+        def percentile(pct):
+            if not latencies:
+                return None
+            return latencies[max(0, math.ceil(pct / 100.0 * len(latencies)) - 1)]
+
+        return {
+            'classes': sorted(self.classes),
+            'class_ids': self.class_ids,
+            **counts,
+            'sinks': [type(s).__name__ for s in self.sinks],
+            'latency_ms': {'p50': percentile(50), 'p95': percentile(95), 'p99': percentile(99),
+                           'max': latencies[-1] if latencies else None},
+        }
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+
+from backends import extract_arrays
+
+WEAPON_CLASSES = ('knife', 'scissors', 'gun')
+PERSON_CLASSES = ('person',)
+VEHICLE_CLASSES = ('car', 'truck', 'bus')
+
+RED = (0, 0, 255)
+BLUE = (255, 0, 0)
+YELLOW = (0, 255, 255)
+GREEN = (0, 255, 0)
+
+
+def class_color(class_name):
+    """BGR color used to draw a class"""
+    if class_name in WEAPON_CLASSES:
+        return RED
+    if class_name in PERSON_CLASSES:
+        return BLUE
+    if class_name in VEHICLE_CLASSES:
+        return YELLOW
+    return GREEN
+
+
+class Annotator:
+    def __init__(self, names, font_scale=0.6, thickness=2):
+        """Draw detections using lookup tables built once from model.names"""
+        if isinstance(names, dict):
+            size = max(names) + 1 if names else 0
+            self.names = [names.get(i, str(i)) for i in range(size)]
+        else:
+            self.names = list(names)
+        self.colors = [class_color(name) for name in self.names]
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self._labels = {}
+
+    def _name(self, class_id):
+        return self.names[class_id] if 0 <= class_id < len(self.names) else str(class_id)
+
+    def _color(self, class_id):
+        return self.colors[class_id] if 0 <= class_id < len(self.colors) else GREEN
+
+    def label(self, class_id, confidence):
+        """Return the cached label text for a class and confidence"""
+        key = (class_id, int(round(confidence * 100)))
+        text = self._labels.get(key)
+        if text is None:
+            text = f'{self._name(class_id)} {key[1] / 100:.2f}'
+            self._labels[key] = text
+        return text
+
+    def draw(self, image, xyxy, conf, cls):
+        """Draw boxes and labels onto image in place"""
+        corners = xyxy.astype(np.int32).tolist()
+        for (x1, y1, x2, y2), confidence, class_id in zip(corners, conf.tolist(), cls.tolist()):
+            color = self._color(class_id)
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, self.thickness)
+            cv2.putText(image, self.label(class_id, confidence), (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, self.font_scale, color, self.thickness)
+        return image
+
+    def to_dicts(self, xyxy, conf, cls):
+        """Convert detection arrays into the JSON dicts returned by the API"""
+        corners = xyxy.astype(np.int32).tolist()
+        return [
+            {'object': self._name(class_id), 'confidence': confidence, 'bbox': box}
+            for box, confidence, class_id in zip(corners, conf.tolist(), cls.tolist())
+        ]
+
+    def counts(self, cls):
+        """Return {class_name: count} for a cls array"""
+        if len(cls) == 0:
+            return {}
+        ids, totals = np.unique(cls, return_counts=True)
+        return {self._name(int(i)): int(n) for i, n in zip(ids, totals)}
+
+    def annotate(self, image, result):
+        """Draw a result onto image (if given) and return (detections, counts)"""
+        xyxy, conf, cls = extract_arrays(result)
+        if image is not None and len(cls):
+            self.draw(image, xyxy, conf, cls)
+        return self.to_dicts(xyxy, conf, cls), self.counts(cls)
@@ -1,19 +1,151 @@
 from flask import Flask, render_template, request, jsonify, Response, send_from_directory
-from ultralytics import YOLO
 import cv2
 import numpy as np
 import base64
+import io
+import itertools
+import json
 import os
+import shutil
+import tarfile
+import threading
+import time
+import zipfile
 import tempfile
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import urllib.request
+from inference_batcher import InferenceBatcher
+from backends import create_backend
+from model_loader import ModelLoader
+from worker_pool import ModelWorkerPool
+from pipeline import StreamPipeline, pipeline_stats
+from broadcast import FrameBroadcaster
+from tracking import TrackedDetector
+from motion import MotionDetector, MotionGatedDetector
+from jobs import JobManager
+from video_sessions import VideoSessionManager, receive_upload
+from annotation import WEAPON_CLASSES, Annotator
+from alerts import AlertManager, create_sink
+from buffers import BufferPool, GCMonitor
+from result_cache import DetectionCache, cache_key
+from tiling import TiledDetector, should_tile
+from detection_stats import WINDOWS, DetectionStats
+from event_store import EventStore, StreamEvents
+from stream_server import StreamError, StreamServer
+from sources import SourceManager, StreamSource, parse_sources
+import metrics
 
 app = Flask(__name__)
 
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'ultralytics')
+STUB_LATENCY_MS = float(os.environ.get('STUB_LATENCY_MS', 0))
+STUB_PER_IMAGE_MS = float(os.environ.get('STUB_PER_IMAGE_MS', 0))
+MODEL_CACHE_DIR = os.environ.get('MODEL_CACHE_DIR', 'model_cache')
+INFER_INTRA_THREADS = int(os.environ.get('INFER_INTRA_THREADS', 0))
+INFER_INTER_THREADS = int(os.environ.get('INFER_INTER_THREADS', 0))
+MODEL_WORKERS = int(os.environ.get('MODEL_WORKERS', 0))
+MODEL_WORKER_THREADS = int(os.environ.get('MODEL_WORKER_THREADS', 0))
+MODEL_WORKER_PIN = os.environ.get('MODEL_WORKER_PIN', '0') == '1'
+MODEL_WORKER_TIMEOUT = float(os.environ.get('MODEL_WORKER_TIMEOUT', 120))
+MODEL_WARMUP_RUNS = int(os.environ.get('MODEL_WARMUP_RUNS', 2))
+MODEL_WAIT_TIMEOUT = float(os.environ.get('MODEL_WAIT_TIMEOUT', 30))
+MODEL_LOAD_RETRIES = int(os.environ.get('MODEL_LOAD_RETRIES', 3))
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', '0')
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 8))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 10))
+BATCH_DECODE_WORKERS = int(os.environ.get('BATCH_DECODE_WORKERS', os.cpu_count() or 4))
+BATCH_MAX_IMAGES = int(os.environ.get('BATCH_MAX_IMAGES', 1000))
+BATCH_MAX_MB = float(os.environ.get('BATCH_MAX_MB', 512))
+BATCH_MAX_MB = float(os.environ.get('BATCH_MAX_MB', 512))
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 2))
+CAMERA_DROP_OLDEST = os.environ.get('CAMERA_DROP_OLDEST', '1') == '1'
+VIDEO_DROP_OLDEST = os.environ.get('VIDEO_DROP_OLDEST', '0') == '1'
+CAMERA_CLIENT_BUFFER = int(os.environ.get('CAMERA_CLIENT_BUFFER', 2))
+TRACKER_SKIP = os.environ.get('TRACKER_SKIP', '0') == '1'
+TRACKER_MAX_SKIP = int(os.environ.get('TRACKER_MAX_SKIP', 10))
+TRACKER_MIN_CONFIDENCE = float(os.environ.get('TRACKER_MIN_CONFIDENCE', 0.6))
+MOTION_GATE = os.environ.get('MOTION_GATE', '0') == '1'
+MOTION_METHOD = os.environ.get('MOTION_METHOD', 'diff')
+MOTION_WIDTH = int(os.environ.get('MOTION_WIDTH', 160))
+MOTION_PIXEL_THRESHOLD = int(os.environ.get('MOTION_PIXEL_THRESHOLD', 25))
+MOTION_MIN_AREA = float(os.environ.get('MOTION_MIN_AREA', 0.002))
+MOTION_REFRESH_SECONDS = float(os.environ.get('MOTION_REFRESH_SECONDS', 5))
+MOTION_REGIONS = os.environ.get('MOTION_REGIONS', '0') == '1'
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE', 8))
+JOB_DIR = os.environ.get('JOB_DIR', os.path.join(tempfile.gettempdir(), 'detection_jobs'))
+JOB_TTL = float(os.environ.get('JOB_TTL', 86400))
+VIDEO_DIR = os.environ.get('VIDEO_DIR', os.path.join(tempfile.gettempdir(), 'video_sessions'))
+VIDEO_MAX_DECODES = int(os.environ.get('VIDEO_MAX_DECODES', 4))
+VIDEO_IDLE_TIMEOUT = float(os.environ.get('VIDEO_IDLE_TIMEOUT', 600))
+VIDEO_MAX_UPLOAD_MB = float(os.environ.get('VIDEO_MAX_UPLOAD_MB', 1024))
+MODEL_IMGSZ = int(os.environ.get('MODEL_IMGSZ', 640))
+TILE_MIN_SIDE = int(os.environ.get('TILE_MIN_SIDE', 2000))
+TILE_SIZE = int(os.environ.get('TILE_SIZE', MODEL_IMGSZ))
+TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', 0.2))
+CACHE_MAX_MB = float(os.environ.get('CACHE_MAX_MB', 64))
+CACHE_SPILL_DIR = os.environ.get('CACHE_SPILL_DIR', '')
+CACHE_SPILL_MAX_MB = float(os.environ.get('CACHE_SPILL_MAX_MB', 512))
+EVENT_DB = os.environ.get('EVENT_DB', 'detection_events.db')
+EVENT_BATCH_SIZE = int(os.environ.get('EVENT_BATCH_SIZE', 500))
+EVENT_FLUSH_SECONDS = float(os.environ.get('EVENT_FLUSH_SECONDS', 1.0))
+EVENT_QUEUE_MAX = int(os.environ.get('EVENT_QUEUE_MAX', 100000))
+ALERT_CLASSES = [c.strip() for c in os.environ.get('ALERT_CLASSES', ','.join(WEAPON_CLASSES)).split(',') if c.strip()]
+ALERT_MIN_CONFIDENCE = float(os.environ.get('ALERT_MIN_CONFIDENCE', 0.4))
+ALERT_DEBOUNCE_SECONDS = float(os.environ.get('ALERT_DEBOUNCE_SECONDS', 10))
+ALERT_IOU = float(os.environ.get('ALERT_IOU', 0.3))
+ALERT_SINKS = os.environ.get('ALERT_SINKS', 'log')
+BUFFER_POOL_MB = float(os.environ.get('BUFFER_POOL_MB', 256))
+JPEG_QUALITY = int(os.environ.get('JPEG_QUALITY', 95))
+DETECT_RESPONSE_MODES = ('json', 'detections', 'jpeg', 'multipart')
+DETECTIONS_HEADER_MAX = int(os.environ.get('DETECTIONS_HEADER_MAX', 4096))
+SSE_KEEPALIVE_SECONDS = float(os.environ.get('SSE_KEEPALIVE_SECONDS', 15))
+SSE_MIN_INTERVAL = float(os.environ.get('SSE_MIN_INTERVAL', 0.5))
+STREAM_SOURCES = os.environ.get('STREAM_SOURCES', '')
+SOURCE_BATCH_SIZE = int(os.environ.get('SOURCE_BATCH_SIZE', BATCH_MAX_SIZE))
+SOURCE_PROCESS_WORKERS = int(os.environ.get('SOURCE_PROCESS_WORKERS', 4))
+STREAM_SERVER_PORT = int(os.environ.get('STREAM_SERVER_PORT', 0))
+STREAM_SERVER_HOST = os.environ.get('STREAM_SERVER_HOST', '0.0.0.0')
+STREAM_SERVER_WORKERS = int(os.environ.get('STREAM_SERVER_WORKERS', 32))
+STREAM_WRITE_TIMEOUT = float(os.environ.get('STREAM_WRITE_TIMEOUT', 5))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
 camera = None
-video_processor = None
-detected_objects = defaultdict(int)
+video_sessions = VideoSessionManager(VIDEO_DIR, VIDEO_MAX_DECODES, VIDEO_IDLE_TIMEOUT)
+detection_stats = DetectionStats()
+event_store = None
+profiler = metrics.SamplingProfiler()
+buffer_pool = BufferPool(int(BUFFER_POOL_MB * 1024 * 1024))
+gc_monitor = GCMonitor()
+stream_server = None
+
+STAGE_SECONDS = metrics.histogram('detection_stage_seconds', 'Time spent in each processing stage', ('path', 'stage'))
+REQUESTS = metrics.counter('detection_requests_total', 'Detection requests by path and outcome', ('path', 'outcome'))
+BATCH_SIZE = metrics.histogram('detection_batch_size', 'Images per batched forward pass', ('path',),
+                               buckets=(1, 2, 4, 8, 16, 32, 64))
+STREAM_FPS = metrics.gauge('detection_stream_fps', 'Frames per second of each stream stage', ('stream', 'stage'))
+QUEUE_DEPTH = metrics.gauge('detection_queue_depth', 'Items waiting in each queue', ('queue',))
+FRAMES_DROPPED = metrics.gauge('detection_frames_dropped', 'Frames dropped by each stream queue', ('stream', 'queue'))
+ACTIVE_VIEWERS = metrics.gauge('detection_active_viewers', 'Connected viewers per stream', ('stream',))
+MODEL_LOAD_SECONDS = metrics.gauge('detection_model_load_seconds', 'Time taken to load the model')
+MODEL_WARMUP_SECONDS = metrics.gauge('detection_model_warmup_seconds', 'Time taken by warmup inferences')
+MODEL_READY = metrics.gauge('detection_model_ready', '1 once the model is loaded and warmed up')
+ALERT_LATENCY = metrics.histogram('detection_alert_latency_seconds', 'Time from frame capture to alert publication',
+                                  ('source',), buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+BUFFER_BYTES = metrics.gauge('detection_buffer_bytes', 'Bytes allocated, copied and held by the buffer pool', ('kind',))
+GC_PAUSE_SECONDS = metrics.gauge('detection_gc_pause_seconds', 'Total garbage collector pause time', ('generation',))
+
+# Background services (threads, sinks, the model) are built by create_app(), not at import:
+# model worker processes re-import this module and must not start any of them
+alert_manager = None
+model_loader = None
+batcher = None
+decode_pool = None
+source_manager = None
+job_manager = None
 
 def download_weapon_model():
     """Download a pre-trained weapon detection model"""
@@ -26,13 +158,170 @@ def download_weapon_model():
         print("Model is downloaded!")
     return model_path
 
-try:
-    model_path = download_weapon_model()
-    model = YOLO(model_path)
-    print("YOLO model loaded successfully!")
-except Exception as e:
-    print(f"❌ Model loading failed: {e}")
-    model = None
+def load_model():
+    """Load the detector for MODEL_BACKEND and return (model_path, model)"""
+    if MODEL_WORKERS > 0:
+        return load_worker_pool()
+    if MODEL_BACKEND == 'stub':
+        return create_backend('stub', latency_ms=STUB_LATENCY_MS, per_image_ms=STUB_PER_IMAGE_MS)
+    
+    return create_backend(MODEL_BACKEND, download_weapon_model(), MODEL_CACHE_DIR, MODEL_IMGSZ,
+                          INFER_INTRA_THREADS, INFER_INTER_THREADS)
+
+def load_worker_pool():
+    """Start MODEL_WORKERS model processes; each loads and warms up its own model"""
+    if MODEL_BACKEND == 'stub':
+        options = {'latency_ms': STUB_LATENCY_MS, 'per_image_ms': STUB_PER_IMAGE_MS}
+    else:
+        options = {'weights': download_weapon_model(), 'cache_dir': MODEL_CACHE_DIR}
+    pool = ModelWorkerPool(MODEL_BACKEND, MODEL_WORKERS, MODEL_WORKER_THREADS, MODEL_WORKER_PIN,
+                           BATCH_MAX_SIZE, warmup_runs=MODEL_WARMUP_RUNS, imgsz=MODEL_IMGSZ,
+                           request_timeout=MODEL_WORKER_TIMEOUT, **options).start()
+    return pool.path, pool
+
+# The in-process model is not thread-safe: warmup and the batcher take turns on it.
+# Pool workers each own a model, so the pool is called without it.
+inference_lock = threading.Lock()
+
+def warmup_model(loaded_model):
+    """Run throwaway inferences so graph initialization happens before traffic"""
+    dummy = np.zeros((MODEL_IMGSZ, MODEL_IMGSZ, 3), np.uint8)
+    with inference_lock:
+        for batch_size in sorted({1, BATCH_MAX_SIZE}):
+            for _ in range(MODEL_WARMUP_RUNS):
+                loaded_model([dummy] * batch_size, conf=0.3, imgsz=MODEL_IMGSZ, verbose=False)
+
+def on_model_ready(path, loaded_model):
+    """Publish a loaded, warmed-up model to the request handlers"""
+    global model_path, model, image_annotator, stream_annotator
+    image_annotator = Annotator(loaded_model.names, font_scale=0.5)
+    stream_annotator = Annotator(loaded_model.names, font_scale=0.6)
+    if not alert_manager.set_names(loaded_model.names):
+        print(f"⚠️ None of the alert classes {ALERT_CLASSES} are known to the model; alerts are off")
+    model_path = path
+    model = loaded_model
+    MODEL_LOAD_SECONDS.set(model_loader.load_seconds)
+    MODEL_WARMUP_SECONDS.set(model_loader.warmup_seconds or 0.0)
+    print(f"YOLO model loaded successfully! ({MODEL_BACKEND} backend, {model_path})")
+
+model_path = None
+model = None
+image_annotator = None
+stream_annotator = None
+
+def wait_for_model():
+    """Wait up to MODEL_WAIT_TIMEOUT seconds for the model; True once it is ready"""
+    return model_loader.wait(MODEL_WAIT_TIMEOUT)
+
+def observe_stage(path, stage, seconds):
+    """Record the duration of one processing stage"""
+    STAGE_SECONDS.observe(seconds, path=path, stage=stage)
+
+def observe_batch(path, batch_info):
+    """Record queue wait, forward pass time and batch size reported by the batcher"""
+    STAGE_SECONDS.observe(batch_info['queue_wait_ms'] / 1000.0, path=path, stage='queue_wait')
+    STAGE_SECONDS.observe(batch_info['inference_ms'] / 1000.0, path=path, stage='inference')
+    BATCH_SIZE.observe(batch_info['batch_size'], path=path)
+
+def predict_batch(images, **params):
+    """Run one batched forward pass over a list of images"""
+    if MODEL_WORKERS > 0:
+        return model(images, verbose=False, **params)
+    with inference_lock:
+        return model(images, verbose=False, **params)
+
+detection_cache = DetectionCache(int(CACHE_MAX_MB * 1024 * 1024), CACHE_SPILL_DIR or None,
+                                 int(CACHE_SPILL_MAX_MB * 1024 * 1024))
+
+def predict_batched(path, images, **params):
+    """Send several images through the batcher together and wait for all results"""
+    pending = [batcher.submit(image, **params) for image in images]
+    results = []
+    for req in pending:
+        result, batch_info = req.wait()
+        observe_batch(path, batch_info)
+        results.append(result)
+    return results
+
+def predict_tiles(images, **params):
+    """Send all tiles of one image through the batcher together"""
+    return predict_batched('detect_tiled', images, **params)
+
+def publish_alerts(result, source, stream=None, frame=None, captured_at=None):
+    """Raise alerts for alert-class detections in a result"""
+    events = alert_manager.observe(result, source, stream, frame, captured_at)
+    for event in events:
+        ALERT_LATENCY.observe(event['latency_ms'] / 1000.0, source=source)
+    return events
+
+def stream_alerts(source, stream):
+    """Pipeline hook that checks each stream result for alerts right after inference"""
+    frames = itertools.count()
+    
+    def on_result(frame, result, captured_at):
+        publish_alerts(result, source, stream, next(frames), captured_at)
+    
+    return on_result
+
+def record_detections(counts, source='image', detections=None, stream=None):
+    """Add per-class counts to the dashboard statistics and log the detections"""
+    detection_stats.record(counts, source)
+    if detections and event_store is not None:
+        event_store.record(source, detections, stream=stream)
+
+def stream_events(source, stream):
+    """Frame-numbered event logger for one stream, or None when logging is off"""
+    return StreamEvents(event_store, source, stream) if event_store is not None else None
+
+def annotate_stream_frame(frame, result, source='video', events=None):
+    """Draw detections from a YOLO result onto a stream frame"""
+    detections, counts = stream_annotator.annotate(frame, result)
+    record_detections(counts, source)
+    if events is not None:
+        events.record(result, detections)
+    return frame
+
+def infer_stream_frame(frame):
+    """Run the detector on a single stream frame, batched with other streams and requests"""
+    return predict_batched('stream', [frame], conf=0.3)[0]
+
+def infer_stream_regions(crops):
+    """Run the detector on the changed regions of a stream frame through the batcher"""
+    return predict_batched('stream', crops, conf=0.3)
+
+def make_stream_detector(capture, use_tracker, motion_gate=False):
+    """Return the per-frame inference function for a stream"""
+    detector = infer_stream_frame
+    if use_tracker:
+        fps = capture.get(cv2.CAP_PROP_FPS) if capture is not None else 0
+        detector = TrackedDetector(infer_stream_frame, fps or 30.0,
+                                   TRACKER_MAX_SKIP, TRACKER_MIN_CONFIDENCE)
+    if motion_gate:
+        motion = MotionDetector(MOTION_METHOD, MOTION_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_AREA)
+        detector = MotionGatedDetector(detector, motion, MOTION_REFRESH_SECONDS,
+                                       infer_stream_regions if MOTION_REGIONS else None)
+    return detector
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+def encode_stream_frame(frame):
+    """JPEG-encode a frame as one part of an MJPEG response"""
+    ret, buffer = cv2.imencode('.jpg', frame)
+    if not ret:
+        return None
+    # One copy: join reads the encoder's array directly instead of via tobytes()
+    chunk = b''.join((MJPEG_PART_HEADER, buffer, b'\r\n'))
+    buffer_pool.note_allocation(buffer.nbytes)
+    buffer_pool.note_copy(len(chunk))
+    buffer_pool.note_frame()
+    return chunk
+
+def encode_pooled_frame(frame):
+    """Encode a pipeline frame, then return its buffer to the pool for the next capture"""
+    try:
+        return encode_stream_frame(frame)
+    finally:
+        buffer_pool.release(frame)
 
 class VideoProcessor:
     def __init__(self, video_path):
@@ -40,6 +329,8 @@ class VideoProcessor:
         self.video_path = video_path
         self.processing = False
         self.cap = None
+        # Capture runs on a pipeline thread; releasing cap mid-read crashes OpenCV
+        self._lock = threading.Lock()
         
     def start_processing(self):
         """Start video processing"""
@@ -47,111 +338,212 @@ class VideoProcessor:
         self.cap = cv2.VideoCapture(self.video_path)
         return self.cap.isOpened()
     
+    def read_frame(self):
+        """Read the next raw frame from the video into a pooled buffer"""
+        with self._lock:
+            if not self.processing or not self.cap or not self.cap.isOpened():
+                return None
+            return buffer_pool.read_frame(self.cap, self.video_path)
+    
     def get_next_frame(self):
         """Get next processed frame"""
-        if not self.processing or not self.cap or not self.cap.isOpened():
-            return None
-            
-        success, frame = self.cap.read()
-        if not success:
+        frame = self.read_frame()
+        if frame is None:
             return None
-        results = model(frame, conf=0.3, verbose=False)
-        if results[0].boxes is not None:
-            for box in results[0].boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                class_name = model.names[class_id]
-                global detected_objects
-                detected_objects[class_name] += 1
-                
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                if class_name in ['knife', 'scissors', 'gun']:
-                    color = (0, 0, 255)  # Red
-                elif class_name in ['person']:
-                    color = (255, 0, 0)  # Blue
-                elif class_name in ['car', 'truck', 'bus']:
-                    color = (0, 255, 255)  # Yellow
-                else:
-                    color = (0, 255, 0)  # Green
-                
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, f'{class_name} {confidence:.2f}', 
-                           (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        
-        return frame
+        return annotate_stream_frame(frame, infer_stream_frame(frame))
     
     def stop_processing(self):
         """Stop video processing"""
         self.processing = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        with self._lock:
+            if self.cap:
+                self.cap.release()
+                self.cap = None
 
-def generate_camera_frames():
-    """Generate frames from webcam"""
+# Capture runs on a pipeline thread; releasing the camera mid-read crashes OpenCV
+camera_lock = threading.Lock()
+
+def read_camera_frame():
+    """Read the next frame from the shared webcam"""
+    with camera_lock:
+        if camera is None:
+            return None
+        return buffer_pool.read_frame(camera, 'camera')
+
+def start_camera_pipeline():
+    """Open the webcam and start the shared camera pipeline"""
     global camera
     if camera is None:
-        camera = cv2.VideoCapture(0)
+        camera = cv2.VideoCapture(int(CAMERA_SOURCE) if CAMERA_SOURCE.isdigit() else CAMERA_SOURCE)
         if not camera.isOpened():
+            camera.release()
+            camera = None
             raise Exception("Could not open webcam")
     
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        results = model(frame, conf=0.3, verbose=False)
-        
-        if results[0].boxes is not None:
-            for box in results[0].boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                class_name = model.names[class_id]
-                global detected_objects
-                detected_objects[class_name] += 1
-                
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                
-                if class_name in ['knife', 'scissors', 'gun']:
-                    color = (0, 0, 255)
-                elif class_name in ['person']:
-                    color = (255, 0, 0)
-                elif class_name in ['car', 'truck', 'bus']:
-                    color = (0, 255, 255)
-                else:
-                    color = (0, 255, 0)
-                
-                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(frame, f'{class_name} {confidence:.2f}', 
-                           (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-        
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+    return StreamPipeline('camera', read_camera_frame, make_stream_detector(camera, TRACKER_SKIP, MOTION_GATE),
+                          partial(annotate_stream_frame, source='camera',
+                                  events=stream_events('camera', CAMERA_SOURCE)), encode_pooled_frame,
+                          queue_size=PIPELINE_QUEUE_SIZE,
+                          drop_oldest=CAMERA_DROP_OLDEST,
+                          observer=partial(observe_stage, 'camera'),
+                          result_fn=stream_alerts('camera', CAMERA_SOURCE),
+                          on_drop=buffer_pool.release).start()
 
-def generate_video_frames(video_path):
-    """Generate frames from uploaded video"""
-    global video_processor
-    
-    video_processor = VideoProcessor(video_path)
+camera_broadcaster = FrameBroadcaster('camera', start_camera_pipeline, CAMERA_CLIENT_BUFFER)
+
+def generate_camera_frames(subscriber):
+    """Generate webcam frames for one viewer of the shared camera stream"""
+    try:
+        yield from subscriber.frames()
+    finally:
+        camera_broadcaster.unsubscribe(subscriber)
+
+def start_video_stream(session, use_tracker=TRACKER_SKIP):
+    """Start the pipeline for a session's video; return (frames, stop) or None"""
+    video_processor = VideoProcessor(session.path)
     
     if not video_processor.start_processing():
+        return None
+    
+    detector = make_stream_detector(video_processor.cap, use_tracker)
+    stream = StreamPipeline(f'video-{session.id[:8]}', video_processor.read_frame, detector,
+                            partial(annotate_stream_frame, events=stream_events('video', session.id)),
+                            encode_pooled_frame,
+                            queue_size=PIPELINE_QUEUE_SIZE,
+                            drop_oldest=VIDEO_DROP_OLDEST,
+                            observer=partial(observe_stage, 'video'),
+                            result_fn=stream_alerts('video', session.id),
+                            on_drop=buffer_pool.release).start()
+
+    def stop():
+        session.remove_on_close(stop)
+        stream.stop()
+        video_processor.stop_processing()
+
+    session.on_close(stop)
+
+    return stream.frames(), stop
+
+def generate_video_frames(session, use_tracker=TRACKER_SKIP):
+    """Generate frames from a session's uploaded video"""
+    started = start_video_stream(session, use_tracker)
+    if started is None:
         yield b"data: Error: Could not open video\n\n"
         return
-    
-    while video_processor.processing:
-        frame = video_processor.get_next_frame()
-        if frame is None:
-            break
-            
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-    
-    video_processor.stop_processing()
+    frames, stop = started
+    try:
+        yield from frames
+    finally:
+        stop()
+
+def predict_sources(frames):
+    """Detect the newest frames of several sources through the batcher"""
+    # Fail fast: waiting here would stall the scheduler while frames go stale
+    if not model_loader.ready:
+        raise RuntimeError('Model not ready')
+    return predict_batched('sources', frames, conf=0.3)
+
+def process_source_frame(source, frame, result, captured_at):
+    """Check alerts and log one source frame; annotate and encode it only while watched"""
+    hooks = source_hooks.get(source.name)
+    if hooks is None:
+        return None
+    alerts, events = hooks
+    alerts(frame, result, captured_at)
+    if not source.viewers:
+        detections, counts = stream_annotator.annotate(None, result)
+        record_detections(counts, 'source')
+        if events is not None:
+            events.record(result, detections)
+        return None
+    return encode_stream_frame(annotate_stream_frame(frame, result, 'source', events))
+
+source_hooks = {}
+
+def add_stream_source(name, uri, fps=0.0, priority=1.0, loop=True):
+    """Register a monitored source and start capturing it"""
+    source = StreamSource(name, uri, fps, priority, loop, CAMERA_CLIENT_BUFFER, pool=buffer_pool)
+    source_manager.add(source)
+    # Frames that arrive before the hooks are set are skipped by process_source_frame
+    source_hooks[name] = (stream_alerts('source', name), stream_events('source', name))
+    return source
+
+def generate_source_frames(source, subscriber):
+    """Generate annotated frames of one monitored source for one viewer"""
+    try:
+        yield from subscriber.frames()
+    finally:
+        source.unsubscribe(subscriber)
+
+def open_camera_stream():
+    """Subscribe the async stream server to the shared camera stream"""
+    if not wait_for_model():
+        raise StreamError(503, 'Model not ready')
+    try:
+        subscriber = camera_broadcaster.subscribe()
+    except Exception as e:
+        raise StreamError(500, str(e))
+    return subscriber.frames(), partial(camera_broadcaster.unsubscribe, subscriber)
+
+def resolve_camera_stream(query):
+    """All async camera viewers share one broadcaster subscription"""
+    return 'camera', open_camera_stream
+
+def open_video_stream(session, use_tracker):
+    """Take a decode slot and start a session's video for the async stream server"""
+    if not wait_for_model():
+        raise StreamError(503, 'Model not ready')
+    if not video_sessions.begin_stream(session):
+        raise StreamError(429, 'Too many videos are being processed, try again later')
+    started = start_video_stream(session, use_tracker)
+    if started is None:
+        video_sessions.end_stream(session)
+        raise StreamError(500, 'Could not open video')
+    frames, stop = started
+
+    def close():
+        stop()
+        video_sessions.end_stream(session)
+
+    return frames, close
+
+def resolve_video_stream(query):
+    """Viewers of the same video share one decode and inference pipeline"""
+    session = video_sessions.get(query.get('video_id', ''))
+    if session is None or session.path is None:
+        raise StreamError(404, 'Video not found')
+    use_tracker = query.get('track', '1' if TRACKER_SKIP else '0') == '1'
+    return ('video', session.id, use_tracker), partial(open_video_stream, session, use_tracker)
+
+def resolve_source_stream(query, name):
+    """Async viewers of a monitored source read its frames directly"""
+    source = source_manager.get(name)
+    if source is None:
+        raise StreamError(404, 'Source not found')
+
+    def open_source():
+        subscriber = source.subscribe()
+        return subscriber.frames(), partial(source.unsubscribe, subscriber)
+
+    return ('source', name), open_source
+
+def route_source_stream(name):
+    """Expose a source's feed on the async stream server, if it is running"""
+    if stream_server is not None:
+        stream_server.route(f'/sources/{name}/feed', partial(resolve_source_stream, name=name))
+
+def start_stream_server():
+    """Serve /camera_feed and /video_feed_stream from the asyncio stream server"""
+    server = StreamServer(STREAM_SERVER_HOST, STREAM_SERVER_PORT, STREAM_WRITE_TIMEOUT, STREAM_SERVER_WORKERS)
+    server.route('/camera_feed', resolve_camera_stream)
+    server.route('/video_feed_stream', resolve_video_stream)
+    for name in source_manager.names():
+        server.route(f'/sources/{name}/feed', partial(resolve_source_stream, name=name))
+    try:
+        return server.start()
+    except OSError as e:
+        print(f"⚠️ Async stream server not started on port {STREAM_SERVER_PORT}: {e}")
+        return None
 
 @app.route('/')
 def index():
@@ -178,6 +570,7 @@ def index():
             .dashboard h3 { margin-top: 0; }
             .dashboard ul { list-style: none; padding: 0; }
             .dashboard li { padding: 5px 0; }
+            .alerts li { color: #ff4444; }
             .loading { text-align: center; padding: 10px; color: #00ff88; }
             .error { color: red; }
             .success { color: #00ff88; }
@@ -233,9 +626,20 @@ def index():
                 </ul>
                 <button class="clear-btn" onclick="clearDashboard()">🗑️ Clear Dashboard</button>
             </div>
+            <div class="dashboard alerts">
+                <h3>🚨 Weapon Alerts</h3>
+                <ul id="alertList">
+                    <li>No alerts yet</li>
+                </ul>
+            </div>
         </div>
         <script>
             let currentVideoStream = null;
+            let currentVideoId = null;
+            const streamPort = __STREAM_PORT__;
+            function streamUrl(path) {
+                return streamPort ? location.protocol + '//' + location.hostname + ':' + streamPort + path : path;
+            }
             function openTab(evt, tabName) {
                 var i, tabcontent, tablinks;
                 tabcontent = document.getElementsByClassName("tabcontent");
@@ -251,17 +655,19 @@ def index():
                 updateDashboard(); 
             }
 
+            function renderDashboard(data) {
+                let html = '';
+                for (let obj in data) {
+                    html += `<li>${obj}: ${data[obj]} times</li>`;
+                }
+                if (html === '') html = '<li>No detections yet</li>';
+                document.getElementById('objectList').innerHTML = html;
+            }
+
             function updateDashboard() {
                 fetch('/get_detections')
                     .then(response => response.json())
-                    .then(data => {
-                        let html = '';
-                        for (let obj in data) {
-                            html += `<li>${obj}: ${data[obj]} times</li>`;
-                        }
-                        if (html === '') html = '<li>No detections yet</li>';
-                        document.getElementById('objectList').innerHTML = html;
-                    })
+                    .then(data => renderDashboard(data))
                     .catch(error => console.error('Dashboard update error:', error));
             }
 
@@ -286,7 +692,28 @@ def index():
                 }
             }
 
-            setInterval(updateDashboard, 2000); // Update every 2 seconds
+            let alertCount = 0;
+            function showAlert(alert) {
+                const list = document.getElementById('alertList');
+                if (alertCount === 0) list.innerHTML = '';
+                alertCount++;
+                const item = document.createElement('li');
+                const where = alert.stream ? `${alert.source} ${alert.stream}` : alert.source;
+                item.textContent = `${new Date(alert.ts * 1000).toLocaleTimeString()} ${alert.class} ` +
+                    `${alert.confidence.toFixed(2)} (${where}, ${Math.round(alert.latency_ms)} ms)`;
+                list.insertBefore(item, list.firstChild);
+                while (list.children.length > 20) list.removeChild(list.lastChild);
+            }
+
+            if (window.EventSource) {
+                const dashboardEvents = new EventSource('/detections_stream');
+                dashboardEvents.onmessage = event => renderDashboard(JSON.parse(event.data).totals);
+                const alertEvents = new EventSource('/alerts_stream');
+                alertEvents.addEventListener('alert', event => showAlert(JSON.parse(event.data)));
+            } else {
+                setInterval(updateDashboard, 2000); // Update every 2 seconds
+            }
+            updateDashboard();
 
             document.getElementById('fileInput').onchange = function() {
                 if (this.files[0]) {
@@ -359,6 +786,11 @@ def index():
                     return;
                 }
                 
+                if (currentVideoId) {
+                    fetch('/stop_video?video_id=' + encodeURIComponent(currentVideoId));
+                    currentVideoId = null;
+                }
+                
                 const formData = new FormData();
                 formData.append('video', videoInput.files[0]);
                 
@@ -376,7 +808,8 @@ def index():
                 .then(data => {
                     if (data.success) {
                         document.getElementById('videoResult').innerHTML = '<p style="color: #00ff88;">Video processing started!</p>';
-                        videoFeed.src = '/video_feed_stream';
+                        currentVideoId = data.video_id;
+                        videoFeed.src = streamUrl('/video_feed_stream?video_id=' + encodeURIComponent(data.video_id));
                         currentVideoStream = videoFeed.src;
                     } else {
                         document.getElementById('videoResult').innerHTML = '<p class="error">❌ Error: ' + data.error + '</p>';
@@ -398,18 +831,21 @@ def index():
                 document.getElementById('videoResult').innerHTML = '<p>Video processing stopped</p>';
                 document.querySelector('#Video .stop-btn').style.display = 'none';
                 
-                fetch('/stop_video')
-                    .then(response => response.json())
-                    .then(data => console.log(data.status))
-                    .catch(error => console.error('Stop video error:', error));
+                if (currentVideoId) {
+                    fetch('/stop_video?video_id=' + encodeURIComponent(currentVideoId))
+                        .then(response => response.json())
+                        .then(data => console.log(data.status))
+                        .catch(error => console.error('Stop video error:', error));
+                }
                 
                 currentVideoStream = null;
+                currentVideoId = null;
             }
 
             function startCamera() {
                 const liveFeed = document.getElementById('liveFeed');
                 liveFeed.style.display = 'block';
-                liveFeed.src = '/camera_feed';
+                liveFeed.src = streamUrl('/camera_feed');
                 document.querySelector('#Live .stop-btn').style.display = 'inline-block';
             }
             
@@ -426,13 +862,78 @@ def index():
         </script>
     </body>
     </html>
-    '''
+    '''.replace('__STREAM_PORT__', str(stream_server.port if stream_server is not None else 0))
+
+def annotate_detections(image, result, source='image', stream=None, log_events=True):
+    """Draw detections from a YOLO result onto image and return them as dicts"""
+    detections, counts = image_annotator.annotate(image, result)
+    record_detections(counts, source, detections if log_events else None, stream)
+    return detections
+
+def record_job_events(job, frame_index, detections):
+    """Log the detections of one job frame with its frame number"""
+    if event_store is not None:
+        event_store.record('job', detections, frame_index, job.id)
+
+def detect_response_mode():
+    """Pick the /detect response mode from the request or its Accept header"""
+    mode = request.values.get('response')
+    if mode:
+        return mode.lower()
+    best = request.accept_mimetypes.best_match(['application/json', 'image/jpeg', 'multipart/mixed'])
+    return {'image/jpeg': 'jpeg', 'multipart/mixed': 'multipart'}.get(best, 'json')
+
+def detect_response(mode, detections, jpeg, meta):
+    """Build a /detect response in the requested mode"""
+    if mode == 'detections':
+        return jsonify({'success': True, 'detections': detections, **meta})
+    
+    if mode == 'jpeg':
+        headers = {
+            'X-Detection-Count': str(len(detections)),
+            'X-Cache': meta['cache'],
+        }
+        # Proxies reject headers over ~8 KB; past the cap clients fetch response=detections instead
+        encoded = json.dumps(detections, separators=(',', ':'))
+        if len(encoded) <= DETECTIONS_HEADER_MAX:
+            headers['X-Detections'] = encoded
+        else:
+            headers['X-Detections-Omitted'] = 'true'
+        if 'batch' in meta:
+            headers['X-Batch-Size'] = str(meta['batch']['batch_size'])
+            headers['X-Queue-Wait-Ms'] = str(meta['batch']['queue_wait_ms'])
+        if 'tiling' in meta:
+            headers['X-Tiles'] = str(meta['tiling']['tiles'])
+            headers['X-Tile-Ms'] = str(meta['tiling']['per_tile_ms'])
+        return Response(jpeg, mimetype='image/jpeg', headers=headers)
+    
+    if mode == 'multipart':
+        boundary = 'detection-' + os.urandom(8).hex()
+        metadata = json.dumps({'success': True, 'detections': detections, **meta}).encode('utf-8')
+        body = b''.join([
+            f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode('ascii'), metadata,
+            f'\r\n--{boundary}\r\nContent-Type: image/jpeg\r\n'
+            f'Content-Length: {len(jpeg)}\r\n\r\n'.encode('ascii'), jpeg,
+            f'\r\n--{boundary}--\r\n'.encode('ascii'),
+        ])
+        return Response(body, mimetype=f'multipart/mixed; boundary={boundary}')
+    
+    with STAGE_SECONDS.time(path='detect', stage='base64'):
+        image_url = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('utf-8')
+    buffer_pool.note_copy(len(image_url))
+    return jsonify({
+        'success': True,
+        'detections': detections,
+        'image': image_url,
+        **meta
+    })
 
 @app.route('/detect', methods=['POST'])
 def detect_objects():
-    if model is None:
-        print("Error: Model not loaded")
-        return jsonify({'success': False, 'error': 'Model not loaded'})
+    received_at = time.time()
+    if not wait_for_model():
+        print("Error: Model not ready")
+        return jsonify({'success': False, 'error': 'Model not ready'}), 503
     
     if 'image' not in request.files:
         print("Error: No image provided")
@@ -443,147 +944,763 @@ def detect_objects():
         print("Error: No file selected")
         return jsonify({'success': False, 'error': 'No file selected'})
     
+    mode = detect_response_mode()
+    if mode not in DETECT_RESPONSE_MODES:
+        return jsonify({'success': False, 'error': f'Unknown response mode: {mode}'})
+    
+    try:
+        quality = min(100, max(1, int(request.values.get('quality', JPEG_QUALITY))))
+        scale = min(1.0, max(0.05, float(request.values.get('scale', 1.0))))
+        tile_size = max(64, int(request.values.get('tile_size', TILE_SIZE)))
+        tile_overlap = min(0.9, max(0.0, float(request.values.get('tile_overlap', TILE_OVERLAP))))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid quality, scale or tile settings'})
+    tile_mode = request.values.get('tile', 'auto').lower()
+    if tile_mode not in ('auto', '1', '0'):
+        return jsonify({'success': False, 'error': f'Unknown tile mode: {tile_mode}'})
+    want_image = mode != 'detections'
+    default_output = quality == JPEG_QUALITY and scale == 1.0
+    
+    lease = None
     try:
-        image_data = file.read()
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image_data, lease = buffer_pool.read_stream(file.stream)
+        params = {'conf': 0.3, 'imgsz': MODEL_IMGSZ}
+        key = cache_key(image_data, model=model_path, tile=tile_mode, tile_size=tile_size,
+                        tile_overlap=tile_overlap, **params)
+        cached = detection_cache.get(key)
+        if cached is not None and (not want_image or (default_output and cached[1] is not None)):
+            detections, jpeg = cached
+            record_detections(Counter(det['object'] for det in detections), detections=detections)
+            print(f"Cache hit - returning {len(detections)} cached detections")
+            REQUESTS.inc(path='detect', outcome='cache_hit')
+            return detect_response(mode, detections, jpeg, {'cache': 'hit'})
+        
+        with STAGE_SECONDS.time(path='detect', stage='decode'):
+            image = cv2.imdecode(image_data, cv2.IMREAD_COLOR)
         
         if image is None:
             print("Error: Could not decode image data")
+            REQUESTS.inc(path='detect', outcome='error')
             return jsonify({'success': False, 'error': 'Could not read image'})
+        buffer_pool.note_allocation(image.nbytes)
+        buffer_pool.note_frame()
         
         print(f"Image shape: {image.shape} - Processing with YOLO...")
-        results = model(image, conf=0.3, verbose=False)
+        if tile_mode == '1' or (tile_mode == 'auto' and should_tile(image, TILE_MIN_SIDE)):
+            tiler = TiledDetector(predict_tiles, tile_size, tile_overlap)
+            result, tile_info = tiler.detect(image, **params)
+            observe_stage('detect', 'tile_merge', tile_info['merge_ms'] / 1000.0)
+            print(f"Tiled inference: {tile_info['tiles']} tiles, {tile_info['per_tile_ms']:.1f} ms per tile")
+            meta = {'tiling': tile_info, 'cache': 'miss'}
+        else:
+            result, batch_info = batcher.infer(image, **params)
+            observe_batch('detect', batch_info)
+            print(f"Batch size {batch_info['batch_size']}, queue wait {batch_info['queue_wait_ms']:.1f} ms")
+            meta = {'batch': batch_info, 'cache': 'miss'}
+        REQUESTS.inc(path='detect', outcome='ok')
+        alerts = publish_alerts(result, 'image', request.values.get('stream'), captured_at=received_at)
+        if alerts:
+            meta['alerts'] = alerts
         
-        detections = []
-        annotated_image = image.copy()
+        if not want_image:
+            with STAGE_SECONDS.time(path='detect', stage='postprocess'):
+                detections = annotate_detections(None, result)
+            detection_cache.put(key, detections, None)
+            print(f"Returning {len(detections)} detections")
+            return detect_response(mode, detections, None, meta)
         
-        if results[0].boxes is not None:
-            print(f"Detected {len(results[0].boxes)} objects")
-            for box in results[0].boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                class_name = model.names[class_id]
-                global detected_objects
-                detected_objects[class_name] += 1
-                
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                
-                color = (0, 0, 255) if class_name in ['knife', 'scissors', 'gun'] else (0, 255, 0)
-                cv2.rectangle(annotated_image, (x1, y1), (x2, y2), color, 2)
-                cv2.putText(annotated_image, f'{class_name} {confidence:.2f}', 
-                           (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                
-                detections.append({
-                    'object': class_name,
-                    'confidence': confidence,
-                    'bbox': [x1, y1, x2, y2]
-                })
+        # Nothing reads the decoded image after inference, so boxes are drawn onto it directly
+        with STAGE_SECONDS.time(path='detect', stage='annotate'):
+            annotated_image = image
+            detections = annotate_detections(annotated_image, result)
+        if detections:
+            print(f"Detected {len(detections)} objects")
         else:
             print("No objects detected in image")
         
-        _, buffer = cv2.imencode('.jpg', annotated_image)
-        if buffer is None:
+        with STAGE_SECONDS.time(path='detect', stage='encode'):
+            resized = None
+            if scale != 1.0:
+                height, width = annotated_image.shape[:2]
+                resized = buffer_pool.acquire((max(1, round(height * scale)), max(1, round(width * scale)),
+                                               annotated_image.shape[2]))
+                annotated_image = cv2.resize(annotated_image, (resized.shape[1], resized.shape[0]), dst=resized,
+                                             interpolation=cv2.INTER_AREA)
+            ok, buffer = cv2.imencode('.jpg', annotated_image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if resized is not None:
+                buffer_pool.release(resized)
+        if not ok:
             print("Error: Failed to encode annotated image")
             return jsonify({'success': False, 'error': 'Failed to encode annotated image'})
         
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
+        jpeg = buffer.tobytes()
+        buffer_pool.note_allocation(buffer.nbytes)
+        buffer_pool.note_copy(len(jpeg))
+        if default_output:
+            detection_cache.put(key, detections, jpeg)
         
         print(f"Returning {len(detections)} detections and annotated image")
-        return jsonify({
-            'success': True,
-            'detections': detections,
-            'image': f'data:image/jpeg;base64,{image_base64}'
-        })
+        return detect_response(mode, detections, jpeg, meta)
         
     except Exception as e:
         print(f"Exception in detect_objects: {str(e)}")
+        REQUESTS.inc(path='detect', outcome='error')
+        return jsonify({'success': False, 'error': str(e)})
+    finally:
+        if lease is not None:
+            buffer_pool.release(lease)
+
+def read_batch_uploads(files, max_images=BATCH_MAX_IMAGES, max_bytes=None):
+    """Collect (name, bytes) pairs from uploaded images and zip/tar archives
+
+    Archive members are counted against max_images and their uncompressed
+    size against max_bytes before they are extracted, so a small archive
+    cannot expand past the limits; raises ValueError when one is exceeded.
+    """
+    if max_bytes is None:
+        max_bytes = int(BATCH_MAX_MB * 1024 * 1024)
+    items = []
+    total = 0
+
+    def admit(size):
+        nonlocal total
+        total += size
+        if len(items) >= max_images:
+            raise ValueError(f'Too many images (limit {max_images})')
+        if total > max_bytes:
+            raise ValueError(f'Images exceed {max_bytes / (1024 * 1024):g} MB uncompressed')
+
+    for file in files:
+        if file.filename == '':
+            continue
+        name = file.filename.lower()
+        data = file.read()
+        if name.endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS):
+                        # zipfile never returns more than a member's declared file_size
+                        admit(info.file_size)
+                        items.append((info.filename, archive.read(info)))
+        elif name.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')):
+            with tarfile.open(fileobj=io.BytesIO(data), mode='r:*') as archive:
+                for member in archive:
+                    if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                        admit(member.size)
+                        items.append((member.name, archive.extractfile(member).read()))
+        else:
+            admit(len(data))
+            items.append((file.filename, data))
+    return items
+
+def detect_batch_item(index, name, data, annotate, conf):
+    """Decode, detect and optionally annotate one image of a batch request"""
+    started = time.perf_counter()
+    with STAGE_SECONDS.time(path='batch', stage='decode'):
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        REQUESTS.inc(path='batch', outcome='error')
+        return {'index': index, 'name': name, 'success': False, 'error': 'Could not read image'}
+    
+    result, batch_info = batcher.infer(image, conf=conf)
+    observe_batch('batch', batch_info)
+    REQUESTS.inc(path='batch', outcome='ok')
+    annotated_image = image if annotate else None
+    with STAGE_SECONDS.time(path='batch', stage='annotate'):
+        detections = annotate_detections(annotated_image, result, source='batch', stream=name)
+    
+    item = {
+        'index': index,
+        'name': name,
+        'success': True,
+        'detections': detections,
+        'batch': batch_info
+    }
+    if annotate:
+        with STAGE_SECONDS.time(path='batch', stage='encode'):
+            ok, buffer = cv2.imencode('.jpg', annotated_image)
+        if ok:
+            item['image'] = 'data:image/jpeg;base64,' + base64.b64encode(buffer).decode('utf-8')
+    item['elapsed_ms'] = round(1000.0 * (time.perf_counter() - started), 3)
+    return item
+
+@app.route('/detect_batch', methods=['POST'])
+def detect_batch():
+    """Detect objects in many images and stream results as NDJSON"""
+    if not wait_for_model():
+        return jsonify({'success': False, 'error': 'Model not ready'}), 503
+    
+    files = request.files.getlist('images') + request.files.getlist('archive')
+    if not files:
+        return jsonify({'success': False, 'error': 'No images provided'})
+    
+    annotate = request.values.get('annotate', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        conf = float(request.values.get('conf', 0.3))
+        items = read_batch_uploads(files)
+    except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
+    
+    if not items:
+        return jsonify({'success': False, 'error': 'No images found in upload'})
+    
+    def generate():
+        started = time.perf_counter()
+        futures = {decode_pool.submit(detect_batch_item, i, name, data, annotate, conf): (i, name)
+                   for i, (name, data) in enumerate(items)}
+        failed = 0
+        try:
+            for future in as_completed(futures):
+                try:
+                    item = future.result()
+                except Exception as e:
+                    index, name = futures[future]
+                    item = {'index': index, 'name': name, 'success': False, 'error': str(e)}
+                if not item['success']:
+                    failed += 1
+                yield json.dumps(item) + '\n'
+            yield json.dumps({
+                'done': True,
+                'count': len(items),
+                'failed': failed,
+                'elapsed_ms': round(1000.0 * (time.perf_counter() - started), 3)
+            }) + '\n'
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def receive_video(dest_stem):
+    """Stream the uploaded video in the request body to dest_stem.<container>"""
+    return receive_upload(request.stream, request.content_type, dest_stem,
+                          max_bytes=int(VIDEO_MAX_UPLOAD_MB * 1024 * 1024))
 
 @app.route('/upload_video', methods=['POST'])
 def upload_video():
-    """Handle video upload and initiate processing"""
-    if 'video' not in request.files:
-        return jsonify({'success': False, 'error': 'No video provided'})
-    
-    file = request.files['video']
-    if file.filename == '':
-        return jsonify({'success': False, 'error': 'No file selected'})
+    """Stream a video upload into a new session and return its video_id"""
+    if request.args.get('mode') == 'job':
+        return create_job()
     
+    session = video_sessions.create()
     try:
-        temp_dir = tempfile.gettempdir()
-        video_path = os.path.join(temp_dir, 'uploaded_video.mp4')
-        file.save(video_path)
+        upload = receive_video(os.path.join(session.dir, 'source'))
+        if upload['fields'].get('mode') == 'job':
+            job_id, job_dir = job_manager.new_job_dir()
+            source_path = os.path.join(job_dir, os.path.basename(upload['path']))
+            os.replace(upload['path'], source_path)
+            video_sessions.close(session.id)
+            return submit_job(job_id, job_dir, source_path, upload['fields'])
         
-        cap = cv2.VideoCapture(video_path)
+        cap = cv2.VideoCapture(upload['path'])
         if not cap.isOpened():
-            os.remove(video_path)
+            video_sessions.close(session.id)
             return jsonify({'success': False, 'error': 'Could not open video file'})
         cap.release()
         
-        return jsonify({'success': True, 'message': 'Video uploaded successfully'})
+        session.path = upload['path']
+        session.filename = upload['filename']
+        session.bytes = upload['bytes']
+        return jsonify({'success': True, 'message': 'Video uploaded successfully', 'video_id': session.id})
         
     except Exception as e:
+        video_sessions.close(session.id)
+        return jsonify({'success': False, 'error': str(e)})
+
+def submit_job(job_id, job_dir, source_path, fields):
+    """Queue a received video as an offline job"""
+    if not wait_for_model():
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return jsonify({'success': False, 'error': 'Model not ready'}), 503
+    try:
+        conf = float(fields.get('conf', request.args.get('conf', 0.3)))
+        job = job_manager.submit(job_id, job_dir, source_path, conf=conf)
+        return jsonify({'success': True, 'job': job.to_dict()})
+    except Exception as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue an uploaded video for offline analysis"""
+    if not wait_for_model():
+        return jsonify({'success': False, 'error': 'Model not ready'}), 503
+    
+    job_id, job_dir = job_manager.new_job_dir()
+    try:
+        upload = receive_video(os.path.join(job_dir, 'source'))
+    except Exception as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        return jsonify({'success': False, 'error': str(e)})
+    return submit_job(job_id, job_dir, upload['path'], upload['fields'])
+
+@app.route('/jobs')
+def list_jobs():
+    """List offline video jobs"""
+    return jsonify({'success': True, 'jobs': job_manager.list()})
+
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def job_status(job_id):
+    """Return job progress, or delete the job and its files"""
+    if request.method == 'DELETE':
+        if not job_manager.delete(job_id):
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True})
+    
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/video')
+def job_video(job_id):
+    """Download the annotated MP4 of a finished job"""
+    job = job_manager.get(job_id)
+    if job is None or job.status != 'completed':
+        return jsonify({'success': False, 'error': 'Job not found or not completed'}), 404
+    return send_from_directory(job.job_dir, os.path.basename(job.video_path),
+                               mimetype='video/mp4', as_attachment=True,
+                               download_name=f'{job_id}.mp4')
+
+@app.route('/jobs/<job_id>/detections')
+def job_detections(job_id):
+    """Download the per-frame detections JSONL of a job"""
+    job = job_manager.get(job_id)
+    if job is None or not os.path.exists(job.detections_path):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return send_from_directory(job.job_dir, os.path.basename(job.detections_path),
+                               mimetype='application/x-ndjson', as_attachment=True,
+                               download_name=f'{job_id}.jsonl')
+
 @app.route('/video_feed_stream')
 def video_feed_stream():
-    """Stream processed video frames"""
-    temp_dir = tempfile.gettempdir()
-    video_path = os.path.join(temp_dir, 'uploaded_video.mp4')
-    
-    if not os.path.exists(video_path):
+    """Stream processed frames of an uploaded video"""
+    if not wait_for_model():
+        return Response("Model not ready", status=503)
+    session = video_sessions.get(request.args.get('video_id', ''))
+    if session is None or session.path is None:
         return Response("Video not found", status=404)
+    if not video_sessions.begin_stream(session):
+        return Response("Too many videos are being processed, try again later", status=429)
     
-    return Response(generate_video_frames(video_path),
-                   mimetype='multipart/x-mixed-replace; boundary=frame')
+    use_tracker = request.args.get('track', '1' if TRACKER_SKIP else '0') == '1'
+    response = Response(generate_video_frames(session, use_tracker),
+                        mimetype='multipart/x-mixed-replace; boundary=frame')
+    response.call_on_close(partial(video_sessions.end_stream, session))
+    return response
 
 @app.route('/camera_feed')
 def camera_feed():
     """Stream live camera frames"""
-    return Response(generate_camera_frames(),
+    if not wait_for_model():
+        return Response("Model not ready", status=503)
+    try:
+        subscriber = camera_broadcaster.subscribe()
+    except Exception as e:
+        return Response(str(e), status=500)
+    return Response(generate_camera_frames(subscriber),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/stop_video')
 def stop_video():
-    """Stop video processing"""
-    global video_processor
-    if video_processor:
-        video_processor.stop_processing()
-        video_processor = None
-    
-    temp_dir = tempfile.gettempdir()
-    video_path = os.path.join(temp_dir, 'uploaded_video.mp4')
-    if os.path.exists(video_path):
-        os.remove(video_path)
-    
-    return jsonify({'status': 'video stopped'})
+    """Stop processing a video session and delete its files"""
+    video_id = request.args.get('video_id', '')
+    if not video_sessions.close(video_id):
+        return jsonify({'status': 'video not found', 'video_id': video_id}), 404
+    return jsonify({'status': 'video stopped', 'video_id': video_id})
+
+@app.route('/sources', methods=['GET', 'POST'])
+def stream_sources():
+    """List monitored sources with batch stats, or register a new one"""
+    if request.method == 'GET':
+        return jsonify(source_manager.stats())
+    data = request.get_json(silent=True) or request.form
+    try:
+        name, uri = str(data.get('name', '')), str(data.get('uri', ''))
+        if not uri:
+            raise ValueError('uri is required')
+        loop = str(data.get('loop', '1')).lower() not in ('0', 'false')
+        add_stream_source(name, uri, float(data.get('fps', 0)), float(data.get('priority', 1)), loop)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    route_source_stream(name)
+    return jsonify({'success': True, 'source': name, 'feed': f'/sources/{name}/feed'})
+
+@app.route('/sources/<name>', methods=['DELETE'])
+def delete_stream_source(name):
+    """Stop a monitored source and disconnect its viewers"""
+    if not source_manager.remove(name):
+        return jsonify({'success': False, 'error': 'Source not found'}), 404
+    source_hooks.pop(name, None)
+    if stream_server is not None:
+        stream_server.unroute(f'/sources/{name}/feed')
+    return jsonify({'success': True, 'source': name})
+
+@app.route('/sources/<name>/feed')
+def source_feed(name):
+    """Stream the annotated frames of one monitored source"""
+    source = source_manager.get(name)
+    if source is None:
+        return Response("Source not found", status=404)
+    return Response(generate_source_frames(source, source.subscribe()),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/stream_server')
+def stream_server_stats():
+    """Viewer and frame delivery counts of the async stream server"""
+    if stream_server is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **stream_server.stats()})
+
+@app.route('/video_sessions')
+def video_session_stats():
+    """List video sessions and decode slot usage"""
+    return jsonify(video_sessions.stats())
 
 @app.route('/stop_camera')
 def stop_camera():
     """Stop camera stream"""
     global camera
-    if camera is not None:
-        camera.release()
-        camera = None
+    camera_broadcaster.stop()
+    with camera_lock:
+        if camera is not None:
+            camera.release()
+            camera = None
     return jsonify({'status': 'camera stopped'})
 
+@app.route('/healthz')
+def healthz():
+    """Liveness probe: the server is up and answering requests"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before"""
+    status = model_loader.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 @app.route('/get_detections')
 def get_detections():
-    """Return current count of detected objects"""
-    global detected_objects
-    return jsonify(dict(detected_objects))
+    """Return current count of detected objects
+
+    Without arguments this returns the all-time {class: count} totals. With
+    window=minute|hour|day it returns counts for that window, and source=
+    narrows either to one source. With since=<version> the request
+    long-polls for up to wait seconds until the statistics change and
+    returns a full snapshot.
+    """
+    source = request.args.get('source') or None
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+            wait = min(float(request.args.get('wait', 25)), 60.0)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Invalid since or wait'})
+        detection_stats.wait_for_change(since, wait)
+        return jsonify(detection_stats.snapshot(source))
+    
+    window = request.args.get('window')
+    if window:
+        if window not in WINDOWS:
+            return jsonify({'success': False, 'error': f'Unknown window: {window}'})
+        return jsonify(detection_stats.window(WINDOWS[window], source)[0])
+    return jsonify(detection_stats.totals(source))
+
+@app.route('/detections_stream')
+def detections_stream():
+    """Push detection statistics to the dashboard as Server-Sent Events"""
+    source = request.args.get('source') or None
+    
+    def generate():
+        version = -1
+        while True:
+            current = detection_stats.wait_for_change(version, SSE_KEEPALIVE_SECONDS)
+            if current == version:
+                yield ': keepalive\n\n'
+                continue
+            version = current
+            snapshot = detection_stats.snapshot(source)
+            yield f'id: {snapshot["version"]}\ndata: {json.dumps(snapshot)}\n\n'
+            time.sleep(SSE_MIN_INTERVAL)
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def parse_time(value):
+    """Parse epoch seconds or an ISO 8601 timestamp; None passes through"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def event_filters():
+    """Read the shared /events filters from the query string"""
+    min_confidence = request.args.get('min_confidence')
+    return {
+        'start': parse_time(request.args.get('start')),
+        'end': parse_time(request.args.get('end')),
+        'source': request.args.get('source') or None,
+        'cls': request.args.get('class') or None,
+        'stream': request.args.get('stream') or None,
+        'min_confidence': float(min_confidence) if min_confidence else None,
+    }
+
+@app.route('/events')
+def query_events():
+    """Return logged detection events filtered by time range, class, source and stream"""
+    if event_store is None:
+        return jsonify({'success': False, 'error': 'Event store is disabled (EVENT_DB is empty)'})
+    try:
+        filters = event_filters()
+        limit = min(max(1, int(request.args.get('limit', 100))), 10000)
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid query: {e}'})
+    order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+    events = event_store.query(limit, offset, order, **filters)
+    return jsonify({'success': True, 'events': events, 'count': len(events), 'offset': offset})
+
+@app.route('/events/aggregate')
+def aggregate_events():
+    """Count logged detections per class, source or stream, optionally per time bucket"""
+    if event_store is None:
+        return jsonify({'success': False, 'error': 'Event store is disabled (EVENT_DB is empty)'})
+    try:
+        filters = event_filters()
+        rows = event_store.aggregate(request.args.get('group_by', 'class'),
+                                     request.args.get('bucket') or None, **filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid query: {e}'})
+    return jsonify({'success': True, 'rows': rows})
+
+@app.route('/events/stats')
+def event_store_stats():
+    """Return rows written, queued and dropped by the event store"""
+    if event_store is None:
+        return jsonify({'success': False, 'error': 'Event store is disabled (EVENT_DB is empty)'})
+    return jsonify(event_store.stats())
+
+def decode_upload(file, path):
+    """Decode an uploaded image straight from the request's upload buffer"""
+    data, lease = buffer_pool.read_stream(file.stream)
+    try:
+        with STAGE_SECONDS.time(path=path, stage='decode'):
+            image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    finally:
+        if lease is not None:
+            buffer_pool.release(lease)
+    if image is not None:
+        buffer_pool.note_allocation(image.nbytes)
+        buffer_pool.note_frame()
+    return image
+
+@app.route('/alerts/detect', methods=['POST'])
+def detect_alerts():
+    """Alert fast path: run inference for the alert classes only and publish alerts"""
+    received_at = time.time()
+    if not wait_for_model():
+        return jsonify({'success': False, 'error': 'Model not ready'}), 503
+    if not alert_manager.class_ids:
+        return jsonify({'success': False, 'error': 'No alert classes are known to the model'})
+    file = request.files.get('image')
+    if file is None or file.filename == '':
+        return jsonify({'success': False, 'error': 'No image provided'})
+    
+    try:
+        image = decode_upload(file, 'alerts')
+        if image is None:
+            return jsonify({'success': False, 'error': 'Could not read image'})
+        result, batch_info = batcher.infer(image, conf=ALERT_MIN_CONFIDENCE, imgsz=MODEL_IMGSZ,
+                                           classes=tuple(alert_manager.class_ids))
+        observe_batch('alerts', batch_info)
+        REQUESTS.inc(path='alerts', outcome='ok')
+        alerts = publish_alerts(result, 'alert_fast_path', request.values.get('stream'), captured_at=received_at)
+        return jsonify({
+            'success': True,
+            'alerts': alerts,
+            'detections': len(result.boxes) if result.boxes is not None else 0,
+            'batch': batch_info,
+            'latency_ms': round(1000.0 * (time.time() - received_at), 3),
+        })
+    except Exception as e:
+        REQUESTS.inc(path='alerts', outcome='error')
+        return jsonify({'success': False, 'error': str(e)})
+
+@app.route('/alerts')
+def list_alerts():
+    """Return recent alerts after `since` plus alert counts and latency percentiles"""
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(max(1, int(request.args.get('limit', 100))), 500)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid since or limit'})
+    return jsonify({'success': True, 'alerts': alert_manager.since(since, limit), 'stats': alert_manager.stats()})
+
+@app.route('/alerts_stream')
+def alerts_stream():
+    """Push alerts as Server-Sent Events the moment they are raised"""
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        last_id = int(last_id) if last_id is not None else alert_manager.last_id
+    except ValueError:
+        last_id = alert_manager.last_id
+    
+    def generate():
+        nonlocal last_id
+        while True:
+            events = alert_manager.wait(last_id, SSE_KEEPALIVE_SECONDS)
+            if not events:
+                yield ': keepalive\n\n'
+                continue
+            for event in events:
+                last_id = event['id']
+                yield f'id: {event["id"]}\nevent: alert\ndata: {json.dumps(event)}\n\n'
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/batcher_stats')
+def batcher_stats():
+    """Return inference batching statistics"""
+    return jsonify(batcher.stats())
+
+@app.route('/model_workers')
+def model_worker_stats():
+    """Return per-process statistics of the model worker pool"""
+    if not isinstance(model, ModelWorkerPool):
+        return jsonify({'success': False, 'error': 'Model worker pool is disabled (MODEL_WORKERS=0)'})
+    return jsonify(model.stats())
+
+@app.route('/pipeline_stats')
+def get_pipeline_stats():
+    """Return per-stage throughput for every running stream pipeline"""
+    return jsonify(pipeline_stats())
+
+@app.route('/camera_viewers')
+def camera_viewers():
+    """Return viewer count and per-viewer frame delivery for the camera stream"""
+    return jsonify(camera_broadcaster.stats())
+
+@app.route('/cache_stats')
+def cache_stats():
+    """Return detection cache hit/miss statistics"""
+    return jsonify(detection_cache.stats())
+
+def collect_gauges():
+    """Refresh stream, queue and viewer gauges before a metrics scrape"""
+    STREAM_FPS.reset()
+    FRAMES_DROPPED.reset()
+    QUEUE_DEPTH.reset()
+    for name, stats in pipeline_stats().items():
+        for stage, stage_stats in stats['stages'].items():
+            STREAM_FPS.set(stage_stats['fps'], stream=name, stage=stage)
+        for queue_name, queue_stats in stats['queues'].items():
+            QUEUE_DEPTH.set(queue_stats['depth'], queue=f'{name}_{queue_name}')
+            FRAMES_DROPPED.set(queue_stats['dropped'], stream=name, queue=queue_name)
+    QUEUE_DEPTH.set(batcher.stats()['queue_depth'], queue='inference_batcher')
+    MODEL_READY.set(1 if model_loader.ready else 0)
+    ACTIVE_VIEWERS.set(camera_broadcaster.stats()['viewers'], stream='camera')
+    pool_stats = buffer_pool.stats()
+    for kind in ('allocated_bytes', 'copied_bytes', 'pooled_bytes'):
+        BUFFER_BYTES.set(pool_stats[kind], kind=kind[:-len('_bytes')])
+    for generation in gc_monitor.stats()['generations']:
+        GC_PAUSE_SECONDS.set(generation['pause_ms'] / 1000.0, generation=str(generation['generation']))
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose stage latencies and stream gauges in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/buffer_stats')
+def buffer_stats():
+    """Buffer pool reuse, allocations and bytes copied per frame, plus GC pauses"""
+    return jsonify({'pool': buffer_pool.stats(), 'gc': gc_monitor.stats()})
+
+@app.route('/profiler/start', methods=['POST'])
+def start_profiler():
+    """Start the sampling profiler"""
+    try:
+        interval_ms = float(request.values.get('interval_ms', 10))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid interval_ms'})
+    if not profiler.start(interval_ms):
+        return jsonify({'success': False, 'error': 'Profiler already running'})
+    return jsonify({'success': True, 'profiler': profiler.status()})
+
+@app.route('/profiler/stop', methods=['POST'])
+def stop_profiler():
+    """Stop the sampling profiler, keeping the collected samples"""
+    profiler.stop()
+    return jsonify({'success': True, 'profiler': profiler.status()})
+
+@app.route('/profiler/report')
+def profiler_report():
+    """Return sampled stacks in collapsed (flamegraph) format"""
+    limit = request.args.get('limit', 200, type=int)
+    return Response(profiler.report(limit), mimetype='text/plain')
 
 @app.route('/clear_detections', methods=['POST'])
 def clear_detections():
     """Clear all detection counts"""
-    global detected_objects
     try:
-        detected_objects.clear()
+        detection_stats.clear()
         return jsonify({'success': True, 'message': 'Dashboard cleared successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def create_app():
+    """Build the background services, start loading the model and return the Flask app
+
+    Safe to call more than once; WSGI servers can use it as the app factory.
+    """
+    global event_store, alert_manager, model_loader, batcher, decode_pool, source_manager, job_manager
+    global stream_server
+    if model_loader is not None:
+        return app
+    event_store = EventStore(EVENT_DB, EVENT_BATCH_SIZE, EVENT_FLUSH_SECONDS, EVENT_QUEUE_MAX) if EVENT_DB else None
+    alert_manager = AlertManager(ALERT_CLASSES, ALERT_MIN_CONFIDENCE, ALERT_DEBOUNCE_SECONDS, ALERT_IOU,
+                                 [create_sink(spec) for spec in ALERT_SINKS.split(',') if spec.strip()])
+    # Pool workers warm themselves up in parallel while they start
+    model_loader = ModelLoader(load_model, warmup_model if MODEL_WARMUP_RUNS > 0 and MODEL_WORKERS == 0 else None,
+                               on_model_ready,
+                               MODEL_LOAD_RETRIES)
+    batcher = InferenceBatcher(predict_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, max(1, MODEL_WORKERS))
+    decode_pool = ThreadPoolExecutor(max_workers=BATCH_DECODE_WORKERS, thread_name_prefix='batch-decode')
+    source_manager = SourceManager(predict_sources, process_source_frame, SOURCE_BATCH_SIZE, BATCH_MAX_WAIT_MS,
+                                   SOURCE_PROCESS_WORKERS, partial(observe_stage, 'sources'))
+    # Jobs, streams and sources share the batcher with live requests: it is the only caller of the model
+    job_manager = JobManager(partial(predict_batched, 'job'), partial(annotate_detections, source='job', log_events=False),
+                             JOB_DIR, JOB_WORKERS, JOB_BATCH_SIZE, record_job_events, JOB_TTL)
+    gc_monitor.install()
+    metrics.REGISTRY.add_collector(collect_gauges)
+    model_loader.start()
+
+    try:
+        for options in parse_sources(STREAM_SOURCES):
+            add_stream_source(**options)
+    except ValueError as e:
+        print(f"❌ Invalid STREAM_SOURCES: {e}")
+    if STREAM_SERVER_PORT:
+        stream_server = start_stream_server()
+    return app
+
 if __name__ == '__main__':
+    # The debug reloader runs this file twice: a watcher process that only restarts the
+    # server and the child that serves requests. Start services (model, sources, stream
+    # server port) in the serving child only.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        create_app()
     print("Object Detection System Ready!")
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,428 @@
+"""Interchangeable CPU inference backends with a YOLO-compatible call interface
+
+Every backend is called as backend(images, conf=..., imgsz=..., classes=...)
+with one image or a list of BGR images and returns one result per image
+whose .boxes exposes xyxy, conf and cls arrays, and has a .names mapping.
+
+    torch         ultralytics YOLO on the .pt weights (alias: ultralytics)
+    onnx          exported ONNX graph on ONNX Runtime
+    onnx-int8     ONNX graph with dynamically quantized INT8 weights
+    openvino      exported OpenVINO IR on the OpenVINO runtime
+    openvino-int8 OpenVINO IR quantized with NNCF during export
+    stub          weight-free fake detector for offline benchmarks
+
+Exports are cached in cache_dir and reused on the next start. Check that
+backends agree with the reference on a fixed image set with:
+
+    python backends.py verify --backends torch,onnx,openvino
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8', 'openvino', 'openvino-int8', 'stub')
+ALIASES = {'ultralytics': 'torch'}
+
+
+class Boxes:
+    def __init__(self, xyxy, conf, cls):
+        """Detection arrays shaped like YOLO boxes"""
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class Result:
+    def __init__(self, boxes, names, orig_shape):
+        self.boxes = boxes
+        self.names = names
+        self.orig_shape = orig_shape
+
+
+def empty_boxes():
+    return Boxes(np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.float32))
+
+
+def _to_numpy(values):
+    if hasattr(values, 'cpu'):
+        values = values.cpu()
+    if hasattr(values, 'numpy'):
+        return values.numpy()
+    return np.asarray(values)
+
+
+def extract_arrays(result):
+    """Pull (xyxy, conf, cls) out of a detection result as NumPy arrays
+
+    xyxy is float32 of shape (N, 4), conf float32 (N,) and cls int32 (N,).
+    Works for YOLO results and anything exposing the same boxes fields.
+    """
+    boxes = getattr(result, 'boxes', None)
+    if boxes is None or len(boxes) == 0:
+        return (np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int32))
+    xyxy = _to_numpy(boxes.xyxy).astype(np.float32, copy=False).reshape(-1, 4)
+    conf = _to_numpy(boxes.conf).astype(np.float32, copy=False).reshape(-1)
+    cls = _to_numpy(boxes.cls).astype(np.int32).reshape(-1)
+    return xyxy, conf, cls
+
+
+def non_max_suppression(xyxy, scores, cls, iou_threshold=0.45, max_det=300):
+    """Class-aware NMS returning the indices to keep, best score first"""
+    if len(scores) == 0:
+        return np.empty(0, np.int64)
+    offset = cls.astype(np.float32)[:, None] * (float(xyxy.max()) + 1.0)
+    boxes = xyxy + offset
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, np.int64)
+
+
+def letterbox(image, size):
+    """Resize keeping aspect ratio and pad to size x size; return (img, ratio, pad)"""
+    h, w = image.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio, (left, top)
+
+
+class ExportedGraphBackend:
+    def __init__(self, names, imgsz=640, iou=0.7, max_det=300):
+        """Shared pre- and post-processing for exported YOLOv8 graphs
+
+        Subclasses implement _forward(batch) taking an NCHW float32 batch and
+        returning the raw (N, 4 + classes, anchors) prediction tensor.
+        """
+        self.names = names
+        self.imgsz = imgsz
+        self.iou = iou
+        self.max_det = max_det
+
+    def _forward(self, batch):
+        raise NotImplementedError
+
+    def _preprocess(self, images, imgsz):
+        tensors, meta = [], []
+        for image in images:
+            padded, ratio, pad = letterbox(image, imgsz)
+            tensors.append(padded[:, :, ::-1].transpose(2, 0, 1))
+            meta.append((ratio, pad, image.shape[:2]))
+        batch = np.ascontiguousarray(np.stack(tensors), dtype=np.float32)
+        batch *= 1.0 / 255.0
+        return batch, meta
+
+    def _postprocess(self, prediction, meta, conf, classes):
+        results = []
+        for pred, (ratio, (pad_x, pad_y), (h, w)) in zip(prediction, meta):
+            pred = pred.T
+            scores_all = pred[:, 4:]
+            cls = scores_all.argmax(axis=1)
+            scores = scores_all[np.arange(len(cls)), cls]
+            mask = scores >= conf
+            if classes is not None:
+                mask &= np.isin(cls, list(classes))
+            boxes, scores, cls = pred[mask, :4], scores[mask], cls[mask]
+            if len(scores) == 0:
+                results.append(Result(empty_boxes(), self.names, (h, w)))
+                continue
+            xyxy = np.empty_like(boxes)
+            xyxy[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+            xyxy[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+            xyxy[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+            xyxy[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+            keep = non_max_suppression(xyxy, scores, cls, self.iou, self.max_det)
+            xyxy, scores, cls = xyxy[keep], scores[keep], cls[keep]
+            xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - pad_x) / ratio).clip(0, w)
+            xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - pad_y) / ratio).clip(0, h)
+            results.append(Result(Boxes(xyxy.astype(np.float32), scores.astype(np.float32),
+                                        cls.astype(np.float32)), self.names, (h, w)))
+        return results
+
+    def __call__(self, source, conf=0.25, imgsz=None, verbose=False, classes=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        if not images:
+            return []
+        batch, meta = self._preprocess(images, imgsz or self.imgsz)
+        prediction = self._forward(batch)
+        return self._postprocess(prediction, meta, conf, classes)
+
+
+class OnnxBackend(ExportedGraphBackend):
+    def __init__(self, path, names, imgsz=640, intra_threads=0, inter_threads=0):
+        """YOLOv8 ONNX graph run on ONNX Runtime's CPU provider"""
+        super().__init__(names, imgsz)
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_threads:
+            options.intra_op_num_threads = intra_threads
+        if inter_threads:
+            options.inter_op_num_threads = inter_threads
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.path = path
+
+    def _forward(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(ExportedGraphBackend):
+    def __init__(self, path, names, imgsz=640, intra_threads=0, inter_threads=0):
+        """YOLOv8 OpenVINO IR compiled for the CPU plugin"""
+        super().__init__(names, imgsz)
+        import openvino as ov
+        config = {'PERFORMANCE_HINT': 'THROUGHPUT'}
+        if intra_threads:
+            config['INFERENCE_NUM_THREADS'] = intra_threads
+        if inter_threads:
+            config['NUM_STREAMS'] = inter_threads
+        core = ov.Core()
+        self.compiled = core.compile_model(core.read_model(path), 'CPU', config)
+        self.path = path
+        self._local = threading.local()
+
+    def _forward(self, batch):
+        request = getattr(self._local, 'request', None)
+        if request is None:
+            request = self._local.request = self.compiled.create_infer_request()
+        return request.infer({0: batch})[self.compiled.output(0)]
+
+
+class TorchBackend:
+    def __init__(self, weights, intra_threads=0, inter_threads=0):
+        """ultralytics YOLO on PyTorch weights"""
+        import torch
+        from ultralytics import YOLO
+        if intra_threads:
+            torch.set_num_threads(intra_threads)
+        if inter_threads:
+            try:
+                torch.set_num_interop_threads(inter_threads)
+            except RuntimeError as e:
+                print(f"Could not set inter-op threads: {e}")
+        self.model = YOLO(weights)
+        self.names = self.model.names
+        self.path = weights
+
+    def __call__(self, source, **kwargs):
+        return self.model(source, **kwargs)
+
+
+def _names_path(path):
+    return os.path.splitext(path.rstrip('/\\'))[0] + '.names.json'
+
+
+def _save_names(path, names):
+    with open(_names_path(path), 'w') as f:
+        json.dump({str(k): v for k, v in names.items()}, f)
+
+
+def _load_names(path):
+    """Class names of an exported model; raises RuntimeError when the export has none"""
+    sidecar = _names_path(path)
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    if path.endswith('.onnx'):
+        import onnx
+        meta = {p.key: p.value for p in onnx.load(path, load_external_data=False).metadata_props}
+        if 'names' in meta:
+            return ast.literal_eval(meta['names'])
+    # Guessing COCO names here would label the weapon classes as something else
+    raise RuntimeError(f'No class names found for {path}; delete it so the model is exported again')
+
+
+def export_model(weights, backend, cache_dir, imgsz=640):
+    """Export weights for an exported-graph backend, reusing cached exports"""
+    os.makedirs(cache_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    onnx_path = os.path.join(cache_dir, f'{stem}_{imgsz}.onnx')
+    targets = {
+        'onnx': onnx_path,
+        'onnx-int8': os.path.join(cache_dir, f'{stem}_{imgsz}_int8.onnx'),
+        'openvino': os.path.join(cache_dir, f'{stem}_{imgsz}_openvino_model', f'{stem}.xml'),
+        'openvino-int8': os.path.join(cache_dir, f'{stem}_{imgsz}_int8_openvino_model', f'{stem}.xml'),
+    }
+    target = targets[backend]
+    if os.path.exists(target):
+        return target
+
+    from ultralytics import YOLO
+    model = YOLO(weights)
+    started = time.perf_counter()
+    print(f"Exporting {weights} for {backend} backend...")
+    if backend in ('onnx', 'onnx-int8') and not os.path.exists(onnx_path):
+        exported = model.export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+        os.replace(exported, onnx_path)
+        _save_names(onnx_path, model.names)
+    if backend == 'onnx-int8':
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+    elif backend.startswith('openvino'):
+        exported = model.export(format='openvino', imgsz=imgsz, dynamic=True, int8=backend == 'openvino-int8')
+        export_dir = os.path.dirname(target)
+        if os.path.exists(export_dir):
+            import shutil
+            shutil.rmtree(export_dir)
+        os.replace(exported, export_dir)
+        xml = next(f for f in os.listdir(export_dir) if f.endswith('.xml'))
+        if os.path.join(export_dir, xml) != target:
+            os.replace(os.path.join(export_dir, xml), target)
+            os.replace(os.path.join(export_dir, xml[:-4] + '.bin'), target[:-4] + '.bin')
+    _save_names(target, model.names)
+    print(f"Exported {target} in {time.perf_counter() - started:.1f}s")
+    return target
+
+
+def create_backend(name, weights=None, cache_dir='model_cache', imgsz=640,
+                   intra_threads=0, inter_threads=0, **stub_options):
+    """Build the backend called `name` and return (artifact_path, backend)"""
+    name = ALIASES.get(name, name)
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown backend {name!r}; expected one of {", ".join(BACKENDS)}')
+    if name == 'stub':
+        from stub_model import StubModel
+        return 'stub', StubModel(**stub_options)
+    if name == 'torch':
+        return weights, TorchBackend(weights, intra_threads, inter_threads)
+
+    path = export_model(weights, name, cache_dir, imgsz)
+    names = _load_names(path)
+    if name.startswith('onnx'):
+        return path, OnnxBackend(path, names, imgsz, intra_threads, inter_threads)
+    return path, OpenVinoBackend(path, names, imgsz, intra_threads, inter_threads)
+
+
+def _iou(a, b):
+    x1, y1 = np.maximum(a[0], b[:, 0]), np.maximum(a[1], b[:, 1])
+    x2, y2 = np.minimum(a[2], b[:, 2]), np.minimum(a[3], b[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a + area_b - inter + 1e-9)
+
+
+def compare_detections(reference, candidate, iou_threshold=0.5):
+    """Greedily match two (xyxy, conf, cls) sets by class and IoU"""
+    ref_xyxy, ref_conf, ref_cls = reference
+    cand_xyxy, cand_conf, cand_cls = candidate
+    used = np.zeros(len(cand_cls), bool)
+    matched, conf_diffs = 0, []
+    for i in np.argsort(-ref_conf):
+        same = (cand_cls == ref_cls[i]) & ~used
+        if not same.any():
+            continue
+        ious = np.where(same, _iou(ref_xyxy[i], cand_xyxy), 0.0)
+        j = int(np.argmax(ious))
+        if ious[j] >= iou_threshold:
+            used[j] = True
+            matched += 1
+            conf_diffs.append(abs(float(ref_conf[i]) - float(cand_conf[j])))
+    return matched, conf_diffs
+
+
+def verify_backends(backends, images, conf=0.3, min_match=0.9, iou_threshold=0.5):
+    """Check every backend against the first one on a fixed image set
+
+    backends is a list of (name, backend). A backend passes when it finds
+    at least min_match of the reference detections and the reference finds
+    at least min_match of its detections.
+    """
+    reference_name, reference = backends[0]
+    reference_out = [extract_arrays(r) for r in reference(images, conf=conf, verbose=False)]
+    report = {'reference': reference_name, 'images': len(images), 'backends': {}}
+    for name, backend in backends[1:]:
+        started = time.perf_counter()
+        outputs = [extract_arrays(r) for r in backend(images, conf=conf, verbose=False)]
+        elapsed = time.perf_counter() - started
+        ref_total = sum(len(r[2]) for r in reference_out)
+        cand_total = sum(len(c[2]) for c in outputs)
+        matched, diffs = 0, []
+        for ref, cand in zip(reference_out, outputs):
+            m, d = compare_detections(ref, cand, iou_threshold)
+            matched += m
+            diffs.extend(d)
+        recall = matched / ref_total if ref_total else 1.0
+        precision = matched / cand_total if cand_total else 1.0
+        report['backends'][name] = {
+            'reference_detections': ref_total,
+            'detections': cand_total,
+            'matched': matched,
+            'recall': round(recall, 4),
+            'precision': round(precision, 4),
+            'max_conf_diff': round(max(diffs), 4) if diffs else 0.0,
+            'elapsed_s': round(elapsed, 3),
+            'passed': recall >= min_match and precision >= min_match,
+        }
+    return report
+
+
+def _default_images():
+    from ultralytics.utils import ASSETS
+    return sorted(str(p) for p in ASSETS.glob('*.jpg'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+    verify = sub.add_parser('verify', help='compare backends on a fixed image set')
+    verify.add_argument('--weights', default='yolov8n_weapon.pt')
+    verify.add_argument('--backends', default='torch,onnx,onnx-int8',
+                        help='comma-separated; the first one is the reference')
+    verify.add_argument('--images', nargs='*', help='image files (default: the ultralytics sample images)')
+    verify.add_argument('--cache-dir', default=os.environ.get('MODEL_CACHE_DIR', 'model_cache'))
+    verify.add_argument('--imgsz', type=int, default=640)
+    verify.add_argument('--conf', type=float, default=0.3)
+    verify.add_argument('--min-match', type=float, default=0.9)
+    export = sub.add_parser('export', help='export and cache a backend without serving')
+    export.add_argument('backend', choices=[b for b in BACKENDS if b not in ('torch', 'stub')])
+    export.add_argument('--weights', default='yolov8n_weapon.pt')
+    export.add_argument('--cache-dir', default=os.environ.get('MODEL_CACHE_DIR', 'model_cache'))
+    export.add_argument('--imgsz', type=int, default=640)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(export_model(args.weights, args.backend, args.cache_dir, args.imgsz))
+        return
+
+    images = [cv2.imread(p) for p in (args.images or _default_images())]
+    if any(image is None for image in images):
+        raise SystemExit('Could not read every test image')
+    backends = [(name, create_backend(name, args.weights, args.cache_dir, args.imgsz)[1])
+                for name in args.backends.split(',')]
+    report = verify_backends(backends, images, args.conf, args.min_match)
+    print(json.dumps(report, indent=2))
+    if not all(b['passed'] for b in report['backends'].values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
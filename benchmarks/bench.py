@@ -0,0 +1,372 @@
+"""Offline benchmark for /detect, /video_feed_stream and /camera_feed
+
+Generates synthetic images and videos, drives the Flask app in-process
+through its test client and over HTTP with a local threaded load generator,
+and prints one JSON document with req/s, latency percentiles, stream FPS
+and peak RSS. The default stub backend needs no model weights:
+
+    python benchmarks/bench.py --backend stub --output bench.json
+    python benchmarks/bench.py --backend real --resolutions 1280x720
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BOUNDARY = b'--frame\r\n'
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return round(peak / 1024.0, 2)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(latencies):
+    ms = [1000.0 * v for v in latencies]
+    return {
+        'p50': round(percentile(ms, 50), 3) if ms else None,
+        'p95': round(percentile(ms, 95), 3) if ms else None,
+        'p99': round(percentile(ms, 99), 3) if ms else None,
+        'mean': round(sum(ms) / len(ms), 3) if ms else None,
+        'max': round(max(ms), 3) if ms else None,
+    }
+
+
+def multipart_body(field, filename, data, content_type, fields=None):
+    boundary = 'bench' + os.urandom(8).hex()
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; '
+                 f'filename="{filename}"\r\nContent-Type: {content_type}\r\n\r\n'.encode())
+    parts.append(data)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class TestClientDriver:
+    name = 'test_client'
+
+    def __init__(self, flask_app):
+        """Drive the app in-process, one Flask test client per thread"""
+        self.flask_app = flask_app
+        self._local = threading.local()
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.flask_app.test_client()
+        return client
+
+    def post(self, path, body, content_type):
+        response = self._client().post(path, data=body, content_type=content_type)
+        data = response.get_data()
+        return response.status_code, data
+
+    def get(self, path):
+        response = self._client().get(path)
+        return response.status_code, response.get_data()
+
+    def stream(self, path):
+        response = self._client().get(path, buffered=False)
+        try:
+            for chunk in response.response:
+                yield chunk
+        finally:
+            response.close()
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    name = 'http'
+
+    def __init__(self, flask_app):
+        """Serve the app on a local port and drive it over real sockets"""
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+        self.port = self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        return conn
+
+    def _request(self, method, path, body=None, headers=None):
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def post(self, path, body, content_type):
+        return self._request('POST', path, body, {'Content-Type': content_type})
+
+    def get(self, path):
+        return self._request('GET', path)
+
+    def stream(self, path):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            while True:
+                chunk = response.read1(65536)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_detect_load(driver, payloads, concurrency, total_requests):
+    """Send total_requests /detect uploads from `concurrency` threads"""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    errors = [0]
+
+    def worker():
+        while True:
+            with lock:
+                index = next(counter)
+            if index >= total_requests:
+                return
+            body, content_type = payloads[index % len(payloads)]
+            started = time.perf_counter()
+            try:
+                status, data = driver.post('/detect?response=detections', body, content_type)
+                ok = status == 200 and json.loads(data).get('success')
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': total_requests,
+        'errors': errors[0],
+        'elapsed_s': round(elapsed, 3),
+        'req_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': summarize_latencies(latencies),
+    }
+
+
+def read_stream(driver, path, max_frames, timeout):
+    """Read MJPEG parts from a stream and return frame timing"""
+    started = time.perf_counter()
+    first = None
+    frames = 0
+    tail = b''
+    for chunk in driver.stream(path):
+        data = tail + chunk
+        found = data.count(BOUNDARY)
+        tail = data[-(len(BOUNDARY) - 1):]
+        if found:
+            frames += found
+            if first is None:
+                first = time.perf_counter()
+        if frames >= max_frames or time.perf_counter() - started > timeout:
+            break
+    end = time.perf_counter()
+    span = end - first if first is not None else 0.0
+    return {
+        'frames': frames,
+        'fps': round((frames - 1) / span, 2) if frames > 1 and span > 0 else 0.0,
+        'first_frame_ms': round(1000.0 * (first - started), 3) if first is not None else None,
+    }
+
+
+def run_stream_viewers(driver, path, viewers, max_frames, timeout):
+    with ThreadPoolExecutor(max_workers=viewers) as pool:
+        results = list(pool.map(lambda _: read_stream(driver, path, max_frames, timeout), range(viewers)))
+    fps = [r['fps'] for r in results]
+    return {
+        'viewers': viewers,
+        'frames': sum(r['frames'] for r in results),
+        'fps_per_viewer_mean': round(sum(fps) / len(fps), 2),
+        'fps_per_viewer_min': min(fps),
+        'first_frame_ms_max': max((r['first_frame_ms'] or 0.0) for r in results),
+    }
+
+
+def parse_resolutions(text):
+    return [tuple(int(v) for v in item.lower().split('x')) for item in text.split(',') if item]
+
+
+def parse_ints(text):
+    return [int(v) for v in text.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', choices=('stub', 'real'), default='stub',
+                        help='stub needs no weights; real loads the configured model')
+    parser.add_argument('--stub-latency-ms', type=float, default=5.0, help='fixed cost per stub forward pass')
+    parser.add_argument('--stub-per-image-ms', type=float, default=2.0, help='extra stub cost per image')
+    parser.add_argument('--resolutions', default='640x480,1280x720,1920x1080')
+    parser.add_argument('--densities', default='0,5,25', help='objects per synthetic image')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=64, help='/detect requests per scenario')
+    parser.add_argument('--drivers', default='test_client,http')
+    parser.add_argument('--stream-frames', type=int, default=90)
+    parser.add_argument('--stream-viewers', default='1,4')
+    parser.add_argument('--stream-timeout', type=float, default=60.0)
+    parser.add_argument('--skip-streams', action='store_true')
+    parser.add_argument('--cache', action='store_true', help='leave the /detect result cache enabled')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    if args.backend == 'stub':
+        os.environ['MODEL_BACKEND'] = 'stub'
+        os.environ['STUB_LATENCY_MS'] = str(args.stub_latency_ms)
+        os.environ['STUB_PER_IMAGE_MS'] = str(args.stub_per_image_ms)
+    if not args.cache:
+        os.environ['CACHE_MAX_MB'] = '0'
+    os.environ.setdefault('VIDEO_DROP_OLDEST', '0')
+
+    from synthetic import make_jpeg, make_video
+
+    workdir = tempfile.mkdtemp(prefix='detection_bench_')
+    stream_frames = max(args.stream_frames + 30, 60)
+    camera_video = make_video(os.path.join(workdir, 'camera.avi'), 640, 480, 5, frames=stream_frames * 4,
+                              seed=args.seed)
+    os.environ['CAMERA_SOURCE'] = camera_video
+    os.environ.setdefault('EVENT_DB', os.path.join(workdir, 'events.db'))
+
+    load_started = time.perf_counter()
+    import app as detection_app
+    detection_app.create_app()
+    import_seconds = time.perf_counter() - load_started
+    if not detection_app.model_loader.wait(600):
+        raise SystemExit('Model failed to load; use --backend stub to run without weights')
+    ready_seconds = time.perf_counter() - load_started
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'backend': args.backend,
+            'app_import_s': round(import_seconds, 3),
+            'model_ready_s': round(ready_seconds, 3),
+            'model_loader': detection_app.model_loader.status(),
+        },
+        'config': vars(args),
+        'detect': [],
+        'streams': [],
+    }
+
+    drivers = {'test_client': TestClientDriver, 'http': HttpDriver}
+    for driver_name in args.drivers.split(','):
+        driver = drivers[driver_name](detection_app.app)
+        try:
+            for width, height in parse_resolutions(args.resolutions):
+                for density in parse_ints(args.densities):
+                    payloads = [multipart_body('image', f'bench{i}.jpg',
+                                               make_jpeg(width, height, density, seed=args.seed + i),
+                                               'image/jpeg')
+                                for i in range(8)]
+                    for concurrency in parse_ints(args.concurrency):
+                        result = run_detect_load(driver, payloads, concurrency, args.requests)
+                        result.update({
+                            'driver': driver.name,
+                            'resolution': f'{width}x{height}',
+                            'objects': density,
+                            'concurrency': concurrency,
+                            'peak_rss_mb': peak_rss_mb(),
+                        })
+                        report['detect'].append(result)
+                        print(f"detect {driver.name} {width}x{height} objects={density} c={concurrency}: "
+                              f"{result['req_per_s']} req/s p99={result['latency_ms']['p99']} ms",
+                              file=sys.stderr)
+
+            if args.skip_streams:
+                continue
+            for width, height in parse_resolutions(args.resolutions):
+                video = make_video(os.path.join(workdir, f'video_{width}x{height}.avi'), width, height, 10,
+                                   frames=stream_frames, seed=args.seed)
+                with open(video, 'rb') as f:
+                    body, content_type = multipart_body('video', 'bench.avi', f.read(), 'video/x-msvideo')
+                status, data = driver.post('/upload_video', body, content_type)
+                if status != 200 or not json.loads(data).get('success'):
+                    raise RuntimeError(f'Video upload failed: {data[:200]!r}')
+                video_id = json.loads(data)['video_id']
+                result = read_stream(driver, f'/video_feed_stream?video_id={video_id}', args.stream_frames,
+                                     args.stream_timeout)
+                result.update({'endpoint': '/video_feed_stream', 'driver': driver.name,
+                               'resolution': f'{width}x{height}', 'viewers': 1, 'peak_rss_mb': peak_rss_mb()})
+                report['streams'].append(result)
+                driver.get(f'/stop_video?video_id={video_id}')
+                print(f"stream /video_feed_stream {driver.name} {width}x{height}: {result['fps']} fps",
+                      file=sys.stderr)
+
+            for viewers in parse_ints(args.stream_viewers):
+                result = run_stream_viewers(driver, '/camera_feed', viewers, args.stream_frames,
+                                            args.stream_timeout)
+                driver.get('/stop_camera')
+                result.update({'endpoint': '/camera_feed', 'driver': driver.name, 'resolution': '640x480',
+                               'peak_rss_mb': peak_rss_mb()})
+                report['streams'].append(result)
+                print(f"stream /camera_feed {driver.name} viewers={viewers}: "
+                      f"{result['fps_per_viewer_mean']} fps/viewer", file=sys.stderr)
+        finally:
+            driver.close()
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_model import CLASS_COLORS
+
+COLORS = list(CLASS_COLORS.values())
+
+
+def _place_objects(rng, width, height, count):
+    size = max(8, int(min(width, height) / max(4, np.sqrt(count) * 2.5)))
+    objects = []
+    for i in range(count):
+        w = int(rng.integers(size // 2, size + 1))
+        h = int(rng.integers(size // 2, size + 1))
+        x = int(rng.integers(0, max(1, width - w)))
+        y = int(rng.integers(0, max(1, height - h)))
+        objects.append([x, y, w, h, COLORS[i % len(COLORS)]])
+    return objects
+
+
+def _draw(width, height, objects, rng):
+    image = rng.integers(0, 30, size=(height, width, 3), dtype=np.uint8)
+    for x, y, w, h, color in objects:
+        cv2.rectangle(image, (int(x), int(y)), (int(x) + w, int(y) + h), color, -1)
+    return image
+
+
+def make_scene(width, height, objects, seed=0):
+    """Dark noisy frame with `objects` solid rectangles in class colors"""
+    rng = np.random.default_rng(seed)
+    return _draw(width, height, _place_objects(rng, width, height, objects), rng)
+
+
+def make_jpeg(width, height, objects, seed=0, quality=90):
+    """Encoded JPEG bytes of a synthetic scene"""
+    ok, buffer = cv2.imencode('.jpg', make_scene(width, height, objects, seed),
+                              [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError('Could not encode synthetic image')
+    return buffer.tobytes()
+
+
+def make_video(path, width, height, objects, frames=120, fps=30.0, seed=0):
+    """Write an MJPG AVI of rectangles drifting across a noisy background"""
+    rng = np.random.default_rng(seed)
+    placed = _place_objects(rng, width, height, objects)
+    velocity = rng.integers(-4, 5, size=(len(placed), 2))
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f'Could not create synthetic video {path}')
+    try:
+        for _ in range(frames):
+            writer.write(_draw(width, height, placed, rng))
+            for obj, (dx, dy) in zip(placed, velocity):
+                obj[0] = int(np.clip(obj[0] + dx, 0, width - obj[2] - 1))
+                obj[1] = int(np.clip(obj[1] + dy, 0, height - obj[3] - 1))
+    finally:
+        writer.release()
+    return path
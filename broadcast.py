@@ -0,0 +1,124 @@
+import threading
+from collections import deque
+
+
+class Subscriber:
+    def __init__(self, buffer_size=2):
+        """Per-client frame buffer that keeps only the newest frames"""
+        self._frames = deque(maxlen=max(1, int(buffer_size)))
+        self._cond = threading.Condition()
+        self._closed = False
+        self.sent = 0
+        self.skipped = 0
+
+    def push(self, chunk):
+        """Offer a frame without ever blocking the producer"""
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.skipped += 1
+            self._frames.append(chunk)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def frames(self, timeout=None):
+        """Yield frames until the broadcaster stops or timeout passes without one"""
+        while True:
+            with self._cond:
+                while not self._frames and not self._closed:
+                    if not self._cond.wait(timeout):
+                        return
+                if not self._frames:
+                    return
+                chunk = self._frames.popleft()
+            self.sent += 1
+            yield chunk
+
+
+class FrameBroadcaster:
+    def __init__(self, name, start_source, buffer_size=2):
+        """Produce each encoded frame once and fan it out to every subscriber
+
+        start_source() is called when the first subscriber arrives and must
+        return a started StreamPipeline (or anything with frames() and
+        stop()). The source is stopped when the last subscriber leaves.
+        """
+        self.name = name
+        self.start_source = start_source
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._source = None
+        self._thread = None
+        self.frames_produced = 0
+
+    def subscribe(self):
+        """Register a viewer, starting the shared source if needed"""
+        sub = Subscriber(self.buffer_size)
+        with self._lock:
+            if self._source is None:
+                self._source = self.start_source()
+                self._thread = threading.Thread(target=self._run, args=(self._source,),
+                                                name=f'{self.name}-broadcast', daemon=True)
+                self._thread.start()
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        """Remove a viewer, stopping the source when nobody is left"""
+        with self._lock:
+            self._subscribers.discard(sub)
+            source = self._source if not self._subscribers else None
+            if source is not None:
+                self._source = None
+        sub.close()
+        if source is not None:
+            source.stop()
+
+    def stop(self):
+        """Stop the source and disconnect every viewer"""
+        with self._lock:
+            source, self._source = self._source, None
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for sub in subscribers:
+            sub.close()
+        if source is not None:
+            source.stop()
+
+    def _run(self, source):
+        try:
+            for chunk in source.frames():
+                self.frames_produced += 1
+                with self._lock:
+                    subscribers = list(self._subscribers)
+                for sub in subscribers:
+                    sub.push(chunk)
+        finally:
+            with self._lock:
+                finished = self._source is source
+                if finished:
+                    self._source = None
+                    subscribers = list(self._subscribers)
+                    self._subscribers.clear()
+                else:
+                    subscribers = []
+            for sub in subscribers:
+                sub.close()
+            if finished:
+                source.stop()
+
+    def stats(self):
+        """Return viewer count and per-viewer delivery counters"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            running = self._source is not None
+        return {
+            'running': running,
+            'viewers': len(subscribers),
+            'frames_produced': self.frames_produced,
+            'clients': [{'sent': s.sent, 'skipped': s.skipped} for s in subscribers],
+        }
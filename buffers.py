@@ -0,0 +1,200 @@
+import gc
+import threading
+import time
+
+import numpy as np
+
+MIN_UPLOAD_BUFFER = 64 * 1024
+
+
+class BufferPool:
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_per_shape=8):
+        """Reusable numpy buffers keyed by shape and dtype
+
+        acquire() hands out a free pooled array of the same shape and dtype
+        or allocates a new one; release() takes it back once nothing reads
+        it anymore. Arrays beyond max_per_shape per key or max_bytes in
+        total are left to the garbage collector. The pool also counts the
+        bytes the hot path still copies (note_copy) and the frames it
+        handles (note_frame), so churn can be read per frame.
+        """
+        self.max_bytes = max_bytes
+        self.max_per_shape = max_per_shape
+        self._free = {}
+        self._pooled_bytes = 0
+        self._shapes = {}
+        self._lock = threading.Lock()
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.reuses = 0
+        self.discarded = 0
+        self.copied_bytes = 0
+        self.copies = 0
+        self.frames = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        """Return an uninitialised array, reusing a released one when possible"""
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                array = free.pop()
+                self._pooled_bytes -= array.nbytes
+                self.reuses += 1
+                return array
+        array = np.empty(shape, dtype)
+        with self._lock:
+            self.allocations += 1
+            self.allocated_bytes += array.nbytes
+        return array
+
+    def release(self, array):
+        """Give an array (or a view of a pooled array) back to the pool"""
+        base = array
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if base.base is not None or not base.flags.writeable:
+            return
+        key = (base.shape, base.dtype.str)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) >= self.max_per_shape or self._pooled_bytes + base.nbytes > self.max_bytes:
+                self.discarded += 1
+                return
+            if any(item is base for item in free):
+                return
+            free.append(base)
+            self._pooled_bytes += base.nbytes
+
+    def note_allocation(self, nbytes):
+        """Count a buffer that a library call allocated on its own"""
+        with self._lock:
+            self.allocations += 1
+            self.allocated_bytes += nbytes
+
+    def note_copy(self, nbytes):
+        with self._lock:
+            self.copies += 1
+            self.copied_bytes += nbytes
+
+    def note_frame(self):
+        with self._lock:
+            self.frames += 1
+
+    def read_stream(self, stream):
+        """Return (data, lease): the bytes of an upload stream as a uint8 array
+
+        The stream is read with readinto() into a pooled buffer sized to
+        the next power of two, so uploads of similar size reuse it. lease
+        is that buffer, to be released once data is decoded, or None for
+        streams that can only be read().
+        """
+        try:
+            readinto = stream.readinto
+            start = stream.tell()
+            size = stream.seek(0, 2) - start
+            stream.seek(start)
+        except (AttributeError, OSError, ValueError):
+            data = stream.read()
+            self.note_copy(len(data))
+            return np.frombuffer(data, np.uint8), None
+        capacity = max(MIN_UPLOAD_BUFFER, 1 << max(0, size - 1).bit_length())
+        lease = self.acquire((capacity,))
+        view = memoryview(lease)
+        filled = 0
+        while filled < size:
+            count = readinto(view[filled:size])
+            if not count:
+                break
+            filled += count
+        view.release()
+        self.note_copy(filled)
+        return lease[:filled], lease
+
+    def read_frame(self, capture, key):
+        """capture.read() into a pooled frame of the shape last seen for key"""
+        shape = self._shapes.get(key)
+        buffer = self.acquire(shape) if shape is not None else None
+        success, frame = capture.read(buffer) if buffer is not None else capture.read()
+        if not success or frame is None:
+            if buffer is not None:
+                self.release(buffer)
+            return None
+        if frame is not buffer:
+            if buffer is not None:
+                self.release(buffer)
+            self.note_allocation(frame.nbytes)
+            if len(self._shapes) >= 256:
+                self._shapes.clear()
+            self._shapes[key] = frame.shape
+        return frame
+
+    def stats(self):
+        """Return allocation, reuse and copy counts, in total and per frame"""
+        with self._lock:
+            frames = self.frames
+            stats = {
+                'allocations': self.allocations,
+                'allocated_bytes': self.allocated_bytes,
+                'reuses': self.reuses,
+                'discarded': self.discarded,
+                'pooled_bytes': self._pooled_bytes,
+                'pooled_buffers': sum(len(free) for free in self._free.values()),
+                'copies': self.copies,
+                'copied_bytes': self.copied_bytes,
+                'frames': frames,
+            }
+        stats['per_frame'] = {
+            'allocations': round(stats['allocations'] / frames, 3) if frames else 0.0,
+            'allocated_bytes': round(stats['allocated_bytes'] / frames, 1) if frames else 0.0,
+            'copied_bytes': round(stats['copied_bytes'] / frames, 1) if frames else 0.0,
+        }
+        return stats
+
+
+class GCMonitor:
+    def __init__(self):
+        """Time every garbage collection pass through gc.callbacks
+
+        The callback only updates plain counters: it can run inside any
+        allocation on any thread, so it must not take locks.
+        """
+        self.collections = [0, 0, 0]
+        self.pause_seconds = [0.0, 0.0, 0.0]
+        self.max_pause = [0.0, 0.0, 0.0]
+        self.collected = 0
+        self._started = None
+        self.installed = False
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self._started = time.perf_counter()
+            return
+        if self._started is None:
+            return
+        pause = time.perf_counter() - self._started
+        self._started = None
+        generation = info.get('generation', 0)
+        self.collections[generation] += 1
+        self.pause_seconds[generation] += pause
+        self.max_pause[generation] = max(self.max_pause[generation], pause)
+        self.collected += info.get('collected', 0)
+
+    def install(self):
+        if not self.installed:
+            gc.callbacks.append(self._callback)
+            self.installed = True
+        return self
+
+    def stats(self):
+        """Return collections and pause times per generation"""
+        return {
+            'installed': self.installed,
+            'collected': self.collected,
+            'generations': [{
+                'generation': generation,
+                'collections': self.collections[generation],
+                'pause_ms': round(1000.0 * self.pause_seconds[generation], 3),
+                'max_pause_ms': round(1000.0 * self.max_pause[generation], 3),
+            } for generation in range(3)],
+        }
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import Counter
+
+WINDOWS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class _Ring:
+    def __init__(self, slots, width):
+        """Fixed ring of time buckets, each width seconds wide"""
+        self.width = width
+        self.epochs = [None] * slots
+        self.buckets = [None] * slots
+
+    def add(self, now, key_counts):
+        epoch = int(now // self.width)
+        index = epoch % len(self.buckets)
+        if self.epochs[index] != epoch:
+            self.epochs[index] = epoch
+            self.buckets[index] = Counter()
+        self.buckets[index].update(key_counts)
+
+    def total(self, now, seconds):
+        """Sum buckets covering the last `seconds` seconds"""
+        current = int(now // self.width)
+        oldest = current - max(1, int(round(seconds / self.width))) + 1
+        combined = Counter()
+        for epoch, bucket in zip(self.epochs, self.buckets):
+            if epoch is not None and oldest <= epoch <= current:
+                combined.update(bucket)
+        return combined
+
+    def clear(self):
+        self.epochs = [None] * len(self.epochs)
+        self.buckets = [None] * len(self.buckets)
+
+
+class DetectionStats:
+    def __init__(self):
+        """Thread-safe detection counters with per-second and per-minute windows
+
+        Counts are keyed by (source, class). Per-second buckets cover the
+        last minute and per-minute buckets cover the last day. Every update
+        bumps a version number so readers can wait for changes instead of
+        polling on a timer.
+        """
+        self._cond = threading.Condition()
+        self._totals = Counter()
+        self._seconds = _Ring(60, 1)
+        self._minutes = _Ring(1440, 60)
+        self.version = 0
+
+    def record(self, counts, source='image'):
+        """Add {class_name: count} detections seen by a source"""
+        if not counts:
+            return
+        keyed = {(source, name): n for name, n in counts.items() if n}
+        if not keyed:
+            return
+        now = time.time()
+        with self._cond:
+            self._totals.update(keyed)
+            self._seconds.add(now, keyed)
+            self._minutes.add(now, keyed)
+            self.version += 1
+            self._cond.notify_all()
+
+    def clear(self):
+        """Reset every counter and window"""
+        with self._cond:
+            self._totals.clear()
+            self._seconds.clear()
+            self._minutes.clear()
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait_for_change(self, since, timeout):
+        """Block until the version moves past `since` and return the version"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.version <= since:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.version
+
+    @staticmethod
+    def _split(keyed, source=None):
+        by_class = Counter()
+        by_source = {}
+        for (src, name), n in keyed.items():
+            if source is not None and src != source:
+                continue
+            by_class[name] += n
+            by_source.setdefault(src, Counter())[name] += n
+        return dict(by_class), {src: dict(c) for src, c in by_source.items()}
+
+    def totals(self, source=None):
+        """Return all-time {class_name: count}, optionally for one source"""
+        with self._cond:
+            keyed = dict(self._totals)
+        return self._split(keyed, source)[0]
+
+    def window(self, seconds, source=None):
+        """Return (by_class, by_source) counts for the last `seconds` seconds"""
+        now = time.time()
+        with self._cond:
+            if seconds <= 60:
+                keyed = self._seconds.total(now, seconds)
+            else:
+                keyed = self._minutes.total(now, min(seconds, 86400))
+        return self._split(keyed, source)
+
+    def snapshot(self, source=None):
+        """Return totals, per-source totals and every window with the version"""
+        now = time.time()
+        with self._cond:
+            version = self.version
+            keyed_totals = dict(self._totals)
+            windows = {
+                'minute': self._seconds.total(now, 60),
+                'hour': self._minutes.total(now, 3600),
+                'day': self._minutes.total(now, 86400),
+            }
+        totals, by_source = self._split(keyed_totals, source)
+        return {
+            'version': version,
+            'totals': totals,
+            'by_source': by_source,
+            'windows': {name: self._split(keyed, source)[0] for name, keyed in windows.items()},
+        }
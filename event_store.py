@@ -0,0 +1,228 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    source TEXT NOT NULL,
+    stream TEXT,
+    frame INTEGER,
+    class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    x1 REAL, y1 REAL, x2 REAL, y2 REAL
+);
+CREATE INDEX IF NOT EXISTS idx_detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS idx_detections_class_ts ON detections (class, ts);
+CREATE INDEX IF NOT EXISTS idx_detections_source_ts ON detections (source, ts);
+CREATE INDEX IF NOT EXISTS idx_detections_stream_frame ON detections (stream, frame);
+'''
+
+COLUMNS = ('id', 'ts', 'source', 'stream', 'frame', 'class', 'confidence', 'x1', 'y1', 'x2', 'y2')
+GROUPS = ('class', 'source', 'stream')
+BUCKETS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class EventStore:
+    def __init__(self, path, batch_size=500, flush_interval=1.0, max_queue=100000):
+        """Append-only SQLite log of every detection, written in the background
+
+        record() only appends rows to an in-memory queue; a writer thread
+        inserts them in one transaction per batch_size rows or every
+        flush_interval seconds. When the queue holds max_queue rows new
+        events are dropped and counted rather than blocking inference.
+        """
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._written = 0
+        self._dropped = 0
+        self._batches = 0
+        self._write_seconds = 0.0
+        self._pending_flush = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        self._thread = threading.Thread(target=self._run, name='event-store-writer', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def record(self, source, detections, frame=None, stream=None, ts=None):
+        """Queue one row per detection dict ({'object', 'confidence', 'bbox'})"""
+        if not detections:
+            return
+        ts = time.time() if ts is None else ts
+        rows = [(ts, source, stream, frame, det['object'], float(det['confidence']), *det['bbox'])
+                for det in detections]
+        with self._cond:
+            room = self.max_queue - len(self._queue)
+            if room < len(rows):
+                self._dropped += len(rows) - max(room, 0)
+                rows = rows[:max(room, 0)]
+            self._queue.extend(rows)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def _take(self):
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while self._running and len(self._queue) < self.batch_size and not self._pending_flush:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self._queue), self.batch_size * 10)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            while True:
+                rows = self._take()
+                if rows:
+                    started = time.perf_counter()
+                    try:
+                        with conn:
+                            conn.executemany(
+                                'INSERT INTO detections (ts, source, stream, frame, class, confidence, '
+                                'x1, y1, x2, y2) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                    except sqlite3.Error as e:
+                        print(f"❌ Could not write {len(rows)} detection events: {e}")
+                        with self._cond:
+                            self._dropped += len(rows)
+                    else:
+                        with self._cond:
+                            self._written += len(rows)
+                            self._batches += 1
+                            self._write_seconds += time.perf_counter() - started
+                with self._cond:
+                    if not self._queue:
+                        self._pending_flush = 0
+                        self._cond.notify_all()
+                        if not self._running:
+                            return
+        finally:
+            conn.close()
+
+    def flush(self, timeout=10.0):
+        """Wait until everything queued so far has been written"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._pending_flush += 1
+            self._cond.notify_all()
+            while self._queue or self._pending_flush:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        """Write out the queue and stop the writer thread"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout=30)
+
+    def _where(self, start=None, end=None, source=None, cls=None, stream=None, min_confidence=None):
+        clauses, args = [], []
+        for column, op, value in (('ts', '>=', start), ('ts', '<', end), ('source', '=', source),
+                                  ('class', '=', cls), ('stream', '=', stream),
+                                  ('confidence', '>=', min_confidence)):
+            if value is not None:
+                clauses.append(f'{column} {op} ?')
+                args.append(value)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', args
+
+    def query(self, limit=100, offset=0, order='desc', **filters):
+        """Return detection events matching the filters, newest first by default"""
+        where, args = self._where(**filters)
+        direction = 'ASC' if order == 'asc' else 'DESC'
+        sql = (f'SELECT {", ".join(COLUMNS)} FROM detections{where} '
+               f'ORDER BY ts {direction}, id {direction} LIMIT ? OFFSET ?')
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, args + [int(limit), int(offset)]).fetchall()
+        finally:
+            conn.close()
+        return [{
+            'id': row[0], 'ts': row[1], 'source': row[2], 'stream': row[3], 'frame': row[4],
+            'object': row[5], 'confidence': round(row[6], 4), 'bbox': [row[7], row[8], row[9], row[10]],
+        } for row in rows]
+
+    def aggregate(self, group_by='class', bucket=None, **filters):
+        """Count events per class, source or stream, optionally per time bucket
+
+        bucket is one of minute, hour or day; each row then carries the
+        bucket start time as `bucket`.
+        """
+        if group_by not in GROUPS:
+            raise ValueError(f'Unknown group_by {group_by!r}; expected one of {", ".join(GROUPS)}')
+        if bucket is not None and bucket not in BUCKETS:
+            raise ValueError(f'Unknown bucket {bucket!r}; expected one of {", ".join(BUCKETS)}')
+        where, args = self._where(**filters)
+        keys = [f'"{group_by}"']
+        if bucket is not None:
+            keys.insert(0, f'CAST(ts / {BUCKETS[bucket]} AS INTEGER) * {BUCKETS[bucket]}')
+        sql = (f'SELECT {", ".join(keys)}, COUNT(*), AVG(confidence), MIN(ts), MAX(ts) '
+               f'FROM detections{where} GROUP BY {", ".join(keys)} ORDER BY {", ".join(keys)}')
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, args).fetchall()
+        finally:
+            conn.close()
+        results = []
+        for row in rows:
+            item = {}
+            if bucket is not None:
+                item['bucket'], row = row[0], row[1:]
+            item.update({group_by: row[0], 'count': row[1], 'avg_confidence': round(row[2], 4),
+                         'first_ts': row[3], 'last_ts': row[4]})
+            results.append(item)
+        return results
+
+    def stats(self):
+        with self._cond:
+            return {
+                'path': self.path,
+                'written': self._written,
+                'queued': len(self._queue),
+                'dropped': self._dropped,
+                'batches': self._batches,
+                'avg_batch_ms': round(1000.0 * self._write_seconds / self._batches, 3) if self._batches else 0.0,
+                'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            }
+
+
+class StreamEvents:
+    def __init__(self, store, source, stream=None):
+        """Number the frames of one stream and log their detections
+
+        A result object identical to the previous frame's (a motion-gated
+        stream reusing its detections) is not logged again.
+        """
+        self.store = store
+        self.source = source
+        self.stream = stream
+        self.frame = -1
+        self._last = None
+
+    def record(self, result, detections):
+        self.frame += 1
+        if result is self._last:
+            return
+        self._last = result
+        self.store.record(self.source, detections, self.frame, self.stream)
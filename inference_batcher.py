@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+
+
+class BatchRequest:
+    def __init__(self, image, params):
+        """Single image waiting for a batched forward pass"""
+        self.image = image
+        self.params = params
+        self.key = tuple(sorted(params.items()))
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.info = {}
+
+    def wait(self, timeout=None):
+        """Block until the batch containing this request has run"""
+        if not self.done.wait(timeout):
+            raise TimeoutError('Inference request timed out')
+        if self.error is not None:
+            raise self.error
+        return self.result, self.info
+
+
+class InferenceBatcher:
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=10.0, concurrency=1):
+        """Gather concurrent requests into batches for one forward pass
+
+        predict_fn is called as predict_fn(images, **params) and must return
+        one result per image, in order. Requests are only batched together
+        when their params (conf, imgsz, ...) are identical. Up to
+        `concurrency` batches run at once, for predict_fns backed by
+        several model instances.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._running = True
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._total_wait = 0.0
+        self._max_seen_batch = 0
+        self.concurrency = max(1, int(concurrency))
+        self._threads = [threading.Thread(target=self._run, name=f'inference-batcher-{i}', daemon=True)
+                         for i in range(self.concurrency)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image, **params):
+        """Queue an image and return a BatchRequest to wait on"""
+        req = BatchRequest(image, params)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError('Inference batcher is stopped')
+            self._pending.append(req)
+            self._cond.notify()
+        return req
+
+    def infer(self, image, timeout=None, **params):
+        """Run one image through the batcher and return (result, info)"""
+        return self.submit(image, **params).wait(timeout)
+
+    def stop(self):
+        """Stop the scheduler threads and fail any queued requests"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        with self._cond:
+            leftover = list(self._pending)
+            self._pending.clear()
+        for req in leftover:
+            req.error = RuntimeError('Inference batcher is stopped')
+            req.done.set()
+
+    def stats(self):
+        """Return aggregate batching statistics"""
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'requests': self._requests,
+                'avg_batch_size': self._requests / self._batches if self._batches else 0.0,
+                'max_batch_size_seen': self._max_seen_batch,
+                'avg_queue_wait_ms': 1000.0 * self._total_wait / self._requests if self._requests else 0.0,
+                'queue_depth': len(self._pending),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'concurrency': self.concurrency,
+            }
+
+    def _collect(self):
+        """Wait for the next batch of requests sharing the same params"""
+        with self._cond:
+            while self._running and not self._pending:
+                self._cond.wait()
+            if not self._pending:
+                return []
+            first = self._pending.popleft()
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                match = next((r for r in self._pending if r.key == first.key), None)
+                if match is not None:
+                    self._pending.remove(match)
+                    batch.append(match)
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not self._running:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                if not self._running:
+                    return
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = self.predict_fn([r.image for r in batch], **batch[0].params)
+                results = list(results)
+                if len(results) != len(batch):
+                    raise RuntimeError(f'Expected {len(batch)} results, got {len(results)}')
+                error = None
+            except Exception as e:
+                results = [None] * len(batch)
+                error = e
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._max_seen_batch = max(self._max_seen_batch, len(batch))
+                self._total_wait += sum(started - r.enqueued_at for r in batch)
+
+            for req, result in zip(batch, results):
+                req.result = result
+                req.error = error
+                req.info = {
+                    'batch_size': len(batch),
+                    'queue_wait_ms': round(1000.0 * (started - req.enqueued_at), 3),
+                    'inference_ms': round(1000.0 * (finished - started), 3),
+                }
+                req.done.set()
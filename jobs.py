@@ -0,0 +1,220 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+FINISHED = ('completed', 'failed', 'cancelled')
+
+
+class VideoJob:
+    def __init__(self, job_id, source_path, job_dir, options):
+        """State of one offline video analysis job"""
+        self.id = job_id
+        self.source_path = source_path
+        self.job_dir = job_dir
+        self.options = options
+        self.status = 'queued'
+        self.error = None
+        self.frames_done = 0
+        self.total_frames = 0
+        self.detections = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def video_path(self):
+        return os.path.join(self.job_dir, 'annotated.mp4')
+
+    @property
+    def detections_path(self):
+        return os.path.join(self.job_dir, 'detections.jsonl')
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        progress = self.frames_done / self.total_frames if self.total_frames else 0.0
+        if self.status == 'completed':
+            progress = 1.0
+        return {
+            'id': self.id,
+            'status': self.status,
+            'error': self.error,
+            'frames_done': self.frames_done,
+            'total_frames': self.total_frames,
+            'progress': round(progress, 4),
+            'detections': self.detections,
+            'processing_fps': round(self.frames_done / elapsed, 2) if elapsed else 0.0,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    def __init__(self, predict_fn, annotate_fn, root_dir, workers=2, batch_size=8, event_fn=None,
+                 ttl=86400.0, reap_interval=60.0):
+        """Run uploaded videos through the detector on a background worker pool
+
+        predict_fn(frames) returns one result per frame and
+        annotate_fn(frame, result) draws on the frame and returns the
+        detections as dicts. Every job writes an annotated MP4 and a
+        per-frame detections JSONL file into its own directory.
+        event_fn(job, frame_index, detections), if given, is called for
+        every frame as well. Jobs that finished more than ttl seconds ago
+        are removed together with their files.
+        """
+        self.predict_fn = predict_fn
+        self.annotate_fn = annotate_fn
+        self.event_fn = event_fn
+        self.root_dir = root_dir
+        self.batch_size = max(1, int(batch_size))
+        self.ttl = ttl
+        self.reap_interval = reap_interval
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix='video-job')
+        os.makedirs(root_dir, exist_ok=True)
+
+    def new_job_dir(self):
+        """Create a directory for a new job and return (job_id, path)"""
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.root_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        return job_id, job_dir
+
+    def submit(self, job_id, job_dir, source_path, **options):
+        """Queue a job for a video already saved in job_dir"""
+        job = VideoJob(job_id, source_path, job_dir, options)
+        with self._lock:
+            self._jobs[job_id] = job
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name='video-job-reaper', daemon=True)
+                self._reaper.start()
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda j: j.created_at)]
+
+    def cancel(self, job_id):
+        """Ask a queued or running job to stop, returning the job or None"""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel_event.set()
+            if job.status == 'queued':
+                job.status = 'cancelled'
+        return job
+
+    def delete(self, job_id):
+        """Cancel a job and remove its files"""
+        job = self.cancel(job_id)
+        if job is None:
+            return False
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        if job.status not in ('running', 'queued'):
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+        return True
+
+    def reap(self):
+        """Delete jobs that finished more than ttl seconds ago; return how many"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job.id for job in self._jobs.values()
+                       if job.status in FINISHED and (job.finished_at or job.created_at) < cutoff]
+        return sum(1 for job_id in expired if self.delete(job_id))
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Video job cleanup failed: {e}")
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            self._cleanup(job)
+            return
+
+        job.status = 'running'
+        job.started_at = time.time()
+        cap = cv2.VideoCapture(job.source_path)
+        writer = None
+        try:
+            if not cap.isOpened():
+                raise RuntimeError('Could not open video file')
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            job.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            writer = cv2.VideoWriter(job.video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+            if not writer.isOpened():
+                raise RuntimeError('Could not create output video')
+
+            with open(job.detections_path, 'w') as out:
+                frame_index = 0
+                while not job.cancel_event.is_set():
+                    frames = []
+                    while len(frames) < self.batch_size:
+                        success, frame = cap.read()
+                        if not success:
+                            break
+                        frames.append(frame)
+                    if not frames:
+                        break
+
+                    results = self.predict_fn(frames, **job.options)
+                    for frame, result in zip(frames, results):
+                        detections = self.annotate_fn(frame, result)
+                        if self.event_fn is not None:
+                            self.event_fn(job, frame_index, detections)
+                        writer.write(frame)
+                        out.write(json.dumps({
+                            'frame': frame_index,
+                            'timestamp_ms': round(1000.0 * frame_index / fps, 3),
+                            'detections': detections
+                        }) + '\n')
+                        frame_index += 1
+                        job.detections += len(detections)
+                    job.frames_done = frame_index
+
+            if job.cancel_event.is_set():
+                job.status = 'cancelled'
+            else:
+                job.total_frames = job.frames_done
+                job.status = 'completed'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(f"Video job {job.id} failed: {e}")
+        finally:
+            cap.release()
+            if writer is not None:
+                writer.release()
+            job.finished_at = time.time()
+            self._cleanup(job)
+
+    def _cleanup(self, job):
+        if os.path.exists(job.source_path):
+            os.remove(job.source_path)
+        with self._lock:
+            deleted = job.id not in self._jobs
+        if deleted:
+            shutil.rmtree(job.job_dir, ignore_errors=True)
@@ -0,0 +1,99 @@
+import threading
+import time
+
+
+class ModelLoader:
+    def __init__(self, load_fn, warmup_fn=None, on_ready=None, retries=3, retry_delay=5.0):
+        """Load and warm up the model on a background thread
+
+        load_fn() returns (model_path, model). warmup_fn(model) runs a few
+        throwaway inferences so the first real request does not pay for
+        graph initialization. on_ready(model_path, model) publishes the model:
+        it is called once, only after warmup_fn has returned, and before the
+        loader reports ready. A failed load is retried `retries` times with
+        a growing delay.
+        """
+        self.load_fn = load_fn
+        self.warmup_fn = warmup_fn
+        self.on_ready = on_ready
+        self.retries = max(0, int(retries))
+        self.retry_delay = retry_delay
+        self.state = 'pending'
+        self.error = None
+        self.attempts = 0
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.started_at = None
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start loading in the background; safe to call more than once"""
+        if self._thread is None:
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """Wait up to timeout seconds for the model; returns True once ready"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._ready.is_set():
+            if self._finished.is_set():
+                return False
+            remaining = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+            if remaining <= 0:
+                return False
+            self._ready.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            self.attempts += 1
+            try:
+                self.state = 'loading'
+                started = time.perf_counter()
+                model_path, model = self.load_fn()
+                self.load_seconds = time.perf_counter() - started
+
+                if self.warmup_fn is not None:
+                    self.state = 'warming'
+                    started = time.perf_counter()
+                    self.warmup_fn(model)
+                    self.warmup_seconds = time.perf_counter() - started
+
+                if self.on_ready is not None:
+                    self.on_ready(model_path, model)
+                self.state = 'ready'
+                self.error = None
+                self.ready_at = time.time()
+                self._ready.set()
+                self._finished.set()
+                return
+            except Exception as e:
+                self.error = str(e)
+                print(f"❌ Model loading failed (attempt {self.attempts}): {e}")
+                if self.attempts > self.retries:
+                    self.state = 'failed'
+                    self._finished.set()
+                    return
+                self.state = 'retrying'
+                time.sleep(self.retry_delay * self.attempts)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'error': self.error,
+            'attempts': self.attempts,
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'warmup_seconds': round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            'started_at': self.started_at,
+            'ready_at': self.ready_at,
+        }
@@ -0,0 +1,199 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from annotation import extract_arrays
+from backends import Boxes, Result
+
+METHODS = ('diff', 'mog2')
+
+
+class MotionDetector:
+    def __init__(self, method='diff', width=160, pixel_threshold=25, min_area=0.002):
+        """Cheap change detector on a small blurred grayscale copy of the frame
+
+        'diff' compares against the reference frame set with set_reference()
+        (the last frame the model saw), so slow changes add up until they
+        count; 'mog2' uses OpenCV's adaptive background subtractor. A frame
+        has motion when more than min_area of its pixels changed by more
+        than pixel_threshold.
+        """
+        if method not in METHODS:
+            raise ValueError(f'Unknown motion method {method!r}; expected one of {", ".join(METHODS)}')
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.reference = None
+        self._kernel = np.ones((3, 3), np.uint8)
+        self._subtractor = None
+        if method == 'mog2':
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=pixel_threshold,
+                                                                  detectShadows=False)
+
+    def prepare(self, frame):
+        """Downscale, gray and blur a frame for comparison"""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.width / w)
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def set_reference(self, small):
+        self.reference = small
+
+    def changes(self, small):
+        """Return (changed_fraction, mask) of a prepared frame"""
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(small)
+        elif self.reference is None or self.reference.shape != small.shape:
+            return 1.0, np.full(small.shape, 255, np.uint8)
+        else:
+            _, mask = cv2.threshold(cv2.absdiff(small, self.reference), self.pixel_threshold, 255,
+                                    cv2.THRESH_BINARY)
+        mask = cv2.dilate(mask, self._kernel, iterations=2)
+        return float(np.count_nonzero(mask)) / mask.size, mask
+
+    def regions(self, mask, frame_shape, padding=0.1):
+        """Bounding boxes of changed areas in full-frame (x0, y0, x1, y1) coordinates"""
+        h, w = frame_shape[:2]
+        sy, sx = h / mask.shape[0], w / mask.shape[1]
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            x, y, bw, bh = cv2.boundingRect(contour)
+            pad_x, pad_y = int(bw * sx * padding) + 8, int(bh * sy * padding) + 8
+            boxes.append([max(0, int(x * sx) - pad_x), max(0, int(y * sy) - pad_y),
+                          min(w, int((x + bw) * sx) + pad_x), min(h, int((y + bh) * sy) + pad_y)])
+        return _merge_overlapping(boxes)
+
+
+def _merge_overlapping(boxes):
+    merged = True
+    while merged and len(boxes) > 1:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+
+class MotionGatedDetector:
+    def __init__(self, detect_fn, motion, refresh_seconds=5.0, predict_fn=None, max_region_area=0.5):
+        """Only run detect_fn on frames that changed; reuse detections otherwise
+
+        A MotionDetector decides whether the frame moved since the last
+        inference. Unchanged frames get the previous result back, and a
+        full detection is forced at least every refresh_seconds. With
+        predict_fn(images), moving areas covering less than max_region_area
+        of the frame are cropped and detected as one batch; boxes outside
+        them are carried over from the previous result. If detect_fn has a
+        seed(frame, result) method, such as a TrackedDetector, the merged
+        region result is handed to it so its tracks follow.
+        """
+        self.detect_fn = detect_fn
+        self.motion = motion
+        self.refresh_seconds = refresh_seconds
+        self.predict_fn = predict_fn
+        self.max_region_area = max_region_area
+        self.last_result = None
+        self.last_full = 0.0
+        self.changed_fraction = 0.0
+        self.frames = 0
+        self.full_detections = 0
+        self.region_detections = 0
+        self.reused = 0
+        self.forced = 0
+        self.gate_latency = 0.0
+        self._lock = threading.Lock()
+
+    def _full(self, frame, small):
+        result = self.detect_fn(frame)
+        self.motion.set_reference(small)
+        self.last_result = result
+        self.last_full = time.monotonic()
+        self.full_detections += 1
+        return result
+
+    def _regions(self, frame, small, boxes):
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in boxes]
+        results = self.predict_fn(crops)
+        prev_xyxy, prev_conf, prev_cls = extract_arrays(self.last_result)
+        centers = (prev_xyxy[:, :2] + prev_xyxy[:, 2:]) / 2
+        outside = np.ones(len(prev_conf), bool)
+        xyxy, conf, cls = [], [], []
+        for (x0, y0, x1, y1), result in zip(boxes, results):
+            outside &= ~((centers[:, 0] >= x0) & (centers[:, 0] < x1) &
+                         (centers[:, 1] >= y0) & (centers[:, 1] < y1))
+            r_xyxy, r_conf, r_cls = extract_arrays(result)
+            xyxy.append(r_xyxy + np.array([x0, y0, x0, y0], np.float32))
+            conf.append(r_conf)
+            cls.append(r_cls)
+        xyxy = np.concatenate([prev_xyxy[outside]] + xyxy)
+        conf = np.concatenate([prev_conf[outside]] + conf)
+        cls = np.concatenate([prev_cls[outside]] + cls)
+        names = getattr(results[0], 'names', None) or getattr(self.last_result, 'names', {})
+        result = Result(Boxes(xyxy, conf, cls.astype(np.float32)), names, frame.shape[:2])
+        seed = getattr(self.detect_fn, 'seed', None)
+        if callable(seed):
+            seed(frame, result)
+        self.motion.set_reference(small)
+        self.last_result = result
+        self.region_detections += 1
+        return result
+
+    def __call__(self, frame):
+        """Return a fresh or reused detection result for the next frame"""
+        with self._lock:
+            self.frames += 1
+            started = time.perf_counter()
+            small = self.motion.prepare(frame)
+            fraction, mask = self.motion.changes(small)
+            self.changed_fraction = fraction
+            self.gate_latency = 0.8 * self.gate_latency + 0.2 * (time.perf_counter() - started)
+
+            if self.last_result is None:
+                return self._full(frame, small)
+            if time.monotonic() - self.last_full >= self.refresh_seconds:
+                self.forced += 1
+                return self._full(frame, small)
+            if fraction < self.motion.min_area:
+                self.reused += 1
+                return self.last_result
+
+            if self.predict_fn is not None and fraction < self.max_region_area:
+                boxes = self.motion.regions(mask, frame.shape)
+                area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+                if boxes and area < self.max_region_area * frame.shape[0] * frame.shape[1]:
+                    return self._regions(frame, small, boxes)
+            return self._full(frame, small)
+
+    def stats(self):
+        """Return how many frames were detected, reused or region-detected"""
+        with self._lock:
+            stats = {
+                'method': self.motion.method,
+                'frames': self.frames,
+                'full_detections': self.full_detections,
+                'region_detections': self.region_detections,
+                'reused': self.reused,
+                'forced_refreshes': self.forced,
+                'inference_ratio': round((self.full_detections + self.region_detections) / self.frames, 4)
+                if self.frames else 0.0,
+                'changed_fraction': round(self.changed_fraction, 5),
+                'gate_ms': round(1000.0 * self.gate_latency, 3),
+            }
+        inner = getattr(self.detect_fn, 'stats', None)
+        if callable(inner):
+            stats['inner'] = inner()
+        return stats
@@ -0,0 +1,261 @@
+import threading
+import time
+from collections import deque
+
+_END = object()
+
+_registry_lock = threading.Lock()
+_active_pipelines = {}
+
+
+class FrameQueue:
+    def __init__(self, maxsize=2, drop_oldest=True, on_drop=None):
+        """Bounded queue that either blocks producers or drops the oldest item
+
+        on_drop(item), if given, is called with every dropped item.
+        """
+        self.maxsize = max(1, int(maxsize))
+        self.drop_oldest = drop_oldest
+        self.on_drop = on_drop
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """Add an item, returning False if the queue was closed"""
+        dropped = None
+        with self._cond:
+            while len(self._items) >= self.maxsize and not self._closed:
+                if self.drop_oldest:
+                    dropped = self._items.popleft()
+                    self.dropped += 1
+                    break
+                self._cond.wait(0.1)
+            accepted = not self._closed
+            if accepted:
+                self._items.append(item)
+                self._cond.notify_all()
+        if dropped is not None and dropped is not _END and self.on_drop is not None:
+            self.on_drop(dropped)
+        return accepted
+
+    def get(self, timeout=None):
+        """Take the oldest item, or _END once the queue is closed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items and not self._closed:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError('Queue get timed out')
+                self._cond.wait(remaining)
+            if not self._items:
+                return _END
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def drain(self):
+        """Remove and return every queued item"""
+        with self._cond:
+            items = [item for item in self._items if item is not _END]
+            self._items.clear()
+            self._cond.notify_all()
+        return items
+
+    def close(self):
+        """Wake every waiter and refuse new items"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class StageCounter:
+    def __init__(self, name):
+        """Throughput and busy-time counter for one pipeline stage"""
+        self.name = name
+        self.frames = 0
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self._window = deque(maxlen=120)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        now = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            self.busy += seconds
+            self._window.append(now)
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._window if now - t <= 2.0]
+            elapsed = max(now - self.started, 1e-9)
+            return {
+                'frames': self.frames,
+                'fps': round(len(recent) / min(2.0, elapsed), 2),
+                'avg_ms': round(1000.0 * self.busy / self.frames, 3) if self.frames else 0.0,
+                'utilization': round(self.busy / elapsed, 3),
+            }
+
+
+class StreamPipeline:
+    STAGES = ('capture', 'inference', 'annotate', 'encode')
+
+    def __init__(self, name, capture_fn, infer_fn, annotate_fn, encode_fn,
+                 queue_size=2, drop_oldest=True, observer=None, result_fn=None, on_drop=None):
+        """Run capture, inference, annotation and encoding on separate threads
+
+        capture_fn() returns the next frame or None at end of stream,
+        infer_fn(frame) returns a detection result, annotate_fn(frame, result)
+        returns the frame to encode and encode_fn(frame) returns bytes.
+        drop_oldest is either a bool for every queue or a dict keyed by the
+        stage that consumes the queue ('inference', 'annotate', 'encode',
+        'output'). observer(stage, seconds), if given, is called after every
+        stage run, e.g. to feed latency histograms. result_fn(frame, result,
+        captured_at), if given, sees every result as soon as inference
+        returns, before annotation and encoding; captured_at is the
+        time.time() at which the frame was read. on_drop(frame), if given,
+        receives every frame a queue drops before it is encoded, e.g. to
+        return it to a buffer pool.
+        """
+        self.name = name
+        self._fns = {
+            'capture': capture_fn,
+            'inference': infer_fn,
+            'annotate': annotate_fn,
+            'encode': encode_fn,
+        }
+        self.on_drop = on_drop
+        self.queues = {}
+        for consumer in ('inference', 'annotate', 'encode', 'output'):
+            drop = drop_oldest.get(consumer, True) if isinstance(drop_oldest, dict) else drop_oldest
+            # The output queue holds encoded bytes, not frames
+            release = self._drop_frame if on_drop is not None and consumer != 'output' else None
+            self.queues[consumer] = FrameQueue(queue_size, drop, release)
+        self.counters = {stage: StageCounter(stage) for stage in self.STAGES}
+        self.observer = observer
+        self.result_fn = result_fn
+        self._stop = threading.Event()
+        self._threads = []
+        self.error = None
+
+    def start(self):
+        """Start the stage threads and register the pipeline for stats"""
+        targets = [
+            ('capture', None, 'inference'),
+            ('inference', 'inference', 'annotate'),
+            ('annotate', 'annotate', 'encode'),
+            ('encode', 'encode', 'output'),
+        ]
+        for stage, source, sink in targets:
+            thread = threading.Thread(target=self._run_stage, args=(stage, source, sink),
+                                      name=f'{self.name}-{stage}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        with _registry_lock:
+            _active_pipelines[self.name] = self
+        return self
+
+    def _drop_frame(self, item):
+        # Capture and inference hand on (frame, captured_at) and (frame, result)
+        self.on_drop(item[0] if isinstance(item, tuple) else item)
+
+    def _call(self, stage, item):
+        fn = self._fns[stage]
+        if stage == 'capture':
+            frame = fn()
+            return None if frame is None else (frame, time.time())
+        if stage == 'annotate':
+            frame, result = item
+            return fn(frame, result)
+        if stage == 'inference':
+            frame, captured_at = item
+            result = fn(frame)
+            if self.result_fn is not None:
+                self.result_fn(frame, result, captured_at)
+            return frame, result
+        return fn(item)
+
+    def _run_stage(self, stage, source, sink):
+        out = self.queues[sink]
+        try:
+            while not self._stop.is_set():
+                item = None
+                if source is not None:
+                    item = self.queues[source].get()
+                    if item is _END:
+                        break
+                started = time.perf_counter()
+                produced = self._call(stage, item)
+                if produced is None:
+                    break
+                elapsed = time.perf_counter() - started
+                self.counters[stage].record(elapsed)
+                if self.observer is not None:
+                    self.observer(stage, elapsed)
+                if not out.put(produced):
+                    break
+        except Exception as e:
+            self.error = e
+            print(f"Pipeline {self.name} stage {stage} failed: {e}")
+        finally:
+            out.put(_END)
+
+    def frames(self):
+        """Yield encoded frames until the stream ends or the pipeline stops"""
+        output = self.queues['output']
+        while not self._stop.is_set():
+            item = output.get()
+            if item is _END:
+                break
+            yield item
+
+    def stop(self, timeout=5.0):
+        """Stop every stage, wait for its thread and unregister the pipeline
+
+        Once stop() returns, capture_fn is no longer running, so its
+        source can be released. Frames still queued go to on_drop.
+        """
+        self._stop.set()
+        for q in self.queues.values():
+            q.close()
+        current = threading.current_thread()
+        for thread in self._threads:
+            if thread is not current:
+                thread.join(timeout)
+        if self.on_drop is not None:
+            for consumer, q in self.queues.items():
+                if consumer != 'output':
+                    for item in q.drain():
+                        self._drop_frame(item)
+        with _registry_lock:
+            if _active_pipelines.get(self.name) is self:
+                del _active_pipelines[self.name]
+
+    def stats(self):
+        """Return per-stage throughput and per-queue depth and drop counts"""
+        stages = {stage: counter.snapshot() for stage, counter in self.counters.items()}
+        busiest = max(stages, key=lambda s: stages[s]['avg_ms']) if any(
+            s['frames'] for s in stages.values()) else None
+        stats = {
+            'stages': stages,
+            'queues': {name: {'depth': len(q), 'dropped': q.dropped, 'drop_oldest': q.drop_oldest}
+                       for name, q in self.queues.items()},
+            'bottleneck': busiest,
+        }
+        detector_stats = getattr(self._fns['inference'], 'stats', None)
+        if callable(detector_stats):
+            stats['detector'] = detector_stats()
+        return stats
+
+
+def pipeline_stats():
+    """Return stats for every running pipeline keyed by name"""
+    with _registry_lock:
+        pipelines = list(_active_pipelines.items())
+    return {name: p.stats() for name, p in pipelines}
@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def cache_key(data, **params):
+    """Hash uploaded bytes together with the inference parameters"""
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, spill_dir=None, spill_max_bytes=512 * 1024 * 1024):
+        """LRU cache of detections and annotated JPEGs keyed by content hash
+
+        Entries evicted from memory are written to spill_dir (when set) and
+        read back on a later hit, up to spill_max_bytes on disk.
+        """
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self._entries = OrderedDict()
+        self._spilled = OrderedDict()
+        self._bytes = 0
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def _size(detections, jpeg):
+        return len(jpeg or b'') + len(json.dumps(detections))
+
+    def get(self, key):
+        """Return (detections, jpeg) for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], entry[1]
+            spilled = key in self._spilled
+
+        if spilled:
+            entry = self._read_spill(key)
+            if entry is not None:
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                self.put(key, *entry)
+                return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, detections, jpeg):
+        """Store detections and the encoded annotated image"""
+        size = self._size(detections, jpeg)
+        if size > self.max_bytes:
+            return
+        evicted = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (detections, jpeg, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._bytes -= old_entry[2]
+                self.evictions += 1
+                evicted.append((old_key, old_entry))
+        if self.spill_dir:
+            for old_key, (old_detections, old_jpeg, _) in evicted:
+                self._write_spill(old_key, old_detections, old_jpeg)
+
+    def _spill_paths(self, key):
+        return os.path.join(self.spill_dir, key + '.json'), os.path.join(self.spill_dir, key + '.jpg')
+
+    def _write_spill(self, key, detections, jpeg):
+        json_path, jpeg_path = self._spill_paths(key)
+        try:
+            with open(json_path, 'w') as f:
+                json.dump(detections, f)
+            if jpeg is not None:
+                with open(jpeg_path, 'wb') as f:
+                    f.write(jpeg)
+        except OSError as e:
+            print(f"Cache spill failed: {e}")
+            return
+
+        stale = []
+        with self._lock:
+            size = self._size(detections, jpeg)
+            if key in self._spilled:
+                self._spilled_bytes -= self._spilled.pop(key)
+            self._spilled[key] = size
+            self._spilled_bytes += size
+            while self._spilled_bytes > self.spill_max_bytes and self._spilled:
+                old_key, old_size = self._spilled.popitem(last=False)
+                self._spilled_bytes -= old_size
+                stale.append(old_key)
+        for old_key in stale:
+            self._remove_spill(old_key)
+
+    def _read_spill(self, key):
+        json_path, jpeg_path = self._spill_paths(key)
+        try:
+            with open(json_path) as f:
+                detections = json.load(f)
+            jpeg = None
+            if os.path.exists(jpeg_path):
+                with open(jpeg_path, 'rb') as f:
+                    jpeg = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                size = self._spilled.pop(key, None)
+                if size is not None:
+                    self._spilled_bytes -= size
+            return None
+        return detections, jpeg
+
+    def _remove_spill(self, key):
+        for path in self._spill_paths(key):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def clear(self):
+        """Drop every entry from memory and disk"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            spilled = list(self._spilled)
+            self._spilled.clear()
+            self._spilled_bytes = 0
+        for key in spilled:
+            self._remove_spill(key)
+
+    def stats(self):
+        """Return hit/miss counters and memory and disk usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'spilled_entries': len(self._spilled),
+                'spilled_bytes': self._spilled_bytes,
+            }
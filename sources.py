@@ -0,0 +1,393 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from broadcast import Subscriber
+
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_.-]{1,64}$')
+
+
+def parse_sources(spec):
+    """Parse 'name=uri|fps=10|priority=2|loop=0;...' into StreamSource kwargs"""
+    sources = []
+    for entry in spec.split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        head, *options = entry.split('|')
+        name, sep, uri = head.partition('=')
+        if not sep or not name.strip() or not uri.strip():
+            raise ValueError(f'Invalid stream source {entry!r}; expected name=uri')
+        kwargs = {'name': name.strip(), 'uri': uri.strip()}
+        for option in options:
+            key, _, value = option.partition('=')
+            key = key.strip()
+            if key in ('fps', 'priority'):
+                kwargs[key] = float(value)
+            elif key == 'loop':
+                kwargs[key] = value.strip() != '0'
+            else:
+                raise ValueError(f'Unknown option {key!r} for stream source {name!r}')
+        sources.append(kwargs)
+    return sources
+
+
+class StreamSource:
+    def __init__(self, name, uri, fps=0.0, priority=1.0, loop=True, buffer_size=2, reconnect_seconds=2.0,
+                 pool=None):
+        """One camera, stream URL or video file read on its own capture thread
+
+        Only the newest captured frame is kept for inference; frames that
+        are replaced before the scheduler takes them count as skipped.
+        Video files are played back at their own frame rate as a simulated
+        camera and restart at the end when loop is set. fps caps how often
+        the source is inferred (0 = as often as frames arrive) and priority
+        weights it against the other sources when a batch is full. With a
+        buffers.BufferPool as pool, frames are captured into pooled buffers
+        that go back to the pool once processed or skipped.
+        """
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f'Invalid stream source name {name!r}; use letters, digits, _ . or -')
+        self.name = name
+        self.uri = uri
+        self.fps = max(0.0, float(fps))
+        self.priority = max(0.01, float(priority))
+        self.loop = loop
+        self.buffer_size = buffer_size
+        self.reconnect_seconds = reconnect_seconds
+        self.pool = pool
+        self.is_file = os.path.isfile(uri)
+        self.on_frame = None
+        self.status = 'starting'
+        self.busy = False
+        self.last_scheduled = 0.0
+        self.previous_scheduled = 0.0
+        self.captured = 0
+        self.skipped = 0
+        self.inferred = 0
+        self.latency = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'source-{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop capturing and disconnect every viewer"""
+        self._stop.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for sub in subscribers:
+            sub.close()
+
+    def _open(self):
+        capture = cv2.VideoCapture(int(self.uri) if self.uri.isdigit() else self.uri)
+        if capture.isOpened():
+            return capture
+        capture.release()
+        return None
+
+    def _run(self):
+        capture = None
+        frame_interval = 0.0
+        next_frame = time.monotonic()
+        misses = 0
+        try:
+            while not self._stop.is_set():
+                if capture is None:
+                    capture = self._open()
+                    if capture is None:
+                        self.status = 'unavailable'
+                        self._stop.wait(self.reconnect_seconds)
+                        continue
+                    self.status = 'running'
+                    native_fps = capture.get(cv2.CAP_PROP_FPS) if self.is_file else 0
+                    frame_interval = 1.0 / native_fps if native_fps and native_fps > 0 else 0.0
+                    next_frame = time.monotonic()
+                    misses = 0
+
+                if frame_interval:
+                    delay = next_frame - time.monotonic()
+                    if delay > 0:
+                        self._stop.wait(delay)
+                    next_frame = max(next_frame + frame_interval, time.monotonic() - frame_interval)
+
+                if self.pool is not None:
+                    frame = self.pool.read_frame(capture, self.name)
+                    success = frame is not None
+                else:
+                    success, frame = capture.read()
+                if not success:
+                    misses += 1
+                    if self.is_file and self.loop and misses == 1:
+                        capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        continue
+                    capture.release()
+                    capture = None
+                    if self.is_file and not self.loop:
+                        self.status = 'ended'
+                        return
+                    self.status = 'reconnecting'
+                    self._stop.wait(self.reconnect_seconds)
+                    continue
+                misses = 0
+
+                with self._lock:
+                    replaced, self._pending = self._pending, (frame, time.time())
+                    if replaced is not None:
+                        self.skipped += 1
+                    self.captured += 1
+                if replaced is not None and self.pool is not None:
+                    self.pool.release(replaced[0])
+                if self.on_frame is not None:
+                    self.on_frame()
+        finally:
+            if capture is not None:
+                capture.release()
+            if self.status not in ('ended', 'unavailable'):
+                self.status = 'stopped'
+
+    @property
+    def has_frame(self):
+        return self._pending is not None
+
+    def take(self):
+        """Return the newest (frame, captured_at) and clear it"""
+        with self._lock:
+            item, self._pending = self._pending, None
+            return item
+
+    def due(self, now):
+        """True when the fps budget allows another inference"""
+        return self.fps <= 0 or now - self.last_scheduled >= 1.0 / self.fps
+
+    def subscribe(self):
+        """Register a viewer of this source's annotated frames"""
+        sub = Subscriber(self.buffer_size)
+        with self._lock:
+            if self._stop.is_set():
+                sub.close()
+            else:
+                self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+        sub.close()
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    def publish(self, chunk):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.push(chunk)
+
+    def stats(self):
+        with self._lock:
+            viewers = len(self._subscribers)
+        return {
+            'uri': self.uri,
+            'status': self.status,
+            'file': self.is_file,
+            'fps_budget': self.fps,
+            'priority': self.priority,
+            'captured': self.captured,
+            'inferred': self.inferred,
+            'skipped': self.skipped,
+            'latency_ms': round(1000.0 * self.latency, 3),
+            'viewers': viewers,
+        }
+
+
+class SourceManager:
+    def __init__(self, predict_fn, process_fn, max_batch_size=8, max_wait_ms=5.0, process_workers=4,
+                 observer=None):
+        """Registry of stream sources sharing one batched inference loop
+
+        A single scheduler thread takes the newest frame of every source
+        that has one, is within its fps budget and is not still being
+        processed, and runs them through predict_fn(frames) as one batch.
+        When more sources are ready than fit in max_batch_size, the ones
+        with the highest priority times seconds since their last inference
+        go first, so low-priority sources slow down rather than starve.
+        A batch that is not full waits up to max_wait_ms for sources whose
+        previous frame is still being processed.
+        process_fn(source, frame, result, captured_at) runs per frame on a
+        thread pool and returns an encoded chunk for the source's viewers,
+        or None. observer(stage, seconds), if given, sees every batch.
+        """
+        self.predict_fn = predict_fn
+        self.process_fn = process_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait_ms / 1000.0
+        self.observer = observer
+        self._sources = {}
+        self._cond = threading.Condition()
+        self._running = True
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(process_workers)), thread_name_prefix='source-process')
+        self._batch_sizes = deque(maxlen=500)
+        self._batches = 0
+        self._images = 0
+        self._errors = 0
+        self._infer_seconds = 0.0
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='source-scheduler', daemon=True)
+        self._thread.start()
+
+    def add(self, source):
+        """Register and start a source; raises ValueError if the name is taken"""
+        with self._cond:
+            if source.name in self._sources:
+                raise ValueError(f'Stream source {source.name!r} already exists')
+            self._sources[source.name] = source
+            source.on_frame = self._wake
+        return source.start()
+
+    def remove(self, name):
+        """Stop and forget a source; return False if it does not exist"""
+        with self._cond:
+            source = self._sources.pop(name, None)
+        if source is None:
+            return False
+        source.stop()
+        return True
+
+    def get(self, name):
+        with self._cond:
+            return self._sources.get(name)
+
+    def names(self):
+        with self._cond:
+            return list(self._sources)
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify()
+
+    def _select(self, now):
+        ready = [s for s in self._sources.values() if s.has_frame and not s.busy]
+        due = [s for s in ready if s.due(now)]
+        # Sources last batched together tie; the one that waited longer before that goes first
+        due.sort(key=lambda s: (s.priority * (now - s.last_scheduled), now - s.previous_scheduled), reverse=True)
+        batch = due[:self.max_batch_size]
+        wait = None
+        if not batch and ready:
+            wait = min(s.last_scheduled + 1.0 / s.fps - now for s in ready if s.fps > 0)
+        return batch, wait
+
+    def _run(self):
+        while True:
+            deadline = None
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    batch, wait = self._select(now)
+                    if batch:
+                        if len(batch) >= self.max_batch_size or not any(s.busy for s in self._sources.values()):
+                            break
+                        deadline = deadline or now + self.max_wait
+                        if now >= deadline:
+                            break
+                        wait = deadline - now
+                    self._cond.wait(max(wait, 0.001) if wait is not None else 1.0)
+                if not self._running:
+                    return
+                for source in batch:
+                    source.busy = True
+                    source.previous_scheduled = source.last_scheduled
+                    source.last_scheduled = now
+
+            items = [(source, source.take()) for source in batch]
+            items = [(source, item) for source, item in items if item is not None]
+            try:
+                started = time.perf_counter()
+                results = self.predict_fn([frame for _, (frame, _) in items])
+                elapsed = time.perf_counter() - started
+            except Exception as e:
+                print(f"❌ Batched stream inference failed: {e}")
+                for source, (frame, _) in items:
+                    if source.pool is not None:
+                        source.pool.release(frame)
+                with self._cond:
+                    self._errors += 1
+                    for source in batch:
+                        source.busy = False
+                time.sleep(1.0)
+                continue
+
+            if self.observer is not None:
+                self.observer('inference', elapsed)
+            with self._cond:
+                self._batches += 1
+                self._images += len(items)
+                self._infer_seconds += elapsed
+                self._batch_sizes.append(len(items))
+                for source in batch:
+                    if all(source is not s for s, _ in items):
+                        source.busy = False
+            for (source, (frame, captured_at)), result in zip(items, results):
+                self._pool.submit(self._process, source, frame, result, captured_at)
+
+    def _process(self, source, frame, result, captured_at):
+        try:
+            chunk = self.process_fn(source, frame, result, captured_at)
+            if chunk is not None:
+                source.publish(chunk)
+            source.inferred += 1
+            source.latency = 0.8 * source.latency + 0.2 * (time.time() - captured_at)
+        except Exception as e:
+            with self._cond:
+                self._errors += 1
+            print(f"❌ Stream source {source.name} failed to process a frame: {e}")
+        finally:
+            if source.pool is not None:
+                source.pool.release(frame)
+            with self._cond:
+                source.busy = False
+                self._cond.notify()
+
+    def close(self):
+        """Stop the scheduler and every source"""
+        with self._cond:
+            self._running = False
+            sources = list(self._sources.values())
+            self._sources.clear()
+            self._cond.notify_all()
+        for source in sources:
+            source.stop()
+        self._pool.shutdown(wait=False)
+
+    def stats(self):
+        """Return batch sizes, throughput and per-source counters"""
+        with self._cond:
+            sources = dict(self._sources)
+            sizes = list(self._batch_sizes)
+            counts = {
+                'batches': self._batches,
+                'images': self._images,
+                'errors': self._errors,
+                'avg_batch_ms': round(1000.0 * self._infer_seconds / self._batches, 3) if self._batches else 0.0,
+            }
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        return {
+            'max_batch_size': self.max_batch_size,
+            **counts,
+            'avg_batch_size': round(sum(sizes) / len(sizes), 2) if sizes else 0.0,
+            'images_per_second': round(self._images / elapsed, 2),
+            'sources': {name: source.stats() for name, source in sources.items()},
+        }
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+MJPEG_HEADERS = ('Content-Type: multipart/x-mixed-replace; boundary=frame\r\n'
+                 'Cache-Control: no-cache\r\n'
+                 'Connection: close\r\n')
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           429: 'Too Many Requests', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class StreamError(Exception):
+    def __init__(self, status, message):
+        """HTTP error raised by a route resolver or stream opener"""
+        super().__init__(message)
+        self.status = status
+
+
+class _Client:
+    def __init__(self):
+        """One connected viewer; holds at most the newest undelivered frame"""
+        self.latest = None
+        self.ready = asyncio.Event()
+        self.done = False
+        self.sent = 0
+        self.skipped = 0
+
+
+class _Hub:
+    def __init__(self, key, open_fn):
+        """Frames of one source shared by every viewer of it"""
+        self.key = key
+        self.open_fn = open_fn
+        self.clients = set()
+        self.opened = asyncio.get_running_loop().create_future()
+        self.close_fn = None
+        self.closed = False
+        self.frames = 0
+        self.task = None
+
+
+class StreamServer:
+    def __init__(self, host='0.0.0.0', port=5001, write_timeout=5.0, workers=16, client_buffer_bytes=1 << 20):
+        """asyncio HTTP server for MJPEG streams with many concurrent viewers
+
+        Routes map a path to resolve(query) returning (key, open_fn);
+        viewers whose key matches share one source. open_fn() runs in the
+        executor and returns (frames, close_fn) where frames is a blocking
+        iterator of multipart chunks; every next() on it also runs in the
+        executor, so a viewer costs a socket rather than a thread. Each
+        viewer keeps only the newest frame: frames that arrive while a slow
+        client is still draining are skipped, and a client whose socket
+        does not drain within write_timeout seconds is disconnected.
+        """
+        self.host = host
+        self.port = port
+        self.write_timeout = write_timeout
+        self.client_buffer_bytes = client_buffer_bytes
+        self.executor = ThreadPoolExecutor(max_workers=max(2, int(workers)), thread_name_prefix='stream-io')
+        self.routes = {}
+        self._hubs = {}
+        self._server = None
+        self._loop = None
+        self._thread = None
+        self._viewers_total = 0
+        self._slow_disconnects = 0
+        self._errors = 0
+
+    def route(self, path, resolve):
+        """Serve `path` with resolve(query) -> (key, open_fn)"""
+        self.routes[path] = resolve
+
+    def unroute(self, path):
+        """Stop serving `path`; viewers already connected keep their stream until it ends"""
+        self.routes.pop(path, None)
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=10)
+        if len(head) > 16384:
+            raise StreamError(400, 'Request header too large')
+        request_line = head.split(b'\r\n', 1)[0].decode('latin-1')
+        parts = request_line.split()
+        if len(parts) != 3:
+            raise StreamError(400, 'Malformed request line')
+        method, target, _ = parts
+        if method != 'GET':
+            raise StreamError(405, 'Only GET is supported')
+        url = urlsplit(target)
+        return url.path, dict(parse_qsl(url.query))
+
+    async def _respond(self, writer, status, body):
+        payload = body.encode('utf-8')
+        writer.write((f'HTTP/1.1 {status} {REASONS.get(status, "Error")}\r\n'
+                      f'Content-Type: text/plain; charset=utf-8\r\n'
+                      f'Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n').encode('latin-1') + payload)
+        try:
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+    async def _handle(self, reader, writer):
+        hub = client = None
+        try:
+            try:
+                path, query = await self._read_request(reader)
+                resolve = self.routes.get(path)
+                if resolve is None:
+                    raise StreamError(404, 'Not found')
+                key, open_fn = resolve(query)
+                hub = self._hubs.get(key)
+                if hub is None:
+                    hub = self._hubs[key] = _Hub(key, open_fn)
+                    hub.task = asyncio.ensure_future(self._pump(hub))
+                client = _Client()
+                hub.clients.add(client)
+                await asyncio.shield(hub.opened)
+            except StreamError as e:
+                await self._respond(writer, e.status, str(e))
+                return
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                return
+            except Exception as e:
+                self._errors += 1
+                await self._respond(writer, 500, str(e))
+                return
+
+            self._viewers_total += 1
+            writer.transport.set_write_buffer_limits(high=self.client_buffer_bytes)
+            writer.write(f'HTTP/1.1 200 OK\r\n{MJPEG_HEADERS}\r\n'.encode('latin-1'))
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                if client.latest is None:
+                    if client.done:
+                        break
+                    continue
+                chunk, client.latest = client.latest, None
+                writer.write(chunk)
+                try:
+                    await asyncio.wait_for(writer.drain(), self.write_timeout)
+                except asyncio.TimeoutError:
+                    self._slow_disconnects += 1
+                    break
+                client.sent += 1
+        except ConnectionError:
+            pass
+        finally:
+            if hub is not None and client is not None:
+                hub.clients.discard(client)
+                if not hub.clients:
+                    await self._close_hub(hub)
+            writer.close()
+
+    async def _close_hub(self, hub):
+        if self._hubs.get(hub.key) is hub:
+            del self._hubs[hub.key]
+        if hub.close_fn is not None and not hub.closed:
+            hub.closed = True
+            await asyncio.get_running_loop().run_in_executor(self.executor, hub.close_fn)
+
+    async def _pump(self, hub):
+        """Pull frames from a source in the executor and hand them to its viewers"""
+        loop = asyncio.get_running_loop()
+        try:
+            frames, hub.close_fn = await loop.run_in_executor(self.executor, hub.open_fn)
+        except Exception as e:
+            if self._hubs.get(hub.key) is hub:
+                del self._hubs[hub.key]
+            hub.opened.set_exception(e)
+            return
+        hub.opened.set_result(True)
+        iterator = iter(frames)
+        try:
+            while hub.clients and not hub.closed:
+                chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+                if chunk is None:
+                    break
+                hub.frames += 1
+                for client in hub.clients:
+                    if client.latest is not None:
+                        client.skipped += 1
+                    client.latest = chunk
+                    client.ready.set()
+        except Exception as e:
+            self._errors += 1
+            print(f"Stream {hub.key} failed: {e}")
+        finally:
+            for client in hub.clients:
+                client.done = True
+                client.ready.set()
+            await self._close_hub(hub)
+
+    async def _serve(self, started):
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        started.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """Run the server on its own event loop thread; raises OSError if the port is taken"""
+        started = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                asyncio.run(self._serve(started))
+            except Exception as e:
+                errors.append(e)
+                started.set()
+
+        self._thread = threading.Thread(target=run, name='stream-server', daemon=True)
+        self._thread.start()
+        if not started.wait(10):
+            raise RuntimeError(f'Stream server did not start on {self.host}:{self.port}')
+        if errors:
+            raise errors[0]
+        print(f"Async stream server listening on {self.host}:{self.port}")
+        return self
+
+    def stats(self):
+        """Return per-source viewer counts and frame delivery, gathered on the event loop"""
+        if self._loop is None or not self._loop.is_running():
+            return self._collect_stats()
+        return asyncio.run_coroutine_threadsafe(self._stats(), self._loop).result(timeout=5)
+
+    async def _stats(self):
+        return self._collect_stats()
+
+    def _collect_stats(self):
+        hubs = list(self._hubs.values())
+        return {
+            'port': self.port,
+            'viewers_total': self._viewers_total,
+            'slow_disconnects': self._slow_disconnects,
+            'errors': self._errors,
+            'streams': {
+                str(hub.key): {
+                    'viewers': len(hub.clients),
+                    'frames': hub.frames,
+                    'sent': sum(c.sent for c in list(hub.clients)),
+                    'skipped': sum(c.skipped for c in list(hub.clients)),
+                } for hub in hubs
+            },
+        }
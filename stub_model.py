@@ -0,0 +1,76 @@
+import time
+
+import cv2
+import numpy as np
+
+from backends import Boxes, Result
+
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat', 'traffic light',
+    'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog', 'horse', 'sheep', 'cow',
+    'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee',
+    'skis', 'snowboard', 'sports ball', 'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard',
+    'tennis racket', 'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
+    'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard',
+    'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase',
+    'scissors', 'teddy bear', 'hair drier', 'toothbrush'
+]
+
+# Synthetic scenes paint each object class in its own solid color so the
+# stub can recover the class from the pixels.
+CLASS_COLORS = {
+    0: (60, 20, 220),     # person
+    2: (20, 220, 60),     # car
+    7: (220, 160, 20),    # truck
+    43: (200, 40, 200),   # knife
+    76: (40, 200, 200),   # scissors
+    39: (220, 220, 220),  # bottle
+}
+
+
+class StubModel:
+    def __init__(self, latency_ms=0.0, per_image_ms=0.0, max_det=300):
+        """Deterministic stand-in for YOLO used for offline benchmarks
+
+        Finds solid-colored blobs on a dark background (what the benchmark
+        scene generator paints) and maps each blob's color to a class.
+        latency_ms per call and per_image_ms per image can be added to
+        imitate the cost of a real forward pass.
+        """
+        self.names = dict(enumerate(COCO_NAMES))
+        self.latency_ms = latency_ms
+        self.per_image_ms = per_image_ms
+        self.max_det = max_det
+        self._class_ids = np.array(list(CLASS_COLORS), np.int32)
+        self._palette = np.array(list(CLASS_COLORS.values()), np.float32)
+
+    def _detect(self, image, conf, classes):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _, mask = cv2.threshold(gray, 40, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes, scores, ids = [], [], []
+        for contour in contours[:self.max_det]:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w < 4 or h < 4:
+                continue
+            color = image[y + h // 2, x + w // 2].astype(np.float32)
+            distance = np.linalg.norm(self._palette - color, axis=1)
+            nearest = int(np.argmin(distance))
+            score = float(max(0.0, 1.0 - distance[nearest] / 255.0))
+            class_id = int(self._class_ids[nearest])
+            if score < conf or (classes is not None and class_id not in classes):
+                continue
+            boxes.append((x, y, x + w, y + h))
+            scores.append(score)
+            ids.append(class_id)
+        return Boxes(np.array(boxes, np.float32).reshape(-1, 4),
+                     np.array(scores, np.float32), np.array(ids, np.float32))
+
+    def __call__(self, source, conf=0.25, imgsz=640, verbose=False, classes=None, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        delay = (self.latency_ms + self.per_image_ms * len(images)) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+        wanted = set(classes) if classes is not None else None
+        return [Result(self._detect(image, conf, wanted), self.names, image.shape[:2]) for image in images]
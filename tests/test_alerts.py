@@ -0,0 +1,115 @@
+import time
+import types
+
+import numpy as np
+import pytest
+
+import alerts
+from alerts import AlertManager, JsonlSink, create_sink
+from backends import Boxes, Result
+
+NAMES = {0: 'person', 1: 'knife', 2: 'gun'}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(alerts, 'time', types.SimpleNamespace(time=clock, monotonic=time.monotonic))
+    return clock
+
+
+def _result(*detections):
+    xyxy = np.array([box for box, _, _ in detections], np.float32).reshape(-1, 4)
+    conf = np.array([score for _, score, _ in detections], np.float32)
+    cls = np.array([class_id for _, _, class_id in detections], np.float32)
+    return Result(Boxes(xyxy, conf, cls), NAMES, (480, 640))
+
+
+def _manager(**kwargs):
+    manager = AlertManager(['knife', 'gun'], **kwargs)
+    manager.set_names(NAMES)
+    return manager
+
+
+def test_only_alert_classes_above_min_confidence_fire(clock):
+    manager = _manager(min_confidence=0.5)
+    events = manager.observe(_result(([0, 0, 50, 50], 0.9, 0), ([100, 100, 150, 150], 0.4, 1),
+                                     ([200, 200, 250, 250], 0.8, 2)), 'webcam', stream='cam0')
+    assert [(e['class'], e['bbox']) for e in events] == [('gun', [200.0, 200.0, 250.0, 250.0])]
+
+
+def test_a_lingering_object_alerts_once(clock):
+    manager = _manager(debounce_seconds=10.0)
+    first = manager.observe(_result(([10, 10, 60, 60], 0.9, 1)), 'webcam', stream='cam0')
+    assert len(first) == 1
+    for step in range(1, 6):
+        clock.now += 2
+        assert manager.observe(_result(([10 + step, 10, 60 + step, 60], 0.9, 1)), 'webcam', stream='cam0') == []
+    assert manager.stats()['suppressed'] == 5
+
+
+def test_track_expires_after_debounce(clock):
+    manager = _manager(debounce_seconds=10.0)
+    box = _result(([10, 10, 60, 60], 0.9, 1))
+    first = manager.observe(box, 'webcam', stream='cam0')
+    clock.now += 11
+    again = manager.observe(box, 'webcam', stream='cam0')
+    assert len(again) == 1 and again[0]['track_id'] != first[0]['track_id']
+
+
+def test_dedup_is_per_stream_class_and_location(clock):
+    manager = _manager()
+    manager.observe(_result(([10, 10, 60, 60], 0.9, 1)), 'webcam', stream='cam0')
+    assert len(manager.observe(_result(([10, 10, 60, 60], 0.9, 1)), 'webcam', stream='cam1')) == 1
+    assert len(manager.observe(_result(([10, 10, 60, 60], 0.9, 2)), 'webcam', stream='cam0')) == 1
+    assert len(manager.observe(_result(([300, 300, 360, 360], 0.9, 1)), 'webcam', stream='cam0')) == 1
+
+
+
+def test_requests_without_a_stream_do_not_suppress_each_other(clock):
+    manager = _manager()
+    image = _result(([10, 10, 60, 60], 0.9, 1))
+    assert len(manager.observe(image, 'image')) == 1
+    clock.now += 1
+    assert len(manager.observe(image, 'image')) == 1
+    duplicate = _result(([10, 10, 60, 60], 0.9, 1), ([12, 10, 62, 60], 0.8, 1))
+    assert len(manager.observe(duplicate, 'image')) == 1
+    assert manager._tracks == {}
+
+
+def test_expired_keys_are_pruned(clock):
+    manager = _manager(debounce_seconds=10.0)
+    for stream in range(50):
+        manager.observe(_result(([10, 10, 60, 60], 0.9, 1)), 'source', stream=f'cam{stream}')
+    assert len(manager._tracks) == 50
+    clock.now += 11
+    manager.observe(_result(([10, 10, 60, 60], 0.9, 1)), 'source', stream='cam0')
+    assert list(manager._tracks) == [('source', 'cam0', 1)]
+
+def test_events_reach_readers_and_sinks(clock, tmp_path):
+    path = tmp_path / 'alerts.jsonl'
+    manager = _manager(sinks=[JsonlSink(str(path))])
+    events = manager.observe(_result(([10, 10, 60, 60], 0.9, 2)), 'upload', stream='s', captured_at=clock.now - 0.25)
+    assert events[0]['latency_ms'] == pytest.approx(250.0)
+    assert manager.since(0) == events
+    assert manager.since(events[0]['id']) == []
+    deadline = time.monotonic() + 5
+    while not (path.exists() and path.read_text().endswith('\n')) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert path.read_text().count('\n') == 1
+
+
+def test_create_sink_validates_the_spec():
+    assert isinstance(create_sink('log'), alerts.LogSink)
+    with pytest.raises(ValueError):
+        create_sink('email:me@example.com')
+    with pytest.raises(ValueError):
+        create_sink('jsonl')
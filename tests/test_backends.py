@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from backends import (ExportedGraphBackend, _load_names, compare_detections, extract_arrays, letterbox,
+                      non_max_suppression, verify_backends)
+from benchmarks.synthetic import make_scene
+from stub_model import COCO_NAMES, StubModel
+
+
+class StubGraphBackend(ExportedGraphBackend):
+    def __init__(self, imgsz=640):
+        """Exported-graph backend whose raw output comes from the stub model
+
+        _forward turns the letterboxed batch back into images, detects them
+        with the stub and encodes each box as a YOLOv8 anchor, plus a
+        shifted duplicate that NMS must remove, so the test exercises the
+        real letterbox, decoding, NMS and rescaling code.
+        """
+        super().__init__(dict(enumerate(COCO_NAMES)), imgsz)
+        self.stub = StubModel()
+
+    def _forward(self, batch):
+        images = [np.ascontiguousarray((b.transpose(1, 2, 0)[:, :, ::-1] * 255).round().astype(np.uint8))
+                  for b in batch]
+        for image in images:
+            image[(image == 114).all(axis=2)] = 0
+        results = [extract_arrays(r) for r in self.stub(images, conf=0.01)]
+        anchors = max(1, 2 * max(len(conf) for _, conf, _ in results))
+        prediction = np.zeros((len(images), 4 + len(COCO_NAMES), anchors), np.float32)
+        for out, (xyxy, conf, cls) in zip(prediction, results):
+            for i, (box, score, class_id) in enumerate(zip(xyxy, conf, cls)):
+                center, size = (box[:2] + box[2:]) / 2, box[2:] - box[:2]
+                out[:4, 2 * i] = [*center, *size]
+                out[4 + class_id, 2 * i] = score
+                out[:4, 2 * i + 1] = [*(center + 1), *size]
+                out[4 + class_id, 2 * i + 1] = score * 0.9
+        return prediction
+
+
+SCENES = [make_scene(width, height, objects, seed=seed)
+          for seed, (width, height, objects) in enumerate([(320, 240, 3), (640, 360, 6), (240, 320, 4), (500, 500, 8)])]
+
+
+def test_exported_graph_matches_stub_reference():
+    report = verify_backends([('stub', StubModel()), ('graph', StubGraphBackend())], SCENES, conf=0.3)
+    graph = report['backends']['graph']
+    assert graph['reference_detections'] > 0
+    assert graph['passed'], graph
+    assert graph['recall'] == 1.0 and graph['precision'] == 1.0
+
+
+def test_graph_boxes_are_in_original_coordinates():
+    reference = StubModel()(SCENES, conf=0.3)
+    graph = StubGraphBackend()(SCENES, conf=0.3)
+    for image, ref, got in zip(SCENES, reference, graph):
+        assert got.orig_shape == image.shape[:2]
+        ref_xyxy, _, ref_cls = extract_arrays(ref)
+        got_xyxy, _, got_cls = extract_arrays(got)
+        assert sorted(ref_cls.tolist()) == sorted(got_cls.tolist())
+        for box, class_id in zip(ref_xyxy, ref_cls):
+            same = got_xyxy[got_cls == class_id]
+            assert np.abs(same - box).max(axis=1).min() <= 2.0
+
+
+def test_letterbox_pads_to_square():
+    image = np.full((240, 320, 3), 7, np.uint8)
+    padded, ratio, (left, top) = letterbox(image, 640)
+    assert padded.shape == (640, 640, 3)
+    assert ratio == 2.0
+    assert (left, top) == (0, 80)
+    assert (padded[:top] == 114).all() and (padded[top + 480:] == 114).all()
+    assert (padded[top:top + 480] == 7).all()
+
+
+def test_nms_is_class_aware():
+    xyxy = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10], [50, 50, 60, 60]], np.float32)
+    scores = np.array([0.9, 0.8, 0.7, 0.6], np.float32)
+    cls = np.array([0, 0, 1, 0])
+    assert non_max_suppression(xyxy, scores, cls, 0.45).tolist() == [0, 2, 3]
+    assert non_max_suppression(xyxy, scores, cls, 0.45, max_det=2).tolist() == [0, 2]
+    assert len(non_max_suppression(xyxy[:0], scores[:0], cls[:0])) == 0
+
+
+def test_compare_detections_matches_by_class_and_iou():
+    reference = (np.array([[0, 0, 10, 10], [20, 20, 30, 30]], np.float32), np.array([0.9, 0.8], np.float32),
+                 np.array([1, 2]))
+    candidate = (np.array([[20, 20, 30, 31], [0, 0, 10, 10]], np.float32), np.array([0.7, 0.85], np.float32),
+                 np.array([2, 3]))
+    matched, diffs = compare_detections(reference, candidate)
+    assert matched == 1
+    assert diffs == [pytest.approx(0.1)]
+
+
+def test_load_names_refuses_to_guess(tmp_path):
+    path = tmp_path / 'model.xml'
+    path.write_text('')
+    with pytest.raises(RuntimeError):
+        _load_names(str(path))
+    (tmp_path / 'model.names.json').write_text('{"0": "pistol", "1": "knife"}')
+    assert _load_names(str(path)) == {0: 'pistol', 1: 'knife'}
@@ -0,0 +1,79 @@
+import pytest
+
+from event_store import EventStore, StreamEvents
+
+DAY = 86400.0
+START = 1700000000.0 - 1700000000.0 % DAY
+
+
+def _det(name, confidence, x=0.0):
+    return {'object': name, 'confidence': confidence, 'bbox': [x, 0.0, x + 10.0, 10.0]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / 'events.db'), batch_size=4, flush_interval=0.05)
+    store.record('webcam', [_det('person', 0.9), _det('knife', 0.6)], frame=0, stream='cam0', ts=START + 10)
+    store.record('webcam', [_det('person', 0.7)], frame=1, stream='cam0', ts=START + 70)
+    store.record('upload', [_det('knife', 0.3, 20.0)], ts=START + 3700)
+    store.record('upload', [], ts=START + 3800)
+    assert store.flush()
+    yield store
+    store.close()
+
+
+def test_query_filters_and_orders(store):
+    events = store.query()
+    assert [e['ts'] for e in events] == [START + 3700, START + 70, START + 10, START + 10]
+    assert events[0] == {'id': events[0]['id'], 'ts': START + 3700, 'source': 'upload', 'stream': None,
+                         'frame': None, 'object': 'knife', 'confidence': 0.3, 'bbox': [20.0, 0.0, 30.0, 10.0]}
+    assert [e['object'] for e in store.query(source='webcam', order='asc')] == ['person', 'knife', 'person']
+    assert [e['ts'] for e in store.query(cls='knife')] == [START + 3700, START + 10]
+    assert len(store.query(start=START + 60, end=START + 3700)) == 1
+    assert len(store.query(min_confidence=0.65)) == 2
+    assert [e['frame'] for e in store.query(stream='cam0', limit=1, offset=1)] == [0]
+
+
+def test_aggregate_by_class(store):
+    rows = store.aggregate('class')
+    assert [(r['class'], r['count']) for r in rows] == [('knife', 2), ('person', 2)]
+    assert rows[1]['avg_confidence'] == pytest.approx(0.8)
+    assert (rows[0]['first_ts'], rows[0]['last_ts']) == (START + 10, START + 3700)
+    assert [(r['source'], r['count']) for r in store.aggregate('source', cls='person')] == [('webcam', 2)]
+
+
+def test_aggregate_by_time_bucket(store):
+    hours = store.aggregate('source', bucket='hour')
+    assert [(r['bucket'], r['source'], r['count']) for r in hours] == [
+        (START, 'webcam', 3), (START + 3600, 'upload', 1)]
+    minutes = store.aggregate('class', bucket='minute', source='webcam')
+    assert [(r['bucket'], r['class'], r['count']) for r in minutes] == [
+        (START, 'knife', 1), (START, 'person', 1), (START + 60, 'person', 1)]
+
+
+def test_aggregate_rejects_unknown_groups(store):
+    with pytest.raises(ValueError):
+        store.aggregate('confidence')
+    with pytest.raises(ValueError):
+        store.aggregate('class', bucket='week')
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    store = EventStore(str(tmp_path / 'events.db'), batch_size=1000, flush_interval=60, max_queue=3)
+    try:
+        store.record('webcam', [_det('person', 0.9)] * 5, ts=START)
+        assert store.stats()['dropped'] == 2
+        assert store.flush()
+        assert store.stats()['written'] == 3
+    finally:
+        store.close()
+
+
+def test_stream_events_skip_repeated_results(store):
+    events = StreamEvents(store, 'video', stream='v1')
+    result, repeat = object(), object()
+    events.record(result, [_det('gun', 0.8)])
+    events.record(result, [_det('gun', 0.8)])
+    events.record(repeat, [_det('gun', 0.8)])
+    assert store.flush()
+    assert [e['frame'] for e in store.query(stream='v1', order='asc')] == [0, 2]
@@ -0,0 +1,107 @@
+import threading
+
+import pytest
+
+from inference_batcher import InferenceBatcher
+
+
+class Recorder:
+    def __init__(self, gate=None):
+        """predict_fn that records every batch and can be held on a gate"""
+        self.calls = []
+        self.gate = gate
+        self.lock = threading.Lock()
+
+    def __call__(self, images, **params):
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self.lock:
+            self.calls.append((list(images), params))
+        return [(image, params.get('conf')) for image in images]
+
+
+def test_concurrent_requests_share_one_batch():
+    gate = threading.Event()
+    predict = Recorder(gate)
+    batcher = InferenceBatcher(predict, max_batch_size=4, max_wait_ms=50)
+    try:
+        blocker = batcher.submit('first', conf=0.1)
+        requests = [batcher.submit(i, conf=0.5) for i in range(4)]
+        gate.set()
+        assert blocker.wait(5)[0] == ('first', 0.1)
+        for i, req in enumerate(requests):
+            result, info = req.wait(5)
+            assert result == (i, 0.5)
+            assert info['batch_size'] == 4
+        assert [images for images, _ in predict.calls] == [['first'], [0, 1, 2, 3]]
+        assert batcher.stats()['max_batch_size_seen'] == 4
+    finally:
+        batcher.stop()
+
+
+def test_batches_never_mix_params():
+    gate = threading.Event()
+    predict = Recorder(gate)
+    batcher = InferenceBatcher(predict, max_batch_size=8, max_wait_ms=50)
+    try:
+        batcher.submit('hold', conf=0.1)
+        low = [batcher.submit(i, conf=0.25) for i in range(3)]
+        high = [batcher.submit(i, conf=0.5) for i in range(2)]
+        gate.set()
+        assert [req.wait(5)[0] for req in low] == [(i, 0.25) for i in range(3)]
+        assert [req.wait(5)[0] for req in high] == [(i, 0.5) for i in range(2)]
+        for images, params in predict.calls:
+            assert len({params['conf']}) == 1
+        assert sorted(len(images) for images, _ in predict.calls) == [1, 2, 3]
+    finally:
+        batcher.stop()
+
+
+def test_max_batch_size_is_respected():
+    gate = threading.Event()
+    predict = Recorder(gate)
+    batcher = InferenceBatcher(predict, max_batch_size=2, max_wait_ms=50)
+    try:
+        requests = [batcher.submit(i) for i in range(5)]
+        gate.set()
+        for req in requests:
+            req.wait(5)
+        assert max(len(images) for images, _ in predict.calls) <= 2
+        assert batcher.stats()['requests'] == 5
+    finally:
+        batcher.stop()
+
+
+def test_predict_errors_reach_every_request_in_the_batch():
+    def fail(images, **params):
+        raise ValueError('model exploded')
+
+    batcher = InferenceBatcher(fail, max_wait_ms=1)
+    try:
+        with pytest.raises(ValueError, match='model exploded'):
+            batcher.infer('image', timeout=5)
+    finally:
+        batcher.stop()
+
+
+def test_wrong_result_count_is_an_error():
+    batcher = InferenceBatcher(lambda images, **params: [], max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match='Expected 1 results'):
+            batcher.infer('image', timeout=5)
+    finally:
+        batcher.stop()
+
+
+def test_stop_finishes_queued_requests_and_refuses_new_ones():
+    gate = threading.Event()
+    batcher = InferenceBatcher(Recorder(gate), max_batch_size=1, max_wait_ms=1)
+    requests = [batcher.submit(i) for i in range(3)]
+    stopper = threading.Thread(target=batcher.stop)
+    stopper.start()
+    gate.set()
+    stopper.join(10)
+    assert not stopper.is_alive()
+    assert [req.wait(0)[0] for req in requests] == [(i, None) for i in range(3)]
+    with pytest.raises(RuntimeError, match='stopped'):
+        batcher.submit('late')
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from jobs import JobManager
+
+
+def _write_video(path, frames=6):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10.0, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), i * 40, np.uint8))
+    writer.release()
+
+
+def _wait(job, statuses=('completed', 'failed', 'cancelled')):
+    deadline = time.monotonic() + 30
+    while job.status not in statuses and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+    gate.set()
+    return gate
+
+
+@pytest.fixture
+def manager(tmp_path, gate):
+    def predict(frames, **options):
+        gate.wait(10)
+        return [None] * len(frames)
+
+    return JobManager(predict, lambda frame, result: [], str(tmp_path / 'jobs'), workers=1, batch_size=2,
+                      ttl=60.0, reap_interval=3600)
+
+
+def _submit(manager):
+    job_id, job_dir = manager.new_job_dir()
+    source = os.path.join(job_dir, 'source.avi')
+    _write_video(source)
+    return manager.submit(job_id, job_dir, source)
+
+
+def test_job_writes_results_and_removes_its_upload(manager):
+    job = _submit(manager)
+    assert _wait(job) == 'completed'
+    assert job.frames_done == 6
+    assert os.path.exists(job.video_path)
+    with open(job.detections_path) as f:
+        assert len(f.readlines()) == 6
+    assert not os.path.exists(job.source_path)
+
+
+def test_reap_removes_only_jobs_finished_before_the_ttl(manager):
+    old, recent = _submit(manager), _submit(manager)
+    assert _wait(old) == 'completed' and _wait(recent) == 'completed'
+    old.finished_at -= 120
+    assert manager.reap() == 1
+    assert manager.get(old.id) is None and not os.path.exists(old.job_dir)
+    assert manager.get(recent.id) is recent and os.path.exists(recent.video_path)
+
+
+def test_reap_covers_failed_and_cancelled_jobs(manager, gate):
+    job_id, job_dir = manager.new_job_dir()
+    failed = manager.submit(job_id, job_dir, os.path.join(job_dir, 'missing.avi'))
+    assert _wait(failed) == 'failed'
+    gate.clear()
+    running = _submit(manager)
+    queued = _submit(manager)
+    manager.cancel(queued.id)
+    assert _wait(running, ('running',)) == 'running'
+    for job in (failed, running, queued):
+        job.created_at -= 120
+        if job.finished_at:
+            job.finished_at -= 120
+    assert manager.reap() == 2
+    assert [job['id'] for job in manager.list()] == [running.id]
+    assert not os.path.exists(failed.job_dir) and not os.path.exists(queued.job_dir)
+    gate.set()
+    assert _wait(running) == 'completed'
+    assert os.path.exists(running.video_path)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import FrameQueue, StreamPipeline, _END
+
+
+def test_drop_oldest_keeps_the_newest_items():
+    dropped = []
+    q = FrameQueue(maxsize=2, drop_oldest=True, on_drop=dropped.append)
+    for i in range(5):
+        assert q.put(i)
+    assert dropped == [0, 1, 2]
+    assert q.dropped == 3
+    assert [q.get(0), q.get(0)] == [3, 4]
+    with pytest.raises(TimeoutError):
+        q.get(0.01)
+
+
+def test_blocking_queue_waits_for_the_consumer():
+    q = FrameQueue(maxsize=1, drop_oldest=False)
+    q.put('a')
+    done = threading.Event()
+    producer = threading.Thread(target=lambda: (q.put('b'), done.set()))
+    producer.start()
+    assert not done.wait(0.2)
+    assert q.get(1) == 'a'
+    assert done.wait(1)
+    assert q.get(1) == 'b'
+    assert q.dropped == 0
+    producer.join()
+
+
+def test_close_wakes_blocked_producers_and_ends_consumers():
+    q = FrameQueue(maxsize=1, drop_oldest=False)
+    q.put('a')
+    accepted = []
+    producer = threading.Thread(target=lambda: accepted.append(q.put('b')))
+    producer.start()
+    time.sleep(0.05)
+    q.close()
+    producer.join(1)
+    assert accepted == [False]
+    assert q.get(0) == 'a'
+    assert q.get(0) is _END
+    assert not q.put('c')
+
+
+def test_end_marker_is_never_passed_to_on_drop():
+    dropped = []
+    q = FrameQueue(maxsize=1, drop_oldest=True, on_drop=dropped.append)
+    q.put(_END)
+    q.put('frame')
+    assert dropped == []
+    assert q.drain() == ['frame']
+    assert len(q) == 0
+
+
+def test_pipeline_accounts_for_every_frame():
+    frames = iter(range(40))
+    dropped = []
+
+    def infer(frame):
+        time.sleep(0.005)
+        return frame * 10
+
+    pipeline = StreamPipeline('test-accounting', lambda: next(frames, None), infer,
+                              lambda frame, result: (frame, result), lambda item: item,
+                              queue_size=2, on_drop=dropped.append).start()
+    try:
+        encoded = list(pipeline.frames())
+    finally:
+        pipeline.stop()
+    assert all(result == frame * 10 for frame, result in encoded)
+    assert sorted([frame for frame, _ in encoded] + dropped) == list(range(40))
+    assert pipeline.error is None
+
+
+def test_stop_releases_queued_frames():
+    released = []
+    gate = threading.Event()
+    counter = iter(range(1000))
+
+    def infer(frame):
+        gate.wait(5)
+        return None
+
+    pipeline = StreamPipeline('test-stop', lambda: next(counter), infer, lambda frame, result: frame,
+                              lambda frame: frame, queue_size=2, on_drop=released.append).start()
+    time.sleep(0.1)
+    gate.set()
+    pipeline.stop()
+    assert not any(thread.is_alive() for thread in pipeline._threads)
+    assert all(len(q) == 0 for name, q in pipeline.queues.items() if name != 'output')
+    assert released
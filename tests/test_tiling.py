@@ -0,0 +1,62 @@
+import numpy as np
+
+from backends import Boxes, Result
+from tiling import TiledDetector, merge_detections, should_tile, tile_grid
+
+
+def _arrays(boxes, scores, classes):
+    return np.array(boxes, np.float32), np.array(scores, np.float32), np.array(classes)
+
+
+def test_tile_grid_covers_the_image_with_overlap():
+    tiles = tile_grid(1500, 700, tile_size=640, overlap=0.2)
+    assert all(x1 - x0 <= 640 and y1 - y0 <= 640 for x0, y0, x1, y1 in tiles)
+    assert max(x1 for _, _, x1, _ in tiles) == 1500 and max(y1 for _, _, _, y1 in tiles) == 700
+    xs = sorted({x0 for x0, _, _, _ in tiles})
+    assert xs[0] == 0 and xs[-1] == 1500 - 640
+    assert all(b - a <= 640 * 0.8 for a, b in zip(xs, xs[1:]))
+    assert tile_grid(300, 200, tile_size=640) == [(0, 0, 300, 200)]
+
+
+def test_merge_drops_same_class_duplicates():
+    xyxy, conf, cls = _arrays([[0, 0, 100, 100], [2, 2, 102, 102], [0, 0, 100, 100]], [0.6, 0.9, 0.8], [0, 0, 1])
+    merged_xyxy, merged_conf, merged_cls = merge_detections(xyxy, conf, cls)
+    assert merged_conf.tolist() == [np.float32(0.9), np.float32(0.8)]
+    assert merged_cls.tolist() == [0, 1]
+    assert merged_xyxy[0].tolist() == [2, 2, 102, 102]
+
+
+def test_merge_joins_objects_cut_by_a_tile_border():
+    # Full-image box and the right-hand half of the same object from the next tile
+    xyxy, conf, cls = _arrays([[100, 50, 300, 150], [250, 48, 304, 152]], [0.9, 0.7], [0, 0])
+    merged_xyxy, merged_conf, _ = merge_detections(xyxy, conf, cls)
+    assert merged_conf.tolist() == [np.float32(0.9)]
+    assert merged_xyxy[0].tolist() == [100, 48, 304, 152]
+
+
+def test_merge_keeps_separate_objects():
+    xyxy, conf, cls = _arrays([[0, 0, 50, 50], [60, 0, 110, 50]], [0.9, 0.8], [0, 0])
+    assert len(merge_detections(xyxy, conf, cls)[1]) == 2
+
+
+def test_tiled_detector_shifts_tile_boxes_to_image_coordinates():
+    def predict(crops, **params):
+        # One box at the same spot in every crop
+        return [Result(Boxes(np.array([[10, 10, 30, 30]], np.float32), np.array([0.5], np.float32),
+                             np.array([2], np.float32)), {2: 'car'}, crop.shape[:2]) for crop in crops]
+
+    image = np.zeros((640, 1200, 3), np.uint8)
+    result, info = TiledDetector(predict, tile_size=640, overlap=0.2).detect(image)
+    tiles = tile_grid(1200, 640, 640, 0.2)
+    assert info['tiles'] == len(tiles) and info['full_image_pass']
+    assert info['raw_detections'] == len(tiles) + 1
+    starts = sorted({x0 + 10.0 for x0, _, _, _ in tiles})
+    assert sorted(result.boxes.xyxy[:, 0].tolist()) == starts
+    assert result.orig_shape == (640, 1200) and result.names == {2: 'car'}
+
+
+def test_should_tile():
+    image = np.zeros((400, 2000, 3), np.uint8)
+    assert should_tile(image, 1280)
+    assert not should_tile(image, 0)
+    assert not should_tile(image, 2000)
@@ -0,0 +1,91 @@
+import io
+import os
+
+import pytest
+
+from video_sessions import SNIFF_BYTES, TS_PACKET_SIZE, UploadError, receive_upload, sniff_container
+
+AVI = b'RIFF\x00\x10\x00\x00AVI LIST' + bytes(range(256)) * 40
+TS = (b'\x47' + bytes(TS_PACKET_SIZE - 1)) * 8
+
+
+def _multipart(parts, boundary='xBOUNDARYx'):
+    body = b''
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename is not None else '')
+        body += f'--{boundary}\r\nContent-Disposition: {disposition}\r\n\r\n'.encode() + data + b'\r\n'
+    return body + f'--{boundary}--\r\n'.encode(), f'multipart/form-data; boundary={boundary}'
+
+
+@pytest.mark.parametrize('head, container', [
+    (b'\x00\x00\x00\x18ftypmp42', 'mp4'),
+    (b'RIFF\x00\x00\x00\x00AVI ', 'avi'),
+    (b'\x1a\x45\xdf\xa3\x01\x00', 'mkv'),
+    (b'FLV\x01', 'flv'),
+    (b'\x00\x00\x01\xba\x44', 'mpg'),
+    (b'\x30\x26\xb2\x75\x8e\x66', 'wmv'),
+    (TS[:SNIFF_BYTES], 'ts'),
+])
+def test_sniff_container_recognizes_video(head, container):
+    assert sniff_container(head) == container
+
+
+@pytest.mark.parametrize('head', [b'GIF89a' + bytes(SNIFF_BYTES), b'\x89PNG\r\n\x1a\n', b'', TS[:TS_PACKET_SIZE]])
+def test_sniff_container_rejects_other_data(head):
+    assert sniff_container(head) is None
+
+
+def test_receive_raw_body_in_small_chunks(tmp_path):
+    stem = str(tmp_path / 'upload')
+    info = receive_upload(io.BytesIO(AVI), 'video/x-msvideo', stem, chunk_size=7)
+    assert info['path'] == stem + '.avi' and info['container'] == 'avi'
+    assert info['bytes'] == len(AVI)
+    with open(info['path'], 'rb') as f:
+        assert f.read() == AVI
+    assert not os.path.exists(stem + '.part')
+
+
+def test_receive_multipart_with_fields(tmp_path):
+    body, content_type = _multipart([('conf', None, b'0.4'), ('video', 'clip.ts', TS), ('skip', None, b'2')])
+    info = receive_upload(io.BytesIO(body), content_type, str(tmp_path / 'upload'), chunk_size=64)
+    assert info['container'] == 'ts' and info['filename'] == 'clip.ts'
+    assert info['fields'] == {'conf': '0.4', 'skip': '2'}
+    with open(info['path'], 'rb') as f:
+        assert f.read() == TS
+
+
+def test_receive_rejects_non_video_before_reading_it_all(tmp_path):
+    stream = io.BytesIO(b'not a video at all' * 10000)
+    with pytest.raises(UploadError, match='Unsupported'):
+        receive_upload(stream, 'application/octet-stream', str(tmp_path / 'upload'), chunk_size=1024)
+    assert stream.tell() < 10 * 1024
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_enforces_size_limit(tmp_path):
+    with pytest.raises(UploadError, match='larger than'):
+        receive_upload(io.BytesIO(AVI), 'video/avi', str(tmp_path / 'upload'), max_bytes=1024, chunk_size=256)
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize('parts, message', [
+    ([('other', 'clip.avi', AVI)], 'No video provided'),
+    ([('video', '', AVI)], 'No file selected'),
+])
+def test_receive_multipart_without_the_video_field(tmp_path, parts, message):
+    body, content_type = _multipart(parts)
+    with pytest.raises(UploadError, match=message):
+        receive_upload(io.BytesIO(body), content_type, str(tmp_path / 'upload'))
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_truncated_multipart(tmp_path):
+    body, content_type = _multipart([('video', 'clip.avi', AVI)])
+    with pytest.raises(UploadError, match='ended before'):
+        receive_upload(io.BytesIO(body[:len(body) // 2]), content_type, str(tmp_path / 'upload'))
+    assert os.listdir(tmp_path) == []
+
+
+def test_receive_rejects_other_content_types(tmp_path):
+    with pytest.raises(UploadError, match='No video provided'):
+        receive_upload(io.BytesIO(AVI), 'text/plain', str(tmp_path / 'upload'))
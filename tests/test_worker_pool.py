@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_scene
+from stub_model import StubModel
+from worker_pool import ModelWorkerPool
+
+
+def _boxes(result):
+    return np.asarray(result.boxes.xyxy), np.asarray(result.boxes.conf), np.asarray(result.boxes.cls)
+
+
+@pytest.fixture
+def pool():
+    pool = ModelWorkerPool('stub', workers=2, threads_per_worker=1, max_batch_size=4, start_timeout=60,
+                           request_timeout=30).start()
+    yield pool
+    pool.close()
+
+
+def test_pool_round_trips_a_batch(pool):
+    images = [make_scene(320, 240, objects, seed=objects) for objects in (1, 3, 6)]
+    results = pool(images, conf=0.25)
+    expected = StubModel()(images, conf=0.25)
+
+    assert len(results) == len(images)
+    for result, reference, image in zip(results, expected, images):
+        assert result.orig_shape == image.shape[:2]
+        assert result.names == reference.names
+        for got, want in zip(_boxes(result), _boxes(reference)):
+            np.testing.assert_allclose(got, want, rtol=1e-5)
+    assert sum(w['images'] for w in pool.stats()['per_worker']) == len(images)
+
+
+def test_pool_reuses_segments_across_batches(pool):
+    for seed in range(6):
+        image = make_scene(160 + 32 * seed, 120, 2, seed=seed)
+        assert len(pool([image])[0].boxes) == len(StubModel()(image)[0].boxes)
+
+
+def test_hung_worker_is_restarted():
+    pool = ModelWorkerPool('stub', workers=1, threads_per_worker=1, start_timeout=60, request_timeout=1.0,
+                           per_image_ms=400).start()
+    try:
+        image = make_scene(160, 120, 2)
+        with pytest.raises(RuntimeError):
+            pool([image] * 8)
+        deadline = time.monotonic() + 60
+        while pool.stats()['per_worker'][0]['state'] != 'idle' and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert pool.stats()['per_worker'][0]['restarts'] == 1
+        assert len(pool([image])) == 1
+    finally:
+        pool.close()
@@ -0,0 +1,130 @@
+import time
+
+import numpy as np
+
+from annotation import extract_arrays
+from backends import Boxes, Result
+
+
+def tile_grid(width, height, tile_size=640, overlap=0.2):
+    """Overlapping (x0, y0, x1, y1) tiles covering a width x height image"""
+    tile_size = max(32, int(tile_size))
+    stride = max(1, int(tile_size * (1.0 - min(max(overlap, 0.0), 0.9))))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        points = list(range(0, length - tile_size, stride))
+        points.append(length - tile_size)
+        return points
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def merge_detections(xyxy, conf, cls, iou_threshold=0.5, ios_threshold=0.7):
+    """Greedy cross-tile merge of same-class boxes, best score first
+
+    A box is dropped when it overlaps a kept box by more than iou_threshold
+    IoU, or when most of it (intersection over the smaller box above
+    ios_threshold) lies inside the kept box; the latter catches objects
+    cut in two by a tile border, and the kept box grows to cover both.
+    """
+    order = conf.argsort()[::-1]
+    xyxy, conf, cls = xyxy[order].copy(), conf[order], cls[order]
+    areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    alive = np.ones(len(conf), bool)
+    keep = []
+    for i in range(len(conf)):
+        if not alive[i]:
+            continue
+        keep.append(i)
+        rest = np.nonzero(alive & (cls == cls[i]))[0]
+        rest = rest[rest > i]
+        if not len(rest):
+            continue
+        xx1 = np.maximum(xyxy[i, 0], xyxy[rest, 0])
+        yy1 = np.maximum(xyxy[i, 1], xyxy[rest, 1])
+        xx2 = np.minimum(xyxy[i, 2], xyxy[rest, 2])
+        yy2 = np.minimum(xyxy[i, 3], xyxy[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        ios = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        fragments = rest[(ios > ios_threshold) & (iou <= iou_threshold)]
+        if len(fragments):
+            xyxy[i, :2] = np.minimum(xyxy[i, :2], xyxy[fragments, :2].min(axis=0))
+            xyxy[i, 2:] = np.maximum(xyxy[i, 2:], xyxy[fragments, 2:].max(axis=0))
+        alive[rest[(iou > iou_threshold) | (ios > ios_threshold)]] = False
+    return xyxy[keep], conf[keep], cls[keep]
+
+
+class TiledDetector:
+    def __init__(self, predict_fn, tile_size=640, overlap=0.2, iou_threshold=0.5, ios_threshold=0.7,
+                 include_full=True):
+        """Sliced inference for images much larger than the model input
+
+        The image is cut into overlapping tile_size tiles that are run as
+        one batch through predict_fn(images, **params), which returns one
+        result per image. Tile boxes are shifted back to image coordinates
+        and merged across tiles. With include_full the whole image is added
+        to the batch as well, so objects larger than a tile are still found.
+        """
+        self.predict_fn = predict_fn
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.ios_threshold = ios_threshold
+        self.include_full = include_full
+
+    def detect(self, image, **params):
+        """Return (result, info) for one image; info has per-tile timing"""
+        height, width = image.shape[:2]
+        started = time.perf_counter()
+        tiles = tile_grid(width, height, self.tile_size, self.overlap)
+        crops = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in tiles]
+        regions = list(tiles)
+        if self.include_full and len(tiles) > 1:
+            crops.append(image)
+            regions.append((0, 0, width, height))
+        sliced = time.perf_counter()
+
+        results = self.predict_fn(crops, **params)
+        inferred = time.perf_counter()
+
+        all_xyxy, all_conf, all_cls, per_tile = [], [], [], []
+        for (x0, y0, x1, y1), result in zip(regions, results):
+            xyxy, conf, cls = extract_arrays(result)
+            all_xyxy.append(xyxy + np.array([x0, y0, x0, y0], np.float32))
+            all_conf.append(conf)
+            all_cls.append(cls)
+            per_tile.append({'box': [x0, y0, x1, y1], 'detections': int(len(conf))})
+        xyxy, conf, cls = np.concatenate(all_xyxy), np.concatenate(all_conf), np.concatenate(all_cls)
+        raw = len(conf)
+        if raw:
+            xyxy, conf, cls = merge_detections(xyxy, conf, cls, self.iou_threshold, self.ios_threshold)
+        finished = time.perf_counter()
+
+        inference_ms = 1000.0 * (inferred - sliced)
+        names = getattr(results[0], 'names', {}) if len(results) else {}
+        merged = Result(Boxes(xyxy.astype(np.float32), conf.astype(np.float32), cls.astype(np.float32)),
+                        names, (height, width))
+        info = {
+            'tiles': len(tiles),
+            'tile_size': self.tile_size,
+            'overlap': self.overlap,
+            'full_image_pass': len(regions) > len(tiles),
+            'slice_ms': round(1000.0 * (sliced - started), 3),
+            'inference_ms': round(inference_ms, 3),
+            'per_tile_ms': round(inference_ms / len(regions), 3),
+            'merge_ms': round(1000.0 * (finished - inferred), 3),
+            'raw_detections': raw,
+            'detections': int(len(conf)),
+            'per_tile': per_tile,
+        }
+        return merged, info
+
+
+def should_tile(image, min_side):
+    """True when an image's longer side is above the auto-tiling threshold"""
+    return min_side > 0 and max(image.shape[:2]) > min_side
+
@@ -0,0 +1,222 @@
+import math
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from annotation import extract_arrays
+
+
+class TrackedBoxes:
+    def __init__(self, xyxy, conf, cls):
+        """Boxes carried forward by the tracker, shaped like YOLO boxes"""
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class TrackedResult:
+    def __init__(self, boxes):
+        """Stand-in for a YOLO result on frames the detector skipped"""
+        self.boxes = boxes
+
+
+class OpticalFlowTracker:
+    def __init__(self, scale=0.5, max_points=24, fb_threshold=1.5, min_points=4):
+        """Carry boxes across frames with pyramidal Lucas-Kanade optical flow
+
+        Points inside each box are tracked forward and backward; points whose
+        round trip drifts more than fb_threshold pixels are discarded. A box
+        is lost when fewer than min_points survive.
+        """
+        self.scale = scale
+        self.max_points = max_points
+        self.fb_threshold = fb_threshold
+        self.min_points = min_points
+        self.prev_gray = None
+        self.tracks = []
+
+    def _prepare(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.scale != 1.0:
+            gray = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        return gray
+
+    def _seed_points(self, gray, box):
+        h, w = gray.shape
+        x1, y1, x2, y2 = (box * self.scale).astype(int)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, w - 1), min(y2, h - 1)
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return np.empty((0, 1, 2), np.float32)
+        mask = np.zeros_like(gray)
+        mask[y1:y2, x1:x2] = 255
+        points = cv2.goodFeaturesToTrack(gray, self.max_points, 0.01, 3, mask=mask)
+        if points is None or len(points) < self.min_points:
+            xs = np.linspace(x1, x2, 5)[1:-1]
+            ys = np.linspace(y1, y2, 5)[1:-1]
+            points = np.array([[[x, y]] for y in ys for x in xs], np.float32)
+        return points.astype(np.float32)
+
+    def reset(self, frame, xyxy, conf, cls):
+        """Start tracking the given detection arrays"""
+        gray = self._prepare(frame)
+        self.tracks = []
+        for box, confidence, class_id in zip(xyxy, conf.tolist(), cls.tolist()):
+            box = np.asarray(box, np.float32)
+            self.tracks.append({
+                'class_id': class_id,
+                'confidence': confidence,
+                'box': box,
+                'points': self._seed_points(gray, box),
+            })
+        self.prev_gray = gray
+
+    def update(self, frame):
+        """Move tracked boxes to the new frame and return (boxes, confidence)
+
+        confidence is the surviving point fraction of the worst box, so a
+        single lost object is enough to ask for a fresh detection.
+        """
+        gray = self._prepare(frame)
+        if self.prev_gray is None:
+            self.prev_gray = gray
+            return self._boxes([]), 0.0
+        if not self.tracks:
+            self.prev_gray = gray
+            return self._boxes([]), 1.0
+
+        counts = [len(t['points']) for t in self.tracks]
+        if sum(counts) == 0:
+            self.prev_gray = gray
+            return self._boxes([]), 0.0
+        p0 = np.concatenate([t['points'] for t in self.tracks if len(t['points'])])
+        p1, st, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, p0, None)
+        p0r, st_back, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, p1, None)
+        fb_error = np.linalg.norm((p0 - p0r).reshape(-1, 2), axis=1)
+        good = (st.ravel() == 1) & (st_back.ravel() == 1) & (fb_error < self.fb_threshold)
+
+        alive = []
+        worst = 1.0
+        start = 0
+        height, width = frame.shape[:2]
+        for track, count in zip(self.tracks, counts):
+            end = start + count
+            keep = good[start:end]
+            old_pts = p0[start:end][keep].reshape(-1, 2)
+            new_pts = p1[start:end][keep].reshape(-1, 2)
+            start = end
+            confidence = len(old_pts) / count if count else 0.0
+            worst = min(worst, confidence)
+            if len(old_pts) < self.min_points:
+                track['points'] = np.empty((0, 1, 2), np.float32)
+                continue
+
+            shift = np.median(new_pts - old_pts, axis=0) / self.scale
+            old_spread = np.linalg.norm(old_pts - old_pts.mean(axis=0), axis=1)
+            new_spread = np.linalg.norm(new_pts - new_pts.mean(axis=0), axis=1)
+            valid = old_spread > 1e-3
+            growth = float(np.median(new_spread[valid] / old_spread[valid])) if valid.any() else 1.0
+
+            box = track['box']
+            cx, cy = (box[0] + box[2]) / 2 + shift[0], (box[1] + box[3]) / 2 + shift[1]
+            half_w, half_h = (box[2] - box[0]) * growth / 2, (box[3] - box[1]) * growth / 2
+            track['box'] = np.array([
+                max(cx - half_w, 0), max(cy - half_h, 0),
+                min(cx + half_w, width - 1), min(cy + half_h, height - 1)
+            ], np.float32)
+            track['points'] = new_pts.reshape(-1, 1, 2)
+            alive.append(track)
+
+        self.prev_gray = gray
+        return self._boxes(alive), worst
+
+    def _boxes(self, tracks):
+        if not tracks:
+            return TrackedBoxes(np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int32))
+        return TrackedBoxes(np.stack([t['box'] for t in tracks]),
+                            np.array([t['confidence'] for t in tracks], np.float32),
+                            np.array([t['class_id'] for t in tracks], np.int32))
+
+
+class TrackedDetector:
+    def __init__(self, detect_fn, source_fps=30.0, max_skip=10, min_confidence=0.6):
+        """Run detect_fn every K frames and track boxes in between
+
+        K adapts to the measured detector latency so the average cost per
+        frame fits in the source frame interval. A detection is also forced
+        whenever the tracker confidence drops below min_confidence.
+        """
+        self.detect_fn = detect_fn
+        self.frame_interval = 1.0 / source_fps if source_fps and source_fps > 0 else 1.0 / 30.0
+        self.max_skip = max(1, int(max_skip))
+        self.min_confidence = min_confidence
+        self.tracker = OpticalFlowTracker()
+        self.skip = 1
+        self.since_detect = None
+        self.detect_latency = None
+        self.track_latency = 0.0
+        self.detections = 0
+        self.tracked = 0
+        self.forced = 0
+        self._lock = threading.Lock()
+
+    def _adapt(self):
+        budget = self.frame_interval - self.track_latency
+        if self.detect_latency is None or budget <= 0:
+            self.skip = self.max_skip
+            return
+        self.skip = max(1, min(self.max_skip, math.ceil(self.detect_latency / budget)))
+
+    def _detect(self, frame):
+        started = time.perf_counter()
+        result = self.detect_fn(frame)
+        elapsed = time.perf_counter() - started
+        self.detect_latency = elapsed if self.detect_latency is None else 0.8 * self.detect_latency + 0.2 * elapsed
+
+        self.tracker.reset(frame, *extract_arrays(result))
+        self.since_detect = 0
+        self.detections += 1
+        self._adapt()
+        return result
+
+    def seed(self, frame, result):
+        """Track from a detection made elsewhere, e.g. on the moving regions of the frame"""
+        with self._lock:
+            self.tracker.reset(frame, *extract_arrays(result))
+            self.since_detect = 0
+
+    def __call__(self, frame):
+        """Return a detection or tracked result for the next frame"""
+        with self._lock:
+            if self.since_detect is None or self.since_detect + 1 >= self.skip:
+                return self._detect(frame)
+
+            started = time.perf_counter()
+            boxes, confidence = self.tracker.update(frame)
+            elapsed = time.perf_counter() - started
+            self.track_latency = 0.8 * self.track_latency + 0.2 * elapsed
+            if confidence < self.min_confidence:
+                self.forced += 1
+                return self._detect(frame)
+
+            self.since_detect += 1
+            self.tracked += 1
+            return TrackedResult(boxes)
+
+    def stats(self):
+        """Return the current skip interval and detect/track counts"""
+        with self._lock:
+            return {
+                'skip': self.skip,
+                'detections': self.detections,
+                'tracked': self.tracked,
+                'forced_detections': self.forced,
+                'detect_ms': round(1000.0 * (self.detect_latency or 0.0), 3),
+                'track_ms': round(1000.0 * self.track_latency, 3),
+                'source_fps': round(1.0 / self.frame_interval, 2),
+            }
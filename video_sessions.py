@@ -0,0 +1,312 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+CHUNK_SIZE = 256 * 1024
+TS_PACKET_SIZE = 188
+# Enough for the sync bytes of three MPEG-TS packets
+SNIFF_BYTES = 2 * TS_PACKET_SIZE + 1
+
+
+class UploadError(ValueError):
+    pass
+
+
+def sniff_container(head):
+    """Guess the video container from the first bytes of a file, or None"""
+    if head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free'):
+        return 'mp4'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'avi'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'mkv'
+    if head[:3] == b'FLV':
+        return 'flv'
+    if head[:4] in (b'\x00\x00\x01\xba', b'\x00\x00\x01\xb3'):
+        return 'mpg'
+    if head[:4] == b'\x30\x26\xb2\x75':
+        return 'wmv'
+    # A lone 0x47 is also the 'G' of GIF; TS repeats it at the start of every packet
+    if len(head) >= SNIFF_BYTES and all(head[i] == 0x47 for i in range(0, SNIFF_BYTES, TS_PACKET_SIZE)):
+        return 'ts'
+    return None
+
+
+class UploadWriter:
+    def __init__(self, path, max_bytes=0):
+        """Write an upload to disk chunk by chunk, validating as it arrives
+
+        The container is recognized from the first bytes, so a non-video
+        upload is rejected before the rest of it is read, and the size
+        limit is enforced while writing rather than after.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.container = None
+        self._head = b''
+        self._file = open(path, 'wb')
+
+    def write(self, data):
+        self.bytes += len(data)
+        if self.max_bytes and self.bytes > self.max_bytes:
+            raise UploadError(f'Video is larger than {self.max_bytes // (1024 * 1024)} MB')
+        if self.container is None:
+            self._head += data
+            if len(self._head) < SNIFF_BYTES:
+                return
+            self.container = sniff_container(self._head)
+            if self.container is None:
+                raise UploadError('Unsupported video format')
+            data, self._head = self._head, b''
+        self._file.write(data)
+
+    def finish(self):
+        """Flush the file; raise UploadError if nothing recognizable arrived"""
+        if self.container is None:
+            self.container = sniff_container(self._head) if self._head else None
+            if self.container is None:
+                raise UploadError('No video data received' if not self.bytes else 'Unsupported video format')
+            self._file.write(self._head)
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def receive_upload(stream, content_type, dest_stem, field='video', max_bytes=0, chunk_size=CHUNK_SIZE):
+    """Stream a video from a request body to disk without buffering it
+
+    Accepts multipart/form-data (the file in `field`) or a raw video body.
+    The file is written to dest_stem plus an extension matching the
+    detected container. Returns a dict with path, filename, bytes,
+    container and the other form fields; raises UploadError when the
+    upload is missing, too large or not a video.
+    """
+    mimetype, options = parse_options_header(content_type or '')
+    partial = dest_stem + '.part'
+    writer = UploadWriter(partial, max_bytes)
+    filename, fields = None, {}
+    try:
+        if mimetype == 'multipart/form-data':
+            boundary = options.get('boundary')
+            if not boundary:
+                raise UploadError('Missing multipart boundary')
+            filename = _receive_multipart(stream, boundary, field, writer, fields, chunk_size)
+        elif mimetype.startswith('video/') or mimetype == 'application/octet-stream':
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        else:
+            raise UploadError('No video provided')
+        writer.finish()
+    except BaseException:
+        writer.abort()
+        raise
+
+    path = f'{dest_stem}.{writer.container}'
+    os.replace(partial, path)
+    return {'path': path, 'filename': filename, 'bytes': writer.bytes,
+            'container': writer.container, 'fields': fields}
+
+
+def _receive_multipart(stream, boundary, field, writer, fields, chunk_size):
+    decoder = MultipartDecoder(boundary.encode('latin-1'))
+    target, filename, value = None, None, []
+    found = False
+    while True:
+        chunk = stream.read(chunk_size)
+        decoder.receive_data(chunk or None)
+        event = _next_event(decoder)
+        while not isinstance(event, NeedData):
+            if isinstance(event, File):
+                target = 'file' if event.name == field and not found else None
+                if target:
+                    found, filename = True, event.filename
+                    if not filename:
+                        raise UploadError('No file selected')
+            elif isinstance(event, Field):
+                target, value = event.name, []
+            elif isinstance(event, Data):
+                if target == 'file':
+                    writer.write(event.data)
+                elif target is not None:
+                    value.append(event.data)
+                    if not event.more_data:
+                        fields[target] = b''.join(value).decode('utf-8', 'replace')
+            elif isinstance(event, Epilogue):
+                if not found:
+                    raise UploadError('No video provided')
+                return filename
+            event = _next_event(decoder)
+        if not chunk:
+            raise UploadError('Upload ended before the multipart body was complete')
+
+
+def _next_event(decoder):
+    # The decoder raises a bare ValueError once the body has ended mid-part
+    try:
+        return decoder.next_event()
+    except ValueError:
+        raise UploadError('Upload ended before the multipart body was complete') from None
+
+
+class VideoSession:
+    def __init__(self, session_id, session_dir):
+        """One uploaded video, its files and whatever is decoding it"""
+        self.id = session_id
+        self.dir = session_dir
+        self.path = None
+        self.filename = None
+        self.bytes = 0
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.streams = 0
+        self._cleanup = []
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def on_close(self, fn):
+        """Register fn() to run when the session is closed, newest first"""
+        self._cleanup.append(fn)
+
+    def remove_on_close(self, fn):
+        """Unregister a function added with on_close, e.g. once its stream ended"""
+        try:
+            self._cleanup.remove(fn)
+        except ValueError:
+            pass
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'bytes': self.bytes,
+            'streams': self.streams,
+            'created_at': self.created_at,
+            'idle_seconds': round(time.time() - self.last_active, 1),
+        }
+
+
+class VideoSessionManager:
+    def __init__(self, root_dir, max_decodes=4, idle_timeout=600.0, reap_interval=30.0):
+        """Per-upload video sessions with a cap on concurrent decodes
+
+        Every upload gets its own session id and directory, so viewers do
+        not overwrite or delete each other's videos. At most max_decodes
+        sessions stream at once, and sessions that have not been used for
+        idle_timeout seconds are closed and their files removed.
+        """
+        self.root_dir = root_dir
+        self.max_decodes = max(1, int(max_decodes))
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._decodes = threading.BoundedSemaphore(self.max_decodes)
+        self._active_decodes = 0
+        self._rejected = 0
+        self._expired = 0
+        self._reaper = None
+        os.makedirs(root_dir, exist_ok=True)
+
+    def create(self):
+        """Create an empty session with its own directory"""
+        session_id = uuid.uuid4().hex
+        session_dir = os.path.join(self.root_dir, session_id)
+        os.makedirs(session_dir)
+        session = VideoSession(session_id, session_dir)
+        with self._lock:
+            self._sessions[session_id] = session
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, name='video-session-reaper', daemon=True)
+                self._reaper.start()
+        return session
+
+    def get(self, session_id):
+        """Return a session by id and mark it active, or None"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is not None:
+            session.touch()
+        return session
+
+    def begin_stream(self, session):
+        """Take a decode slot for a session; False when all slots are busy"""
+        if not self._decodes.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._active_decodes += 1
+            session.streams += 1
+        session.touch()
+        return True
+
+    def end_stream(self, session):
+        """Release the decode slot taken by begin_stream"""
+        with self._lock:
+            self._active_decodes -= 1
+            session.streams -= 1
+        session.touch()
+        self._decodes.release()
+
+    def close(self, session_id):
+        """Stop a session's decoders and delete its files; False if unknown"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return False
+        for fn in reversed(list(session._cleanup)):
+            try:
+                fn()
+            except Exception as e:
+                print(f"Error closing video session {session_id}: {e}")
+        shutil.rmtree(session.dir, ignore_errors=True)
+        return True
+
+    def reap(self):
+        """Close sessions idle for longer than idle_timeout; return how many"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            expired = [s.id for s in self._sessions.values() if s.streams == 0 and s.last_active < cutoff]
+        closed = sum(1 for session_id in expired if self.close(session_id))
+        with self._lock:
+            self._expired += closed
+        return closed
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Video session cleanup failed: {e}")
+
+    def close_all(self):
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            self.close(session_id)
+
+    def stats(self):
+        with self._lock:
+            sessions = [s.to_dict() for s in self._sessions.values()]
+            return {
+                'sessions': sessions,
+                'active_decodes': self._active_decodes,
+                'max_decodes': self.max_decodes,
+                'rejected_streams': self._rejected,
+                'expired_sessions': self._expired,
+                'idle_timeout': self.idle_timeout,
+            }
@@ -0,0 +1,352 @@
+import atexit
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# One row per detection: x1, y1, x2, y2, conf, cls
+RESULT_FIELDS = 6
+
+
+def _worker_threads(threads):
+    """Pin the math libraries of a worker process to `threads` threads"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def _open_untracked(name):
+    """Attach to a segment the parent owns without registering it for cleanup
+
+    Only the creator may unlink a segment. Python before 3.13 registers
+    attached segments with the resource tracker as well, which unlinks
+    them, or warns about leaks, when the registration and the owner's
+    unlink do not pair up.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _attach(segments, name):
+    """Attach to a shared memory segment by name, reusing open handles"""
+    segment = segments.get(name)
+    if segment is None:
+        for old in segments.values():
+            try:
+                old.close()
+            except BufferError:
+                pass
+        segments.clear()
+        segment = segments[name] = _open_untracked(name)
+    return segment
+
+
+def _worker_main(index, conn, options, threads, cpus, warmup):
+    """Model worker process: load a private model and serve shared-memory batches"""
+    # Ctrl-C reaches the whole process group; the parent stops the workers through close()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_threads(threads)
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    from backends import create_backend, extract_arrays
+
+    try:
+        options = dict(options)
+        path, model = create_backend(options.pop('backend'), intra_threads=threads, inter_threads=1, **options)
+        runs, batch_sizes, imgsz = warmup
+        dummy = np.zeros((imgsz, imgsz, 3), np.uint8)
+        for batch_size in batch_sizes:
+            for _ in range(runs):
+                model([dummy] * batch_size, conf=0.3, imgsz=imgsz, verbose=False)
+    except Exception as e:
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+        return
+    conn.send(('ready', path, dict(model.names)))
+
+    inputs, outputs = {}, {}
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        in_name, out_name, shapes, params = message
+        try:
+            in_buf = _attach(inputs, in_name).buf
+            out_buf = _attach(outputs, out_name).buf
+            images, offset = [], 0
+            for shape in shapes:
+                image = np.ndarray(shape, np.uint8, in_buf, offset)
+                images.append(image)
+                offset += image.nbytes
+            results = model(images, verbose=False, **params)
+
+            rows = np.ndarray((len(out_buf) // (4 * RESULT_FIELDS), RESULT_FIELDS), np.float32, out_buf)
+            counts, row = [], 0
+            for result in results:
+                xyxy, conf, cls = extract_arrays(result)
+                count = min(len(conf), len(rows) - row)
+                rows[row:row + count, :4] = xyxy[:count]
+                rows[row:row + count, 4] = conf[:count]
+                rows[row:row + count, 5] = cls[:count]
+                counts.append(count)
+                row += count
+            del images, results, rows, in_buf, out_buf
+            conn.send(('ok', counts))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+    for segment in list(inputs.values()) + list(outputs.values()):
+        segment.close()
+
+
+class _Worker:
+    def __init__(self, index, cpus):
+        """Parent-side handle on one model worker process and its buffers"""
+        self.index = index
+        self.cpus = cpus
+        self.process = None
+        self.conn = None
+        self.inputs = None
+        self.outputs = None
+        self.state = 'starting'
+        self.requests = 0
+        self.images = 0
+        self.busy_seconds = 0.0
+        self.restarts = 0
+
+    def ensure_buffers(self, in_bytes, out_rows):
+        """Grow the input and output segments to fit the next batch"""
+        out_bytes = out_rows * RESULT_FIELDS * 4
+        if self.inputs is None or self.inputs.size < in_bytes:
+            _release(self.inputs)
+            self.inputs = shared_memory.SharedMemory(create=True, size=max(in_bytes, 1))
+        if self.outputs is None or self.outputs.size < out_bytes:
+            _release(self.outputs)
+            self.outputs = shared_memory.SharedMemory(create=True, size=max(out_bytes, 1))
+
+    def release(self):
+        _release(self.inputs)
+        _release(self.outputs)
+        self.inputs = self.outputs = None
+
+
+def _release(segment):
+    if segment is not None:
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ModelWorkerPool:
+    def __init__(self, backend, workers=2, threads_per_worker=0, pin_cpus=False, max_batch_size=8,
+                 max_det=300, warmup_runs=0, imgsz=640, start_timeout=600.0, request_timeout=120.0,
+                 **backend_options):
+        """Run inference on a pool of model worker processes
+
+        Each worker loads its own backend instance with a fixed number of
+        math threads, so pre- and post-processing run outside the web
+        process's GIL. Images are copied into a per-worker shared memory
+        segment and detections come back through a second one; only shapes
+        and params go through the pipe. The pool is called like a backend
+        and returns Result objects from backends. A worker that does not
+        answer a batch within request_timeout seconds is killed and
+        restarted. backend_options are passed to create_backend in every
+        worker.
+        """
+        cpu_count = os.cpu_count() or 1
+        self.backend = backend
+        self.size = max(1, int(workers))
+        self.threads = int(threads_per_worker) or max(1, cpu_count // self.size)
+        self.pin_cpus = pin_cpus and hasattr(os, 'sched_setaffinity')
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_det = max_det
+        self.warmup = (max(0, int(warmup_runs)), sorted({1, self.max_batch_size}), imgsz)
+        self.start_timeout = start_timeout
+        self.request_timeout = request_timeout
+        self.options = dict(backend_options, backend=backend, imgsz=imgsz)
+        self.names = None
+        self.path = None
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for index in range(self.size):
+            cpus = None
+            if self.pin_cpus:
+                first = (index * self.threads) % cpu_count
+                cpus = {(first + i) % cpu_count for i in range(self.threads)}
+            self._workers.append(_Worker(index, cpus))
+
+    def start(self):
+        """Spawn every worker and wait until all of them have loaded the model"""
+        from backends import ALIASES, export_model
+        name = ALIASES.get(self.backend, self.backend)
+        if name not in ('torch', 'stub'):
+            # Export once up front so the workers do not race on the cache
+            export_model(self.options['weights'], name, self.options['cache_dir'], self.options['imgsz'])
+        threads = [threading.Thread(target=self._spawn, args=(worker,), daemon=True) for worker in self._workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        failed = [w for w in self._workers if w.state != 'idle']
+        if failed:
+            self.close()
+            raise RuntimeError(f'{len(failed)} of {self.size} model workers failed to start')
+        print(f"Started {self.size} model workers ({self.threads} threads each)")
+        # Unlink the shared memory on a normal exit rather than leaving it to the resource tracker
+        atexit.register(self.close)
+        return self
+
+    def _spawn(self, worker):
+        parent, child = self._context.Pipe()
+        worker.state = 'starting'
+        worker.conn = parent
+        worker.process = self._context.Process(
+            target=_worker_main, name=f'model-worker-{worker.index}', daemon=True,
+            args=(worker.index, child, self.options, self.threads, worker.cpus, self.warmup))
+        worker.process.start()
+        child.close()
+        if not parent.poll(self.start_timeout):
+            worker.state = 'failed'
+            print(f"❌ Model worker {worker.index} did not start within {self.start_timeout:.0f}s")
+            worker.process.kill()
+            return
+        try:
+            message = parent.recv()
+        except EOFError:
+            message = ('error', 'worker exited during startup')
+        if message[0] != 'ready':
+            worker.state = 'failed'
+            print(f"❌ Model worker {worker.index} failed to start: {message[1]}")
+            return
+        with self._lock:
+            if self.names is None:
+                self.path, self.names = message[1], message[2]
+        worker.state = 'idle'
+        self._idle.put(worker)
+
+    def _respawn(self, worker):
+        """Replace a crashed worker in the background"""
+        worker.restarts += 1
+        worker.release()
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.kill()
+        if not self._closed:
+            self._spawn(worker)
+
+    def __call__(self, source, conf=0.25, imgsz=None, verbose=False, classes=None, **kwargs):
+        from backends import Boxes, Result
+        images = source if isinstance(source, list) else [source]
+        if not images:
+            return []
+        images = [np.ascontiguousarray(image, dtype=np.uint8) for image in images]
+        params = dict(kwargs, conf=conf)
+        if imgsz is not None:
+            params['imgsz'] = imgsz
+        if classes is not None:
+            params['classes'] = list(classes)
+
+        if self._closed:
+            raise RuntimeError('Model worker pool is closed')
+        try:
+            worker = self._idle.get(timeout=self.start_timeout)
+        except queue.Empty:
+            raise RuntimeError('No model worker became available') from None
+        started = time.perf_counter()
+        try:
+            worker.state = 'busy'
+            worker.ensure_buffers(sum(image.nbytes for image in images), len(images) * self.max_det)
+            offset = 0
+            for image in images:
+                np.ndarray(image.shape, np.uint8, worker.inputs.buf, offset)[...] = image
+                offset += image.nbytes
+            worker.conn.send((worker.inputs.name, worker.outputs.name, [image.shape for image in images], params))
+            if not worker.conn.poll(self.request_timeout):
+                raise TimeoutError(f'no reply within {self.request_timeout:.0f}s')
+            status, payload = worker.conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f'Model worker {worker.index}: {payload}')
+
+            rows = np.ndarray((sum(payload), RESULT_FIELDS), np.float32, worker.outputs.buf).copy()
+        except (EOFError, OSError) as e:
+            # TimeoutError is an OSError: a hung worker is replaced like a dead one
+            worker.state = 'restarting'
+            print(f"❌ Model worker {worker.index} failed: {e or type(e).__name__}; restarting")
+            threading.Thread(target=self._respawn, args=(worker,), daemon=True).start()
+            raise RuntimeError(f'Model worker {worker.index} failed') from e
+        except Exception:
+            worker.state = 'idle'
+            self._idle.put(worker)
+            raise
+        worker.requests += 1
+        worker.images += len(images)
+        worker.busy_seconds += time.perf_counter() - started
+        worker.state = 'idle'
+        self._idle.put(worker)
+
+        results, row = [], 0
+        for image, count in zip(images, payload):
+            chunk = rows[row:row + count]
+            row += count
+            boxes = Boxes(chunk[:, :4], chunk[:, 4], chunk[:, 5])
+            results.append(Result(boxes, self.names, image.shape[:2]))
+        return results
+
+    def close(self):
+        """Stop every worker process and free the shared memory"""
+        if self._closed:
+            return
+        self._closed = True
+        for worker in self._workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(None)
+                except (OSError, BrokenPipeError):
+                    pass
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+            worker.release()
+            worker.state = 'stopped'
+
+    def stats(self):
+        """Return per-worker request counts, utilisation and state"""
+        return {
+            'backend': self.backend,
+            'workers': self.size,
+            'threads_per_worker': self.threads,
+            'pinned': self.pin_cpus,
+            'idle': self._idle.qsize(),
+            'per_worker': [{
+                'index': w.index,
+                'pid': w.process.pid if w.process is not None else None,
+                'state': w.state,
+                'cpus': sorted(w.cpus) if w.cpus else None,
+                'requests': w.requests,
+                'images': w.images,
+                'busy_seconds': round(w.busy_seconds, 3),
+                'restarts': w.restarts,
+                'input_bytes': w.inputs.size if w.inputs is not None else 0,
+            } for w in self._workers],
+        }